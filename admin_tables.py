@@ -0,0 +1,315 @@
+"""
+Admin panel tables for SW Labs Management System
+Serves the lab, station, device and user tables of the admin panel one page at
+a time. Each table keeps its rows sorted by every sortable column and an
+inverted index from search tokens to row ids, both updated from the collection
+listeners, so a page is a slice of a prebuilt order instead of a scan and sort
+of the whole collection on every request.
+"""
+
+import bisect
+import re
+import socket
+
+from storage import VersionedIndex
+
+# Words are indexed whole (so '10.0.0' finds '10.0.0.5') and split on
+# punctuation (so 'example' finds 'ann@example.org')
+TOKEN = re.compile(r'[a-z0-9][a-z0-9.@_+-]*')
+PART = re.compile(r'[a-z0-9]+')
+
+
+def search_tokens(text):
+    """Lowercase words of text and their parts: 'ann@lab.org' -> {'ann@lab.org', 'ann', 'lab', 'org'}"""
+    tokens = set()
+    for token in TOKEN.findall(str(text).lower()):
+        tokens.add(token)
+        tokens.update(PART.findall(token))
+    return tokens
+
+
+def text_key(value):
+    return (value or '').lower()
+
+
+def address_key(value):
+    """Sort IPv4 then IPv6 addresses numerically, host names after them"""
+    for rank, family in enumerate((socket.AF_INET, socket.AF_INET6)):
+        try:
+            return (rank, int.from_bytes(socket.inet_pton(family, value or ''), 'big'), '')
+        except OSError:
+            continue
+    return (2, 0, text_key(value))
+
+
+class AdminTable(VersionedIndex):
+    """Rows of one collection, sorted by each column and searchable by token prefix
+
+    build_row(record) returns the row shown for a record. Rows may show
+    fields of other collections; `related` lists (collection, affected) pairs
+    where affected(old, new) returns the ids of the rows a change to that
+    collection touches.
+
+    sort_keys maps a column to key(row). live_keys maps columns whose value
+    lives outside the collections (device ping state) to (key(row), version()),
+    and their order is rebuilt when version() moves on.
+    """
+
+    def __init__(self, collection, build_row, sort_keys, search_fields, related=(), live_keys=None):
+        self.collection = collection
+        self.build_row = build_row
+        self.sort_keys = sort_keys
+        self.search_fields = search_fields
+        self.live_keys = live_keys or {}
+        self._affected = [lambda old, new: [r['id'] for r in (old, new) if r]] + [affected for _, affected in related]
+        self._reset()
+        super().__init__(collection, *(other for other, _ in related))
+
+    @property
+    def columns(self):
+        return set(self.sort_keys) | set(self.live_keys)
+
+    def _reset(self):
+        self._rows = {}                                         # row id -> row
+        self._keys = {column: {} for column in self.sort_keys}  # column -> {row id: (key, row id)}
+        self._orders = {column: [] for column in self.sort_keys}  # column -> sorted [(key, row id)]
+        self._token_ids = {}    # token -> ids of the rows that have it
+        self._tokens = []       # every token, sorted, for prefix lookups
+        self._row_tokens = {}   # row id -> its tokens
+        self._live_orders = {}  # column -> (versions, sorted [(key, row id)], {row id: (key, row id)})
+
+    def _add(self, record, ordered=True):
+        row = self.build_row(record)
+        row_id = row['id']
+        self._rows[row_id] = row
+        for column, key in self.sort_keys.items():
+            entry = (key(row), row_id)
+            self._keys[column][row_id] = entry
+            if ordered:
+                bisect.insort(self._orders[column], entry)
+            else:
+                self._orders[column].append(entry)
+        tokens = search_tokens(' '.join(str(row[field]) for field in self.search_fields if row.get(field) is not None))
+        self._row_tokens[row_id] = tokens
+        for token in tokens:
+            ids = self._token_ids.get(token)
+            if ids is None:
+                ids = self._token_ids[token] = set()
+                if ordered:
+                    bisect.insort(self._tokens, token)
+                else:
+                    self._tokens.append(token)
+            ids.add(row_id)
+
+    def _remove(self, row_id):
+        if self._rows.pop(row_id, None) is None:
+            return
+        for column, order in self._orders.items():
+            entry = self._keys[column].pop(row_id)
+            del order[bisect.bisect_left(order, entry)]
+        for token in self._row_tokens.pop(row_id):
+            ids = self._token_ids[token]
+            ids.discard(row_id)
+            if not ids:
+                del self._token_ids[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def _apply(self, position, changes):
+        row_ids = set()
+        for old, new in changes:
+            row_ids.update(self._affected[position](old, new))
+        for row_id in row_ids:
+            self._remove(row_id)
+            record = self.collection.get(row_id)
+            if record:
+                self._add(record)
+
+    def _rebuild(self, record_lists):
+        self._reset()
+        for record in record_lists[0]:
+            self._add(record, ordered=False)
+        for order in self._orders.values():
+            order.sort()
+        self._tokens.sort()
+
+    def _matching(self, query):
+        """Ids of the rows having, for every word of query, a token starting with it; None for no words"""
+        ids = None
+        for word in set(TOKEN.findall(query.lower())):
+            found = set()
+            i = bisect.bisect_left(self._tokens, word)
+            while i < len(self._tokens) and self._tokens[i].startswith(word):
+                found |= self._token_ids[self._tokens[i]]
+                i += 1
+            ids = found if ids is None else ids & found
+            if not ids:
+                break
+        return ids
+
+    def _order(self, column):
+        if column in self.sort_keys:
+            return self._orders[column], self._keys[column]
+        key, version = self.live_keys[column]
+        versions = (self._versions, version())
+        cached = self._live_orders.get(column)
+        if cached is None or cached[0] != versions:
+            keys = {row_id: (key(row), row_id) for row_id, row in self._rows.items()}
+            cached = (versions, sorted(keys.values()), keys)
+            self._live_orders[column] = cached
+        return cached[1], cached[2]
+
+    def page(self, query='', sort='id', descending=False, offset=0, limit=50):
+        """Return (number of matching rows, copies of the rows on the requested page)"""
+        if sort not in self.columns:
+            raise ValueError(f'Unknown sort column {sort!r}')
+        with self._lock:
+            self._current()
+            order, keys = self._order(sort)
+            matches = self._matching(query) if query else None
+            if matches is None:
+                total = len(order)
+                if descending:
+                    end = max(total - offset, 0)
+                    selected = order[max(end - limit, 0):end][::-1]
+                else:
+                    selected = order[offset:offset + limit]
+            else:
+                total = len(matches)
+                if total * 8 < len(order):
+                    # Few matches: sorting them beats walking the whole order
+                    ordered = sorted((keys[row_id] for row_id in matches), reverse=descending)
+                else:
+                    ordered = [entry for entry in (reversed(order) if descending else order) if entry[1] in matches]
+                selected = ordered[offset:offset + limit]
+            return total, [dict(self._rows[row_id]) for _, row_id in selected]
+
+
+def build_tables(repository, liveness):
+    """Return {name: AdminTable} for the labs, stations, devices and users of a repository"""
+    labs, stations, devices, users = repository.labs, repository.stations, repository.devices, repository.users
+
+    def lab_row(lab_data):
+        return {
+            'id': lab_data['id'],
+            'name': lab_data['name'],
+            'location': lab_data.get('location'),
+            'stations': len(stations.find('lab_id', lab_data['id'])),
+            'created_at': lab_data.get('created_at'),
+        }
+
+    def station_row(station_data):
+        lab_data = labs.get(station_data.get('lab_id'))
+        return {
+            'id': station_data['id'],
+            'name': station_data['name'],
+            'lab_id': station_data.get('lab_id'),
+            'lab_name': lab_data['name'] if lab_data else None,
+            'is_functional': station_data.get('is_functional', True),
+            'is_occupied': bool(station_data.get('is_occupied')),
+            'occupied_until': station_data.get('occupied_until'),
+            'devices': len(devices.find('station_id', station_data['id'])),
+            'created_at': station_data.get('created_at'),
+        }
+
+    def device_row(device_data):
+        station_data = stations.get(device_data['station_id'])
+        return {
+            'id': device_data['id'],
+            'name': device_data['name'],
+            'device_type': device_data.get('device_type'),
+            'ip_address': device_data.get('ip_address'),
+            'os_info': device_data.get('os_info'),
+            'station_id': device_data['station_id'],
+            'station_name': station_data['name'] if station_data else None,
+            'created_at': device_data.get('created_at'),
+        }
+
+    def user_row(user_data):
+        return {
+            'id': user_data['id'],
+            'username': user_data['username'],
+            'email': user_data.get('email'),
+            'is_admin': bool(user_data.get('is_admin')),
+            'created_at': user_data.get('created_at'),
+        }
+
+    def moved(field):
+        # Rows counting the records of another collection by `field`
+        def affected(old, new):
+            if old is not None and new is not None and old.get(field) == new.get(field):
+                return ()
+            return [record[field] for record in (old, new) if record is not None]
+        return affected
+
+    def renamed(collection, field):
+        # Rows showing the name of a record of another collection
+        def affected(old, new):
+            if old is None or (new is not None and old['name'] == new['name']):
+                return ()
+            return [record['id'] for record in collection.find(field, old['id'])]
+        return affected
+
+    def live_status(row):
+        status = liveness.get(row['id'])
+        return bool(status and status['is_online'])
+
+    def live_last_ping(row):
+        status = liveness.get(row['id'])
+        return (status['last_ping'] if status else '') or ''
+
+    return {
+        'labs': AdminTable(
+            labs, lab_row,
+            sort_keys={
+                'id': lambda row: row['id'],
+                'name': lambda row: text_key(row['name']),
+                'location': lambda row: text_key(row['location']),
+                'stations': lambda row: row['stations'],
+                'created_at': lambda row: row['created_at'] or '',
+            },
+            search_fields=('name', 'location'),
+            related=[(stations, moved('lab_id'))],
+        ),
+        'stations': AdminTable(
+            stations, station_row,
+            sort_keys={
+                'id': lambda row: row['id'],
+                'name': lambda row: text_key(row['name']),
+                'lab': lambda row: text_key(row['lab_name']),
+                'functional': lambda row: row['is_functional'],
+                'occupied': lambda row: (row['is_occupied'], row['occupied_until'] or ''),
+                'devices': lambda row: row['devices'],
+                'created_at': lambda row: row['created_at'] or '',
+            },
+            search_fields=('name', 'lab_name'),
+            related=[(labs, renamed(stations, 'lab_id')), (devices, moved('station_id'))],
+        ),
+        'devices': AdminTable(
+            devices, device_row,
+            sort_keys={
+                'id': lambda row: row['id'],
+                'name': lambda row: text_key(row['name']),
+                'type': lambda row: text_key(row['device_type']),
+                'ip_address': lambda row: address_key(row['ip_address']),
+                'station': lambda row: text_key(row['station_name']),
+                'created_at': lambda row: row['created_at'] or '',
+            },
+            search_fields=('name', 'device_type', 'ip_address', 'os_info', 'station_name'),
+            related=[(stations, renamed(devices, 'station_id'))],
+            live_keys={
+                'status': (live_status, lambda: liveness.status_version),
+                'last_ping': (live_last_ping, lambda: liveness.version),
+            },
+        ),
+        'users': AdminTable(
+            users, user_row,
+            sort_keys={
+                'id': lambda row: row['id'],
+                'username': lambda row: text_key(row['username']),
+                'email': lambda row: text_key(row['email']),
+                'role': lambda row: row['is_admin'],
+                'created_at': lambda row: row['created_at'] or '',
+            },
+            search_fields=('username', 'email'),
+        ),
+    }
@@ -1,339 +1,663 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, get_template_attribute
+from markupsafe import Markup
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
+from datetime import date, datetime, timedelta
 import os
 import threading
 import time
-from ping3 import ping
 import psutil
-import json
-import csv
+import io
+import zlib
 from pathlib import Path
+from storage import diff_records, open_repository
+from models import User, Lab, Station, Device, LabGraph, UserCache
+from monitor import probe_sweep
+from liveness import LivenessTable
+from scheduler import ExpiryScheduler
+from reservations import ReservationIndex, occupation_interval
+from station_search import StationSearchIndex, query_terms
+from admin_tables import build_tables
+from probe_schedule import ProbeSchedule, ProbeRequests
+from timeseries import Bucket, MetricsStore
+from usage import OccupancyLog, UsageRollups
+from events import EventBroker
+from stats import StationStats
+from page_cache import EntityVersions, FragmentCache, fill_slots
+from passwords import CredentialCache, HasherBusy, PasswordHasher, pool_share
+from bulk import EXPORT_FIELDS, FORMATS, export_lines, format_for_filename, import_rows, read_rows
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 
+# Device monitoring configuration
+app.config['PING_INTERVAL'] = 30        # seconds between probes of a device that answers
+app.config['PING_OCCUPIED_INTERVAL'] = 10  # the same, for devices on an occupied station
+app.config['PING_MAX_BACKOFF'] = 1800   # longest gap between probes of a device that stays offline
+app.config['PING_CONCURRENCY'] = 256    # probes in flight at the same time
+app.config['PING_TIMEOUT'] = 2          # seconds to wait for each device
+app.config['PING_DEADLINE'] = 25        # seconds a whole sweep may take
+app.config['PING_PER_SUBNET'] = 64      # probes in flight against the same /24 subnet
+# How each device type is checked: 'icmp', 'tcp' (port), 'udp' (port, payload)
+# or 'http' (port, path). Types not listed here are pinged.
+app.config['PROBE_TYPES'] = {
+    'PC': {'type': 'icmp'},
+    'Server': {'type': 'icmp'},
+}
+
+# Where the ping and auto-release loops run: 'thread' starts them inside this
+# process (python app.py, run.py); 'external' means one separate monitor process
+# owns them (python serve.py) and every web worker follows what it writes
+app.config['MONITOR_MODE'] = os.environ.get('SW_LABS_MONITOR', 'thread')
+app.config['MONITOR_CHECK_INTERVAL'] = 1.0  # seconds between checks for the other side's writes
+
+# Open /api/events streams per process. Each one holds a server thread for as
+# long as its page is open, so under serve.py half of the threads per worker
+# (SW_LABS_THREADS) may stream and the rest keep serving requests; 0 is no limit
+# (Flask's development server starts a thread per request)
+_server_threads = os.environ.get('SW_LABS_THREADS')
+app.config['EVENT_STREAMS'] = int(os.environ.get('SW_LABS_EVENT_STREAMS',
+                                                 max(int(_server_threads) // 2, 1) if _server_threads else 0))
+
+# Occupancy history: the event log starts a new segment file at this size
+app.config['OCCUPANCY_SEGMENT_BYTES'] = 4 * 1024 * 1024
+
+# Rows per page of the admin panel tables
+app.config['ADMIN_PAGE_SIZE'] = 50
+
+# Password hashing: werkzeug method string whose numbers are the work factor.
+# Existing hashes made with another one are replaced when their user logs in.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('SW_LABS_PASSWORD_METHOD', 'scrypt:32768:8:1')
+# Hashing processes for the whole server, split between the web worker
+# processes (SW_LABS_WORKERS, set by serve.py), at least one each; 0 hashes inline
+app.config['PASSWORD_WORKERS_TOTAL'] = int(os.environ.get('SW_LABS_PASSWORD_WORKERS', min(os.cpu_count() or 1, 4)))
+app.config['PASSWORD_WORKERS'] = pool_share(app.config['PASSWORD_WORKERS_TOTAL'], int(os.environ.get('SW_LABS_WORKERS', 1)))
+app.config['PASSWORD_QUEUE_TIMEOUT'] = 10   # seconds a login waits for a free hashing slot
+app.config['PASSWORD_CACHE_TTL'] = 900      # seconds a verified password is remembered
+
+# Storage configuration: 'json' keeps data in data/*.json, 'sqlite' in SQLITE_PATH
+app.config['STORAGE_BACKEND'] = os.environ.get('SW_LABS_STORAGE', 'json')
+app.config['SQLITE_PATH'] = os.environ.get('SW_LABS_SQLITE_PATH', 'instance/sw_labs.db')
+
 # File-based storage configuration
 DATA_DIR = Path('data')
 DATA_DIR.mkdir(exist_ok=True)
 
-USERS_FILE = DATA_DIR / 'users.json'
-LABS_FILE = DATA_DIR / 'labs.json'
-STATIONS_FILE = DATA_DIR / 'stations.json'
-DEVICES_FILE = DATA_DIR / 'devices.json'
+# Each collection is loaded once and re-read only when the stored data changes
+repository = open_repository(app.config['STORAGE_BACKEND'], DATA_DIR, app.config['SQLITE_PATH'])
+
+# Ping results are kept apart from device configuration so that a sweep never
+# rewrites devices.json; transitions are appended to an event log
+liveness = LivenessTable(DATA_DIR / 'device_status.json', DATA_DIR / 'device_events.jsonl')
+liveness.load(repository.devices.all())
+
+# Latency and uptime history per device, written by the monitor only
+metrics = MetricsStore(DATA_DIR / 'metrics')
+
+# Who occupied which station when, and the usage rolled up from it
+occupancy_log = OccupancyLog(DATA_DIR / 'occupancy', segment_bytes=app.config['OCCUPANCY_SEGMENT_BYTES'])
+usage_rollups = UsageRollups(occupancy_log, DATA_DIR / 'occupancy' / 'rollups.json')
+
+# Devices an admin asked to probe right away, picked up by the monitor
+probe_requests = ProbeRequests(DATA_DIR / 'probe_requests.jsonl')
 
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-# Data Models (for template compatibility)
-class User(UserMixin):
-    def __init__(self, user_data):
-        self.id = user_data['id']
-        self.username = user_data['username']
-        self.email = user_data['email']
-        self.password_hash = user_data['password_hash']
-        self.is_admin = user_data['is_admin']
-        self.created_at = datetime.fromisoformat(user_data['created_at'])
-
-class Lab:
-    def __init__(self, lab_data):
-        self.id = lab_data['id']
-        self.name = lab_data['name']
-        self.description = lab_data.get('description', '')
-        self.location = lab_data.get('location', '')
-        self.created_at = datetime.fromisoformat(lab_data['created_at'])
-        self.stations = []
-
-class Station:
-    def __init__(self, station_data):
-        self.id = station_data['id']
-        self.name = station_data['name']
-        self.description = station_data.get('description', '')
-        self.lab_id = station_data['lab_id']
-        self.is_occupied = station_data['is_occupied']
-        self.occupied_by = station_data.get('occupied_by')
-        self.occupied_at = datetime.fromisoformat(station_data['occupied_at']) if station_data.get('occupied_at') else None
-        self.occupied_until = datetime.fromisoformat(station_data['occupied_until']) if station_data.get('occupied_until') else None
-        self.is_functional = station_data.get('is_functional', True)
-        self.created_at = datetime.fromisoformat(station_data['created_at'])
-        self.devices = []
-        self.lab = None  # Will be set when needed
-
-class Device:
-    def __init__(self, device_data):
-        self.id = device_data['id']
-        self.name = device_data['name']
-        self.device_type = device_data['device_type']
-        self.ip_address = device_data['ip_address']
-        self.os_info = device_data.get('os_info', '')
-        self.special_apps = device_data.get('special_apps', '')
-        self.is_online = device_data.get('is_online', False)
-        self.last_ping = datetime.fromisoformat(device_data['last_ping']) if device_data.get('last_ping') else None
-        self.station_id = device_data['station_id']
-        self.created_at = datetime.fromisoformat(device_data['created_at'])
-        self.station = None  # Will be set when needed
-
-# File-based storage functions
-def load_json_data(filename):
-    """Load data from JSON file"""
-    if filename.exists():
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
-    return []
-
-def save_json_data(filename, data):
-    """Save data to JSON file"""
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, default=str)
-        return True
-    except Exception as e:
-        print(f"Error saving to {filename}: {e}")
-        return False
+# Users loaded on every request, rebuilt only when users.json changes
+user_cache = UserCache(repository.users)
+
+# Hashing runs in worker processes started on the first login
+password_hasher = PasswordHasher(method=app.config['PASSWORD_HASH_METHOD'],
+                                 workers=app.config['PASSWORD_WORKERS'],
+                                 queue_timeout=app.config['PASSWORD_QUEUE_TIMEOUT'],
+                                 cache=CredentialCache(ttl=app.config['PASSWORD_CACHE_TTL']))
+
+# Device and station changes pushed to /api/events subscribers
+event_broker = EventBroker(max_subscriptions=app.config['EVENT_STREAMS'])
+
+# Station counters for the dashboard, updated as stations are written
+station_stats = StationStats(repository.labs, repository.stations)
+
+# Future bookings per station, sorted by start time
+reservation_index = ReservationIndex(repository.reservations)
+
+# Bitmaps of free/functional stations and of the device terms each station offers
+station_search_index = StationSearchIndex(repository.stations, repository.devices)
+
+# Sorted, searchable rows of the admin panel tables
+admin_tables = build_tables(repository, liveness)
 
-def get_next_id(data_list):
-    """Get next available ID for a list of objects"""
-    if not data_list:
-        return 1
-    return max(item.get('id', 0) for item in data_list) + 1
+# Rendered fragments, re-rendered only when the records they show change
+entity_versions = EntityVersions((repository.users, repository.labs, repository.stations, repository.devices))
+fragment_cache = FragmentCache()
 
 # File-based user management
 def get_user_by_username(username):
     """Get user by username from file storage"""
-    users = load_json_data(USERS_FILE)
-    for user in users:
-        if user.get('username') == username:
-            return user
-    return None
+    return repository.users.first('username', username)
 
 # File-based data management functions
+_lab_graph = None
+_lab_graph_lock = threading.Lock()
+
+def get_lab_graph():
+    """Get the shared Lab/Station/Device graph, rebuilding it only after a data change"""
+    global _lab_graph
+    labs_version, labs_data = repository.labs.snapshot()
+    stations_version, stations_data = repository.stations.snapshot()
+    devices_version, devices_data = repository.devices.snapshot()
+    key = (labs_version, stations_version, devices_version)
+    
+    graph = _lab_graph
+    if graph is None or graph.key != key:
+        with _lab_graph_lock:
+            graph = _lab_graph
+            if graph is None or graph.key != key:
+                graph = LabGraph(labs_data, stations_data, devices_data, key=key, liveness=liveness)
+                _lab_graph = graph
+    return graph
+
 def get_all_labs():
     """Get all labs from file storage"""
-    labs_data = load_json_data(LABS_FILE)
-    stations_data = load_json_data(STATIONS_FILE)
-    devices_data = load_json_data(DEVICES_FILE)
-    
-    labs = []
-    for lab_data in labs_data:
-        lab = Lab(lab_data)
-        
-        # Get stations for this lab
-        for station_data in stations_data:
-            if station_data['lab_id'] == lab.id:
-                station = Station(station_data)
-                
-                # Get devices for this station
-                for device_data in devices_data:
-                    if device_data['station_id'] == station.id:
-                        device = Device(device_data)
-                        station.devices.append(device)
-                
-                lab.stations.append(station)
-        
-        labs.append(lab)
-    return labs
+    return get_lab_graph().labs
 
 def get_lab_by_id(lab_id):
     """Get a specific lab by ID"""
-    labs = get_all_labs()
-    for lab in labs:
-        if lab.id == lab_id:
-            return lab
-    return None
+    return get_lab_graph().labs_by_id.get(lab_id)
 
 def get_station_by_id(station_id):
     """Get a specific station by ID"""
-    stations_data = load_json_data(STATIONS_FILE)
-    devices_data = load_json_data(DEVICES_FILE)
-    labs_data = load_json_data(LABS_FILE)
-    
-    for station_data in stations_data:
-        if station_data['id'] == station_id:
-            station = Station(station_data)
-            
-            # Get lab for this station
-            for lab_data in labs_data:
-                if lab_data['id'] == station.lab_id:
-                    station.lab = Lab(lab_data)
-                    break
-            
-            # Get devices for this station
-            for device_data in devices_data:
-                if device_data['station_id'] == station.id:
-                    device = Device(device_data)
-                    station.devices.append(device)
-            
-            return station
-    return None
+    return get_lab_graph().stations_by_id.get(station_id)
 
 def get_all_stations():
     """Get all stations from file storage"""
-    stations_data = load_json_data(STATIONS_FILE)
-    devices_data = load_json_data(DEVICES_FILE)
-    labs_data = load_json_data(LABS_FILE)
-    
-    stations = []
-    for station_data in stations_data:
-        station = Station(station_data)
-        
-        # Get lab for this station
-        for lab_data in labs_data:
-            if lab_data['id'] == station.lab_id:
-                station.lab = Lab(lab_data)
-                break
-        
-        # Get devices for this station
-        for device_data in devices_data:
-            if device_data['station_id'] == station.id:
-                device = Device(device_data)
-                station.devices.append(device)
-        
-        stations.append(station)
-    return stations
+    return get_lab_graph().stations
 
 def get_all_devices():
     """Get all devices from file storage"""
-    devices_data = load_json_data(DEVICES_FILE)
-    stations_data = load_json_data(STATIONS_FILE)
-    
-    devices = []
-    for device_data in devices_data:
-        device = Device(device_data)
-        
-        # Get station for this device
-        for station_data in stations_data:
-            if station_data['id'] == device.station_id:
-                device.station = Station(station_data)
-                break
-        
-        devices.append(device)
-    return devices
+    return get_lab_graph().devices
 
 def get_device_by_id(device_id):
     """Get a specific device by ID"""
-    devices_data = load_json_data(DEVICES_FILE)
-    for device_data in devices_data:
-        if device_data['id'] == device_id:
-            return Device(device_data)
-    return None
+    return get_lab_graph().devices_by_id.get(device_id)
+
+def get_lab_with_stations(lab_id, with_devices=False):
+    """Get one lab with its stations (and their devices), without hydrating the rest of the inventory"""
+    lab_data = repository.labs.get(lab_id)
+    if not lab_data:
+        return None
+    lab = Lab(lab_data)
+    for station_data in repository.stations.find('lab_id', lab_id):
+        station = Station(station_data)
+        station.lab = lab
+        if with_devices:
+            attach_devices(station)
+        lab.stations.append(station)
+    return lab
+
+def get_station_with_devices(station_id):
+    """Get one station with its lab and devices"""
+    station_data = repository.stations.get(station_id)
+    if not station_data:
+        return None
+    station = Station(station_data)
+    lab_data = repository.labs.get(station.lab_id)
+    station.lab = Lab(lab_data) if lab_data else None
+    attach_devices(station)
+    return station
+
+def attach_devices(station):
+    for device_data in repository.devices.find('station_id', station.id):
+        device = Device(device_data, liveness)
+        device.station = station
+        station.devices.append(device)
+
+def render_lab_tab(lab_id):
+    """Rendered contents of one lab tab on the index page, cached until the lab or its stations change"""
+    stamp = entity_versions.stamp(('labs', lab_id), ('lab_stations', lab_id))
+    return Markup(fragment_cache.get_or_render(
+        ('lab_tab', lab_id), stamp,
+        lambda: render_template('lab_tab.html', lab=get_lab_with_stations(lab_id))
+    ))
 
 def get_all_users():
     """Get all users from file storage"""
-    users_data = load_json_data(USERS_FILE)
-    return [User(user_data) for user_data in users_data]
+    return user_cache.all()
 
 def create_user(username, email, password, is_admin=False):
     """Create a new user in file storage"""
-    users = load_json_data(USERS_FILE)
-    user_id = get_next_id(users)
-    
-    new_user = {
-        'id': user_id,
-        'username': username,
-        'email': email,
-        'password_hash': generate_password_hash(password),
-        'is_admin': is_admin,
-        'created_at': datetime.now().isoformat()
-    }
-    
-    users.append(new_user)
-    if save_json_data(USERS_FILE, users):
-        return new_user
-    return None
+    try:
+        new_user = {
+            'username': username,
+            'email': email,
+            'password_hash': password_hasher.hash(password),
+            'is_admin': is_admin,
+            'created_at': datetime.now().isoformat()
+        }
+        return repository.users.insert(new_user)
+    except HasherBusy:
+        print(f"Error saving user {username}: password hashing is busy")
+        return None
+    except OSError as e:
+        print(f"Error saving user {username}: {e}")
+        return None
 
 def get_user_by_id(user_id):
     """Get user by ID from file storage"""
-    users = load_json_data(USERS_FILE)
-    for user in users:
-        if user.get('id') == user_id:
-            return user
-    return None
+    return repository.users.get(user_id)
 
 @login_manager.user_loader
 def load_user(user_id):
-    user_data = get_user_by_id(int(user_id))
-    if user_data:
-        return User(user_data)
-    return None
+    return user_cache.get(int(user_id))
+
+# Cached lab and station pages
+def render_slot(name, obj):
+    """Render the per-user part of a cached page for the current user"""
+    return get_template_attribute('page_slots.html', name)(obj, current_user)
+
+def render_cached_content(key, stamp, template, load):
+    """Render a page body through the fragment cache and fill in its per-user slots
+
+    load() returns the template context and the objects the slots refer to,
+    grouped by kind; it is only called when the cached body is missing or stale.
+    """
+    def render():
+        context, objects = load()
+        return render_template(template, **context), objects
+    html, objects = fragment_cache.get_or_render(key, stamp, render)
+    return Markup(fill_slots(html, objects, render_slot))
+
+def load_lab_page(lab_id):
+    lab = get_lab_with_stations(lab_id, with_devices=True)
+    objects = {
+        'lab': {lab.id: lab},
+        'station': {station.id: station for station in lab.stations}
+    }
+    return {'lab': lab}, objects
+
+def load_station_page(station_id, occupied_by):
+    station = get_station_with_devices(station_id)
+    occupied_by_user = user_cache.get(int(occupied_by)) if occupied_by else None
+    objects = {
+        'station': {station.id: station},
+        'device': {device.id: device for device in station.devices}
+    }
+    return {'station': station, 'occupied_by_user': occupied_by_user}, objects
+
+# Live status events
+def publish_station_event(station_data, status):
+    """Tell subscribers a station was occupied, released or auto-released"""
+    event_broker.publish('station', {
+        'station_id': station_data['id'],
+        'lab_id': station_data['lab_id'],
+        'status': status,
+        'occupied_by': station_data.get('occupied_by'),
+        'occupied_until': station_data.get('occupied_until')
+    })
+
+def publish_device_event(transition):
+    """Tell subscribers a device went online or offline"""
+    device_data = repository.devices.get(transition['device_id'])
+    if not device_data:
+        return
+    station_data = repository.stations.get(device_data['station_id'])
+    event_broker.publish('device', {
+        'device_id': device_data['id'],
+        'station_id': device_data['station_id'],
+        'lab_id': station_data['lab_id'] if station_data else None,
+        'is_online': transition['is_online'],
+        'last_ping': transition['at']
+    })
+
+def record_occupancy(event_type, station_data, occupation=None):
+    """Append an occupy, release, auto_release or extend event to the occupancy log
+
+    occupation is the station record holding the occupation the event is
+    about; releases pass the record from before the release.
+    """
+    occupation = occupation or station_data
+    occupancy_log.append({
+        'type': event_type,
+        'at': datetime.now().isoformat(),
+        'station_id': station_data['id'],
+        'lab_id': station_data['lab_id'],
+        'user_id': occupation.get('occupied_by'),
+        'occupied_at': occupation.get('occupied_at'),
+        'occupied_until': occupation.get('occupied_until')
+    })
 
 # Auto-release monitoring thread
+def release_expired_station(station_id, occupied_until):
+    """Release a station whose occupation expired, unless it was re-occupied meanwhile"""
+    occupation = repository.stations.get(station_id)
+    released = repository.stations.update(station_id, {
+        'is_occupied': False,
+        'occupied_by': None,
+        'occupied_at': None,
+        'occupied_until': None
+    }, expect={'is_occupied': True, 'occupied_until': occupied_until})
+    if released:
+        print(f"Auto-released station {released['name']} (ID: {station_id})")
+        record_occupancy('auto_release', released, occupation)
+        publish_station_event(released, 'auto_released')
+
+# Wakes exactly at the next occupied_until instead of scanning every minute
+expiry_scheduler = ExpiryScheduler(release_expired_station)
+
+# Set once the auto-release and reservation loops run in this process. Web
+# workers following a separate monitor leave scheduling to it, which picks
+# up their writes from storage; their own heaps would never be drained.
+_schedulers_running = False
+
+def schedule_expiry(station_id, occupied_until):
+    """Set (or clear, with None) a station's auto-release deadline if the loop runs here"""
+    if _schedulers_running:
+        expiry_scheduler.schedule(station_id, occupied_until)
+
+def schedule_reservation_start(reservation_id, starts_at):
+    """Set (or clear, with None) when a reservation is handed its station, if the loop runs here"""
+    if _schedulers_running:
+        reservation_scheduler.schedule(reservation_id, starts_at)
+
+# Station reservations
+def upcoming_reservation_starts():
+    """{reservation_id: starts_at} of every reservation that has not ended yet"""
+    now = datetime.now().isoformat()
+    return {
+        reservation_data['id']: reservation_data['starts_at']
+        for reservation_data in repository.reservations.all()
+        if reservation_data['ends_at'] > now
+    }
+
+def start_reservation(reservation_id, starts_at):
+    """Hand a station over to the user whose reservation starts now"""
+    reservation = repository.reservations.get(reservation_id)
+    if not reservation or reservation['starts_at'] != starts_at:
+        return
+    if reservation['ends_at'] <= datetime.now().isoformat():
+        return
+    station_data = repository.stations.get(reservation['station_id'])
+    if (not station_data or station_data.get('is_occupied') and station_data.get('occupied_by') == reservation['user_id']
+            and station_data.get('occupied_until') == reservation['ends_at']):
+        # Gone, or already handed over
+        return
+    
+    started = None
+    with repository.stations.transaction() as stations_data:
+        for record in stations_data:
+            if record['id'] == reservation['station_id']:
+                if not record.get('is_functional', True):
+                    # Marked out of order after it was booked
+                    print(f"Station {record['name']} is non-functional; reservation {reservation_id} not started")
+                    break
+                occupation = occupation_interval(record)
+                # An occupation ending at the reservation's start is simply
+                # replaced, even if its auto-release has not run yet
+                if occupation and occupation[1] > datetime.fromisoformat(starts_at):
+                    print(f"Station {record['name']} is still occupied; reservation {reservation_id} not started")
+                    break
+                record.update({
+                    'is_occupied': True,
+                    'occupied_by': reservation['user_id'],
+                    'occupied_at': starts_at,
+                    'occupied_until': reservation['ends_at']
+                })
+                started = record
+                break
+    if started:
+        print(f"Station {started['name']} handed over to reservation {reservation_id}")
+        schedule_expiry(started['id'], started['occupied_until'])
+        record_occupancy('occupy', started)
+        publish_station_event(started, 'occupied')
+
+# Wakes at the start of the next reservation
+reservation_scheduler = ExpiryScheduler(start_reservation)
+
+def run_reservations():
+    """Start reservations as their time comes"""
+    # Pick up reservations that started while the app was down
+    reservation_scheduler.reset(upcoming_reservation_starts())
+    reservation_scheduler.run()
+
+def book_station(station_id, user_id, starts_at, ends_at):
+    """Store a reservation of [starts_at, ends_at) and return (reservation, None), or (None, error message)"""
+    station_data = repository.stations.get(station_id)
+    occupation = occupation_interval(station_data)
+    if occupation and occupation[0] < ends_at and starts_at < occupation[1]:
+        if occupation[1] == datetime.max:
+            return None, 'The station is occupied with no end time'
+        return None, f'The station is occupied until {occupation[1].strftime("%Y-%m-%d %H:%M")}'
+    # Fast check against the index, then again under the write lock in case
+    # another worker booked the same slot meanwhile
+    if reservation_index.conflict(station_id, starts_at, ends_at) is not None:
+        return None, 'The station is already reserved for part of that time'
+    
+    reservation = {
+        'id': repository.reservations.reserve_ids(1)[0],
+        'station_id': station_id,
+        'user_id': user_id,
+        'starts_at': starts_at.isoformat(),
+        'ends_at': ends_at.isoformat(),
+        'created_at': datetime.now().isoformat()
+    }
+    with repository.reservations.transaction() as reservations_data:
+        for other in reservations_data:
+            if (other['station_id'] == station_id and other['starts_at'] < reservation['ends_at']
+                    and reservation['starts_at'] < other['ends_at']):
+                return None, 'The station is already reserved for part of that time'
+        reservations_data.append(reservation)
+    schedule_reservation_start(reservation['id'], reservation['starts_at'])
+    return reservation, None
+
+def end_active_reservation(station_id, user_id):
+    """Cut short the reservation a user is holding the station with, so the rest of its slot is free"""
+    now = datetime.now()
+    for starts_at, ends_at, reservation_id in reservation_index.for_station(station_id, after=now)[:1]:
+        if starts_at <= now:
+            repository.reservations.update(reservation_id, {'ends_at': now.isoformat()},
+                                           expect={'user_id': user_id})
+
 def auto_release_stations():
     """Automatically release stations whose time has expired"""
-    while True:
-        try:
-            stations_data = load_json_data(STATIONS_FILE)
-            current_time = datetime.now()
-            updated = False
-            
-            for station_data in stations_data:
-                if (station_data['is_occupied'] and 
-                    station_data['occupied_until'] and 
-                    datetime.fromisoformat(station_data['occupied_until']) <= current_time):
-                    
-                    # Auto-release the station
-                    station_data['is_occupied'] = False
-                    station_data['occupied_by'] = None
-                    station_data['occupied_at'] = None
-                    station_data['occupied_until'] = None
-                    updated = True
-                    print(f"Auto-released station {station_data['name']} (ID: {station_data['id']})")
-            
-            if updated:
-                save_json_data(STATIONS_FILE, stations_data)
-                
-        except Exception as e:
-            print(f"Error in auto-release monitoring: {e}")
-        
-        time.sleep(60)  # Check every minute
+    # Pick up reservations that were made (or expired) while the app was down
+    expiry_scheduler.rebuild(repository.stations.all())
+    expiry_scheduler.run()
 
 # Ping monitoring thread
+def occupied_station_ids(stations_data):
+    return {station_data['id'] for station_data in stations_data if station_data.get('is_occupied')}
+
+def record_probe_results(results):
+    """Store a sweep's results in the liveness table, then in the latency history"""
+    # Only the liveness table is updated; devices.json is left alone
+    for event in liveness.record_sweep(results):
+        status = "online" if event['is_online'] else "offline"
+        print(f"Device {event['device_id']} is now {status}")
+        device_data = repository.devices.get(event['device_id'])
+        if device_data:
+            # Cached lab and station pages show the online badge
+            entity_versions.touch(('station_status', device_data['station_id']))
+        publish_device_event(event)
+    
+    # The history is extra; a failure there must not lose the sweep's status
+    try:
+        metrics.record(results)
+    except Exception as e:
+        print(f"Error recording device metrics: {e}")
+
 def ping_devices():
+    """Probe each device when its own schedule says it is due"""
+    schedule = ProbeSchedule(interval=app.config['PING_INTERVAL'],
+                             occupied_interval=app.config['PING_OCCUPIED_INTERVAL'],
+                             max_backoff=app.config['PING_MAX_BACKOFF'])
+    devices_version = stations_version = None
+    occupied = set()
     while True:
         try:
-            devices_data = load_json_data(DEVICES_FILE)
-            updated = False
-            
-            for device_data in devices_data:
-                try:
-                    result = ping(device_data['ip_address'], timeout=2)
-                    device_data['is_online'] = result is not None
-                    device_data['last_ping'] = datetime.now().isoformat()
-                    updated = True
-                except:
-                    device_data['is_online'] = False
-                    device_data['last_ping'] = datetime.now().isoformat()
-                    updated = True
+            version, devices_data = repository.devices.snapshot()
+            if version != devices_version:
+                schedule.sync(devices_data)
+                # Deleted devices give their rows of the latency history to new ones
+                metrics.retain(device_data['id'] for device_data in devices_data)
+                devices_version = version
+            version, stations_data = repository.stations.snapshot()
+            if version != stations_version:
+                current = occupied_station_ids(stations_data)
+                newly_occupied, occupied = current - occupied, current
+                # Devices of a station that was just occupied move to the shorter interval
+                schedule.expedite([device_data['id'] for station_id in newly_occupied
+                                   for device_data in repository.devices.find('station_id', station_id)],
+                                  within=app.config['PING_OCCUPIED_INTERVAL'])
+                stations_version = version
+            schedule.expedite(probe_requests.take())
             
-            if updated:
-                save_json_data(DEVICES_FILE, devices_data)
+            due = schedule.take_due()
+            if due:
+                results = probe_sweep(due,
+                                      probe_types=app.config['PROBE_TYPES'],
+                                      concurrency=app.config['PING_CONCURRENCY'],
+                                      per_subnet=app.config['PING_PER_SUBNET'],
+                                      timeout=app.config['PING_TIMEOUT'],
+                                      deadline=app.config['PING_DEADLINE'])
+                schedule.reschedule(due, results, occupied)
+                record_probe_results(results)
                 
         except Exception as e:
             print(f"Error in ping monitoring: {e}")
         
-        time.sleep(30)  # Ping every 30 seconds
+        # Sleep until the next device is due, but look for new devices,
+        # occupied stations and re-probe requests every check interval
+        delay = app.config['MONITOR_CHECK_INTERVAL']
+        next_due = schedule.next_due()
+        if next_due is not None:
+            delay = min(delay, max(0, next_due - time.monotonic()))
+        time.sleep(delay)
+
+def watch_stations():
+    """Rebuild the expiry and reservation schedules whenever the stations or
+    reservations change, e.g. a web worker occupied or booked one"""
+    version = reservations_version = None
+    while True:
+        try:
+            stations_version, stations_data = repository.stations.snapshot()
+            if stations_version != version:
+                expiry_scheduler.rebuild(stations_data)
+                version = stations_version
+            current_version, _ = repository.reservations.snapshot()
+            if current_version != reservations_version:
+                reservation_scheduler.reset(upcoming_reservation_starts())
+                reservations_version = current_version
+        except Exception as e:
+            print(f"Error watching stations: {e}")
+        time.sleep(app.config['MONITOR_CHECK_INTERVAL'])
+
+def start_monitor_threads():
+    """Run the ping and auto-release loops as threads of the web process (development server)"""
+    global _schedulers_running
+    _schedulers_running = True
+    ping_thread = threading.Thread(target=ping_devices, daemon=True)
+    ping_thread.start()
+    
+    auto_release_thread = threading.Thread(target=auto_release_stations, daemon=True)
+    auto_release_thread.start()
+    
+    reservation_thread = threading.Thread(target=run_reservations, daemon=True)
+    reservation_thread.start()
+
+def run_monitor():
+    """Run the ping and auto-release loops in this process for web workers in other processes"""
+    # Web workers only see ping results once they reach the sidecar file
+    liveness.flush_interval = app.config['PING_INTERVAL']
+    start_monitor_threads()
+    watch_stations()
+
+# Following a separate monitor process from a web worker
+_stations_seen = None  # (version, records) of the stations this worker's subscribers know about
+_stations_seen_lock = threading.Lock()
+_follower_pid = None
+_follower_lock = threading.Lock()
+
+def remember_local_station_change(previous_version, version, changes):
+    """Stations listener: routes in this process publish their own station events"""
+    global _stations_seen
+    with _stations_seen_lock:
+        if _stations_seen is not None:
+            _stations_seen = repository.stations.snapshot()
+
+repository.stations.add_listener(remember_local_station_change)
+
+def publish_external_changes():
+    """Pass ping results and station changes written by other processes on to this worker"""
+    global _stations_seen
+    for device_id in liveness.refresh():
+        device_data = repository.devices.get(device_id)
+        if device_data:
+            entity_versions.touch(('station_status', device_data['station_id']))
+        status = liveness.get(device_id)
+        publish_device_event({'device_id': device_id, 'is_online': status['is_online'], 'at': status['last_ping']})
+    
+    with _stations_seen_lock:
+        seen = _stations_seen
+        current = repository.stations.snapshot()
+        _stations_seen = current
+    if seen is None or seen[0] == current[0]:
+        return
+    for old, new in diff_records(seen[1], current[1]):
+        if old is not None and new is not None and old.get('is_occupied') != new.get('is_occupied'):
+            publish_station_event(new, 'occupied' if new.get('is_occupied') else 'released')
+
+def follow_monitor():
+    while True:
+        try:
+            publish_external_changes()
+        except Exception as e:
+            print(f"Error following the monitor process: {e}")
+        time.sleep(app.config['MONITOR_CHECK_INTERVAL'])
+
+@app.before_request
+def start_monitor_follower():
+    """In 'external' monitor mode, start following the monitor on a worker's first request"""
+    global _follower_pid
+    # Compared with the pid so that a worker forked from a process that
+    # already follows still starts its own thread
+    if app.config['MONITOR_MODE'] != 'external' or _follower_pid == os.getpid():
+        return
+    with _follower_lock:
+        if _follower_pid != os.getpid():
+            _follower_pid = os.getpid()
+            threading.Thread(target=follow_monitor, daemon=True).start()
+
+def ensure_admin_user():
+    """Create the default admin account if there is none"""
+    admin_data = get_user_by_username('admin')
+    if not admin_data:
+        create_user('admin', 'admin@swlabs.com', 'admin123', is_admin=True)
+        print("✓ Admin user created in file storage")
 
 # Routes
 @app.route('/')
 def index():
-    labs = get_all_labs()
-    
-    # Calculate statistics
-    total_labs = len(labs)
-    total_stations = sum(len(lab.stations) for lab in labs)
-    available_stations = sum(len([s for s in lab.stations if not s.is_occupied]) for lab in labs)
-    occupied_stations = sum(len([s for s in lab.stations if s.is_occupied]) for lab in labs)
+    # Only the first tab is rendered here; the others are fetched from
+    # lab_tab when they are first opened
+    labs = [Lab(lab_data) for lab_data in repository.labs.all()]
+    first_lab_tab = render_lab_tab(labs[0].id) if labs else None
+    stats = station_stats.totals()
     
     return render_template('index.html', 
                          labs=labs, 
-                         total_labs=total_labs,
-                         total_stations=total_stations,
-                         available_stations=available_stations,
-                         occupied_stations=occupied_stations)
+                         first_lab_tab=first_lab_tab,
+                         total_labs=stats['total_labs'],
+                         total_stations=stats['total_stations'],
+                         available_stations=stats['available_stations'],
+                         occupied_stations=stats['occupied_stations'])
+
+@app.route('/lab/<int:lab_id>/tab')
+def lab_tab(lab_id):
+    """Contents of one index page lab tab, loaded when the tab is first opened"""
+    if not repository.labs.get(lab_id):
+        return 'Lab not found', 404
+    return render_lab_tab(lab_id)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -342,18 +666,28 @@ def login():
         password = request.form['password']
         
         user_data = get_user_by_username(username)
-        if user_data:
-            user = User(user_data)
-            if check_password_hash(user.password_hash, password):
-                login_user(user)
+        try:
+            if user_data and password_hasher.verify(user_data['id'], user_data.get('password_hash'), password):
+                rehash_password(user_data, password)
+                login_user(User(user_data))
                 return redirect(url_for('index'))
-            else:
-                flash('Invalid username or password')
-        else:
-            flash('Invalid username or password')
+        except HasherBusy:
+            flash('The server is busy, please try again in a moment')
+            return render_template('login.html'), 503
+        flash('Invalid username or password')
     
     return render_template('login.html')
 
+def rehash_password(user_data, password):
+    """Store a new hash of password when the user's was made with another work factor"""
+    if not password_hasher.needs_rehash(user_data['password_hash']):
+        return
+    new_hash = password_hasher.hash(password)
+    # Skipped if the password was changed meanwhile
+    if repository.users.update(user_data['id'], {'password_hash': new_hash},
+                               expect={'password_hash': user_data['password_hash']}):
+        password_hasher.cache.remember(user_data['id'], new_hash, password)
+
 @app.route('/logout')
 @login_required
 def logout():
@@ -362,26 +696,39 @@ def logout():
 
 @app.route('/lab/<int:lab_id>')
 def lab_detail(lab_id):
-    lab = get_lab_by_id(lab_id)
-    if not lab:
+    lab_data = repository.labs.get(lab_id)
+    if not lab_data:
         flash('Lab not found')
         return redirect(url_for('index'))
-    return render_template('lab_detail.html', lab=lab)
+    
+    # Re-rendered only when the lab, its stations, their devices or the
+    # devices' online state change
+    station_ids = [station_data['id'] for station_data in repository.stations.find('lab_id', lab_id)]
+    stamp = entity_versions.stamp(
+        ('labs', lab_id), ('lab_stations', lab_id),
+        *[('station_devices', station_id) for station_id in station_ids],
+        *[('station_status', station_id) for station_id in station_ids]
+    )
+    content = render_cached_content(('lab_detail', lab_id), stamp, 'lab_detail_content.html',
+                                    lambda: load_lab_page(lab_id))
+    return render_template('lab_detail.html', lab_name=lab_data['name'], content=content)
 
 @app.route('/station/<int:station_id>')
 def station_detail(station_id):
-    station = get_station_by_id(station_id)
-    if not station:
+    station_data = repository.stations.get(station_id)
+    if not station_data:
         flash('Station not found')
         return redirect(url_for('index'))
     
-    occupied_by_user = None
-    if station.is_occupied and station.occupied_by:
-        user_data = get_user_by_id(int(station.occupied_by))
-        if user_data:
-            occupied_by_user = User(user_data)
-            
-    return render_template('station_detail.html', station=station, occupied_by_user=occupied_by_user)
+    occupied_by = station_data.get('occupied_by') if station_data.get('is_occupied') else None
+    stamp = entity_versions.stamp(
+        ('stations', station_id), ('labs', station_data['lab_id']),
+        ('station_devices', station_id), ('station_status', station_id),
+        ('users', occupied_by)
+    )
+    content = render_cached_content(('station_detail', station_id), stamp, 'station_detail_content.html',
+                                    lambda: load_station_page(station_id, occupied_by))
+    return render_template('station_detail.html', station_name=station_data['name'], content=content)
 
 @app.route('/occupy_station/<int:station_id>', methods=['GET', 'POST'])
 @login_required
@@ -416,16 +763,26 @@ def occupy_station(station_id):
         if occupation_until_str:
             occupation_until = datetime.fromisoformat(occupation_until_str.replace('T', ' '))
     
-    # Update file-based storage
-    stations_data = load_json_data(STATIONS_FILE)
-    for station_data in stations_data:
-        if station_data['id'] == station_id:
-            station_data['is_occupied'] = True
-            station_data['occupied_by'] = current_user.id
-            station_data['occupied_at'] = datetime.now().isoformat()
-            station_data['occupied_until'] = occupation_until.isoformat() if occupation_until else None
-            break
-    save_json_data(STATIONS_FILE, stations_data)
+    # An occupation must end before the station's next reservation starts
+    booked = reservation_index.for_station(station_id, after=datetime.now())
+    if booked and booked[0][0] < (occupation_until or datetime.max):
+        flash(f'Station is reserved from {booked[0][0].strftime("%Y-%m-%d %H:%M")}; '
+              f'choose an end time before then')
+        return redirect(url_for('occupy_station', station_id=station_id))
+    
+    # Update file-based storage, unless someone else occupied it meanwhile
+    occupied = repository.stations.update(station_id, {
+        'is_occupied': True,
+        'occupied_by': current_user.id,
+        'occupied_at': datetime.now().isoformat(),
+        'occupied_until': occupation_until.isoformat() if occupation_until else None
+    }, expect={'is_occupied': False})
+    if not occupied:
+        flash('Station is already occupied')
+        return redirect(url_for('station_detail', station_id=station_id))
+    schedule_expiry(station_id, occupied['occupied_until'])
+    record_occupancy('occupy', occupied)
+    publish_station_event(occupied, 'occupied')
     
     if occupation_until:
         flash(f'Station occupied successfully until {occupation_until.strftime("%Y-%m-%d %H:%M")}')
@@ -450,20 +807,143 @@ def release_station(station_id):
         flash('You can only release stations you occupied')
         return redirect(url_for('station_detail', station_id=station_id))
     
-    # Update file-based storage
-    stations_data = load_json_data(STATIONS_FILE)
-    for station_data in stations_data:
-        if station_data['id'] == station_id:
-            station_data['is_occupied'] = False
-            station_data['occupied_by'] = None
-            station_data['occupied_at'] = None
-            station_data['occupied_until'] = None
-            break
-    save_json_data(STATIONS_FILE, stations_data)
+    # Update file-based storage, unless the occupation changed meanwhile
+    occupation = repository.stations.get(station_id)
+    released = repository.stations.update(station_id, {
+        'is_occupied': False,
+        'occupied_by': None,
+        'occupied_at': None,
+        'occupied_until': None
+    }, expect={'is_occupied': True, 'occupied_by': station.occupied_by})
+    if not released:
+        flash('Station occupation changed, please try again')
+        return redirect(url_for('station_detail', station_id=station_id))
+    schedule_expiry(station_id, None)
+    end_active_reservation(station_id, station.occupied_by)
+    record_occupancy('release', released, occupation)
+    publish_station_event(released, 'released')
     
     flash('Station released successfully')
     return redirect(url_for('station_detail', station_id=station_id))
 
+@app.route('/station/<int:station_id>/extend', methods=['POST'])
+@login_required
+def extend_station(station_id):
+    """Push back the end of the current user's occupation by extend_hours"""
+    station_data = repository.stations.get(station_id)
+    if not station_data:
+        flash('Station not found')
+        return redirect(url_for('index'))
+    if not station_data.get('is_occupied') or not station_data.get('occupied_until'):
+        flash('Only occupations with an end time can be extended')
+        return redirect(url_for('station_detail', station_id=station_id))
+    if station_data['occupied_by'] != current_user.id and not current_user.is_admin:
+        flash('You can only extend stations you occupied')
+        return redirect(url_for('station_detail', station_id=station_id))
+    
+    hours = request.form.get('extend_hours', 1, type=int)
+    if not hours or hours < 1:
+        flash('Extend by at least one hour')
+        return redirect(url_for('station_detail', station_id=station_id))
+    current_until = datetime.fromisoformat(station_data['occupied_until'])
+    occupied_until = max(current_until, datetime.now()) + timedelta(hours=hours)
+    
+    # Like a new occupation, the extension must end before the next reservation
+    # (one the user is holding the station with ends where the extension starts)
+    booked = [interval for interval in reservation_index.for_station(station_id, after=current_until)
+              if interval[0] >= current_until]
+    if booked and booked[0][0] < occupied_until:
+        flash(f'Station is reserved from {booked[0][0].strftime("%Y-%m-%d %H:%M")}; it cannot be extended past then')
+        return redirect(url_for('station_detail', station_id=station_id))
+    
+    extended = repository.stations.update(station_id, {'occupied_until': occupied_until.isoformat()}, expect={
+        'is_occupied': True,
+        'occupied_by': station_data['occupied_by'],
+        'occupied_until': station_data['occupied_until']
+    })
+    if not extended:
+        flash('Station occupation changed, please try again')
+        return redirect(url_for('station_detail', station_id=station_id))
+    schedule_expiry(station_id, extended['occupied_until'])
+    record_occupancy('extend', extended)
+    publish_station_event(extended, 'extended')
+    
+    flash(f'Station occupied until {occupied_until.strftime("%Y-%m-%d %H:%M")}')
+    return redirect(url_for('station_detail', station_id=station_id))
+
+@app.route('/station/<int:station_id>/reservations', methods=['GET', 'POST'])
+@login_required
+def station_reservations(station_id):
+    station = get_station_by_id(station_id)
+    if not station:
+        flash('Station not found')
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        try:
+            starts_at = datetime.fromisoformat(request.form['starts_at'])
+            ends_at = datetime.fromisoformat(request.form['ends_at'])
+        except (KeyError, ValueError):
+            flash('Please enter a valid start and end time')
+            return redirect(url_for('station_reservations', station_id=station_id))
+        if ends_at <= starts_at or ends_at <= datetime.now():
+            flash('The reservation must end after it starts, and in the future')
+            return redirect(url_for('station_reservations', station_id=station_id))
+        if not station.is_functional:
+            flash('Station is marked as non-functional')
+            return redirect(url_for('station_reservations', station_id=station_id))
+        
+        # A slot that has already begun is booked from now
+        starts_at = max(starts_at, datetime.now())
+        reservation, error = book_station(station_id, current_user.id, starts_at, ends_at)
+        if error:
+            flash(error)
+        else:
+            flash(f'Station reserved from {starts_at.strftime("%Y-%m-%d %H:%M")} '
+                  f'to {ends_at.strftime("%Y-%m-%d %H:%M")}')
+        return redirect(url_for('station_reservations', station_id=station_id))
+    
+    now = datetime.now()
+    reservations = []
+    for starts_at, ends_at, reservation_id in reservation_index.for_station(station_id, after=now):
+        reservation_data = repository.reservations.get(reservation_id)
+        if reservation_data:
+            reservations.append({
+                'id': reservation_id,
+                'starts_at': starts_at,
+                'ends_at': ends_at,
+                'user': user_cache.get(reservation_data['user_id']),
+                'user_id': reservation_data['user_id']
+            })
+    occupation = occupation_interval(repository.stations.get(station_id))
+    next_free = reservation_index.next_free(station_id, now, timedelta(hours=1),
+                                            busy_until=occupation[1] if occupation else None)
+    return render_template('station_reservations.html', station=station,
+                           reservations=reservations, next_free=next_free)
+
+@app.route('/reservation/<int:reservation_id>/cancel', methods=['POST'])
+@login_required
+def cancel_reservation(reservation_id):
+    reservation_data = repository.reservations.get(reservation_id)
+    if not reservation_data:
+        flash('Reservation not found')
+        return redirect(url_for('index'))
+    station_id = reservation_data['station_id']
+    
+    if reservation_data['user_id'] != current_user.id and not current_user.is_admin:
+        flash('You can only cancel your own reservations')
+        return redirect(url_for('station_reservations', station_id=station_id))
+    if reservation_data['starts_at'] <= datetime.now().isoformat():
+        flash('This reservation has started; release the station instead')
+        return redirect(url_for('station_reservations', station_id=station_id))
+    
+    with repository.reservations.transaction() as reservations_data:
+        reservations_data[:] = [record for record in reservations_data if record['id'] != reservation_id]
+    schedule_reservation_start(reservation_id, None)
+    
+    flash('Reservation cancelled')
+    return redirect(url_for('station_reservations', station_id=station_id))
+
 # Admin routes
 @app.route('/admin')
 @login_required
@@ -472,12 +952,56 @@ def admin_panel():
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('index'))
     
-    labs = get_all_labs()
-    stations = get_all_stations()
-    devices = get_all_devices()
-    users = get_all_users()
+    # The tables themselves are fetched a page at a time from admin_table
+    totals = station_stats.totals()
+    counts = {
+        'labs': totals['total_labs'],
+        'stations': totals['total_stations'],
+        'devices': len(repository.devices.all()),
+        'users': len(repository.users.all())
+    }
+    return render_template('admin_panel.html', counts=counts, page_size=app.config['ADMIN_PAGE_SIZE'])
+
+@app.route('/admin/table/<table_name>')
+@login_required
+def admin_table(table_name):
+    """One page of an admin panel table (labs, stations, devices or users)
+
+    Query parameters: q (every word must start a word of the row), sort
+    (column name), order (asc/desc), offset and limit. Returns the rows as
+    JSON, or as rendered table rows with format=html; X-Total-Count is the
+    number of matching rows and a Link header points at the next page.
+    Device rows carry their ping state from the liveness table.
+    """
+    if not current_user.is_admin:
+        return json_error('Admin privileges required', 403)
+    table = admin_tables.get(table_name)
+    if table is None:
+        return json_error('Unknown table', 404)
+    sort = request.args.get('sort', 'id')
+    if sort not in table.columns:
+        return json_error(f"sort must be one of {', '.join(sorted(table.columns))}", 400)
+    descending = request.args.get('order', 'asc').lower() == 'desc'
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(1, min(request.args.get('limit', app.config['ADMIN_PAGE_SIZE'], type=int), 500))
+    
+    total, rows = table.page(query=request.args.get('q', ''), sort=sort, descending=descending,
+                             offset=offset, limit=limit)
+    if table_name == 'devices':
+        for row in rows:
+            row.update(device_status_entry(row))
     
-    return render_template('admin_panel.html', labs=labs, stations=stations, devices=devices, users=users)
+    if request.args.get('format') == 'html':
+        render_row = get_template_attribute('admin_rows.html', table_name)
+        response = Response(''.join(render_row(row) for row in rows), mimetype='text/html')
+    else:
+        response = jsonify(rows)
+    response.headers['X-Total-Count'] = str(total)
+    if offset + limit < total:
+        args = request.args.to_dict()
+        args.update(offset=offset + limit, limit=limit)
+        response.headers['Link'] = f'<{url_for("admin_table", table_name=table_name, **args)}>; rel="next"'
+    return response
 
 @app.route('/admin/lab/add', methods=['GET', 'POST'])
 @login_required
@@ -492,19 +1016,12 @@ def add_lab():
         location = request.form['location']
         
         # Add to file-based storage
-        labs_data = load_json_data(LABS_FILE)
-        lab_id = get_next_id(labs_data)
-        
-        new_lab = {
-            'id': lab_id,
+        repository.labs.insert({
             'name': name,
             'description': description,
             'location': location,
             'created_at': datetime.now().isoformat()
-        }
-        
-        labs_data.append(new_lab)
-        save_json_data(LABS_FILE, labs_data)
+        })
         
         flash('Lab added successfully')
         return redirect(url_for('admin_panel'))
@@ -525,11 +1042,7 @@ def add_station():
         is_functional = 'is_functional' in request.form
         
         # Add to file-based storage
-        stations_data = load_json_data(STATIONS_FILE)
-        station_id = get_next_id(stations_data)
-        
-        new_station = {
-            'id': station_id,
+        repository.stations.insert({
             'name': name,
             'description': description,
             'lab_id': lab_id,
@@ -539,10 +1052,7 @@ def add_station():
             'occupied_until': None,
             'is_functional': is_functional,
             'created_at': datetime.now().isoformat()
-        }
-        
-        stations_data.append(new_station)
-        save_json_data(STATIONS_FILE, stations_data)
+        })
         
         flash('Station added successfully')
         return redirect(url_for('admin_panel'))
@@ -558,23 +1068,44 @@ def toggle_station_functional(station_id):
         return redirect(url_for('index'))
     
     # Update file-based storage
-    stations_data = load_json_data(STATIONS_FILE)
-    station_name = None
-    for station_data in stations_data:
-        if station_data['id'] == station_id:
-            station_data['is_functional'] = not station_data['is_functional']
-            station_name = station_data['name']
-            break
+    station_data = None
+    with repository.stations.transaction() as stations_data:
+        for record in stations_data:
+            if record['id'] == station_id:
+                record['is_functional'] = not record.get('is_functional', True)
+                station_data = record
+                break
     
-    if station_name:
-        save_json_data(STATIONS_FILE, stations_data)
+    if station_data:
         status = "functional" if station_data['is_functional'] else "non-functional"
-        flash(f'Station {station_name} marked as {status}')
+        flash(f'Station {station_data["name"]} marked as {status}')
     else:
         flash('Station not found')
     
     return redirect(url_for('admin_panel'))
 
+@app.route('/admin/station/<int:station_id>/reprobe', methods=['POST'])
+@login_required
+def reprobe_station(station_id):
+    """Ask the monitor to probe every device of a station now, ignoring their schedules"""
+    if not current_user.is_admin:
+        flash('Access denied. Admin privileges required.')
+        return redirect(url_for('index'))
+    
+    if not repository.stations.get(station_id):
+        flash('Station not found')
+        return redirect(url_for('index'))
+    
+    device_ids = [device_data['id'] for device_data in repository.devices.find('station_id', station_id)]
+    try:
+        probe_requests.add(device_ids)
+    except OSError as e:
+        print(f"Error queueing re-probe of station {station_id}: {e}")
+        flash('Could not queue the re-probe, please try again')
+        return redirect(url_for('station_detail', station_id=station_id))
+    flash(f'Re-probing {len(device_ids)} devices; their status updates in a few seconds')
+    return redirect(url_for('station_detail', station_id=station_id))
+
 @app.route('/admin/device/add', methods=['GET', 'POST'])
 @login_required
 def add_device():
@@ -591,11 +1122,7 @@ def add_device():
         station_id = int(request.form['station_id'])
         
         # Add to file-based storage
-        devices_data = load_json_data(DEVICES_FILE)
-        device_id = get_next_id(devices_data)
-        
-        new_device = {
-            'id': device_id,
+        repository.devices.insert({
             'name': name,
             'device_type': device_type,
             'ip_address': ip_address,
@@ -605,10 +1132,7 @@ def add_device():
             'is_online': False,
             'last_ping': None,
             'created_at': datetime.now().isoformat()
-        }
-        
-        devices_data.append(new_device)
-        save_json_data(DEVICES_FILE, devices_data)
+        })
         
         flash('Device added successfully')
         return redirect(url_for('admin_panel'))
@@ -629,21 +1153,20 @@ def add_user():
         password = request.form['password']
         is_admin = 'is_admin' in request.form
         
+        try:
+            password_hash = password_hasher.hash(password)
+        except HasherBusy:
+            flash('The server is busy, please try again in a moment')
+            return render_template('add_user.html'), 503
+
         # Add to file-based storage
-        users_data = load_json_data(USERS_FILE)
-        user_id = get_next_id(users_data)
-        
-        new_user = {
-            'id': user_id,
+        repository.users.insert({
             'username': username,
             'email': email,
-            'password_hash': generate_password_hash(password),
+            'password_hash': password_hash,
             'is_admin': is_admin,
             'created_at': datetime.now().isoformat()
-        }
-        
-        users_data.append(new_user)
-        save_json_data(USERS_FILE, users_data)
+        })
         
         flash('User added successfully')
         return redirect(url_for('admin_panel'))
@@ -657,18 +1180,18 @@ def edit_lab(lab_id):
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('index'))
 
-    labs_data = load_json_data(LABS_FILE)
-    lab_data = next((lab for lab in labs_data if lab['id'] == lab_id), None)
+    lab_data = repository.labs.get(lab_id)
 
     if not lab_data:
         flash('Lab not found')
         return redirect(url_for('admin_panel'))
 
     if request.method == 'POST':
-        lab_data['name'] = request.form['name']
-        lab_data['description'] = request.form['description']
-        lab_data['location'] = request.form['location']
-        save_json_data(LABS_FILE, labs_data)
+        repository.labs.update(lab_id, {
+            'name': request.form['name'],
+            'description': request.form['description'],
+            'location': request.form['location']
+        })
         flash('Lab updated successfully')
         return redirect(url_for('admin_panel'))
 
@@ -681,19 +1204,19 @@ def edit_station(station_id):
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('index'))
 
-    stations_data = load_json_data(STATIONS_FILE)
-    station_data = next((station for station in stations_data if station['id'] == station_id), None)
+    station_data = repository.stations.get(station_id)
 
     if not station_data:
         flash('Station not found')
         return redirect(url_for('admin_panel'))
 
     if request.method == 'POST':
-        station_data['name'] = request.form['name']
-        station_data['description'] = request.form['description']
-        station_data['lab_id'] = int(request.form['lab_id'])
-        station_data['is_functional'] = 'is_functional' in request.form
-        save_json_data(STATIONS_FILE, stations_data)
+        repository.stations.update(station_id, {
+            'name': request.form['name'],
+            'description': request.form['description'],
+            'lab_id': int(request.form['lab_id']),
+            'is_functional': 'is_functional' in request.form
+        })
         flash('Station updated successfully')
         return redirect(url_for('admin_panel'))
 
@@ -707,21 +1230,21 @@ def edit_device(device_id):
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('index'))
 
-    devices_data = load_json_data(DEVICES_FILE)
-    device_data = next((device for device in devices_data if device['id'] == device_id), None)
+    device_data = repository.devices.get(device_id)
 
     if not device_data:
         flash('Device not found')
         return redirect(url_for('admin_panel'))
 
     if request.method == 'POST':
-        device_data['name'] = request.form['name']
-        device_data['device_type'] = request.form['device_type']
-        device_data['ip_address'] = request.form['ip_address']
-        device_data['os_info'] = request.form['os_info']
-        device_data['special_apps'] = request.form['special_apps']
-        device_data['station_id'] = int(request.form['station_id'])
-        save_json_data(DEVICES_FILE, devices_data)
+        repository.devices.update(device_id, {
+            'name': request.form['name'],
+            'device_type': request.form['device_type'],
+            'ip_address': request.form['ip_address'],
+            'os_info': request.form['os_info'],
+            'special_apps': request.form['special_apps'],
+            'station_id': int(request.form['station_id'])
+        })
         flash('Device updated successfully')
         return redirect(url_for('admin_panel'))
 
@@ -735,53 +1258,490 @@ def edit_user(user_id):
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('index'))
 
-    users_data = load_json_data(USERS_FILE)
-    user_data = next((user for user in users_data if user['id'] == user_id), None)
+    user_data = repository.users.get(user_id)
 
     if not user_data:
         flash('User not found')
         return redirect(url_for('admin_panel'))
 
     if request.method == 'POST':
-        user_data['username'] = request.form['username']
-        user_data['email'] = request.form['email']
+        changes = {
+            'username': request.form['username'],
+            'email': request.form['email'],
+            'is_admin': 'is_admin' in request.form
+        }
         if request.form['password']:
-            user_data['password_hash'] = generate_password_hash(request.form['password'])
-        user_data['is_admin'] = 'is_admin' in request.form
-        save_json_data(USERS_FILE, users_data)
+            try:
+                changes['password_hash'] = password_hasher.hash(request.form['password'])
+            except HasherBusy:
+                flash('The server is busy, please try again in a moment')
+                return render_template('edit_user.html', user=user_data), 503
+        repository.users.update(user_id, changes)
         flash('User updated successfully')
         return redirect(url_for('admin_panel'))
 
     return render_template('edit_user.html', user=user_data)
 
+# Bulk import/export
+@app.route('/admin/export/<collection_name>')
+@login_required
+def export_collection(collection_name):
+    """Stream labs, stations or devices as CSV, or as JSON lines with ?format=jsonl"""
+    if not current_user.is_admin:
+        return json_error('Admin privileges required', 403)
+    if collection_name not in EXPORT_FIELDS:
+        return json_error('Unknown collection', 404)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return json_error('format must be csv or jsonl', 400)
+    
+    # The snapshot is written out in chunks instead of one big response body
+    records = getattr(repository, collection_name).all()
+    return Response(export_lines(records, EXPORT_FIELDS[collection_name], fmt),
+                    mimetype=FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={collection_name}.{fmt}'})
+
+@app.route('/admin/import/<collection_name>', methods=['POST'])
+@login_required
+def import_collection(collection_name):
+    """Add labs, stations or devices from CSV or JSON lines
+
+    The rows come from the uploaded 'file' field or the request body. The
+    format is taken from ?format=, else from the file name, else CSV. Valid
+    rows are saved in one write; invalid ones are reported by line number.
+    """
+    if not current_user.is_admin:
+        return json_error('Admin privileges required', 403)
+    if collection_name not in EXPORT_FIELDS:
+        return json_error('Unknown collection', 404)
+    
+    upload = request.files.get('file')
+    stream = upload.stream if upload else io.BufferedReader(request.stream)
+    fmt = request.args.get('format') or format_for_filename(upload.filename if upload else None)
+    if fmt not in FORMATS:
+        return json_error('format must be csv or jsonl', 400)
+    
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        summary = import_rows(repository, collection_name, read_rows(lines, fmt))
+    except UnicodeDecodeError:
+        return json_error('File is not UTF-8 text', 400)
+    except OSError as e:
+        print(f"Error importing {collection_name}: {e}")
+        return json_error('Could not save the imported rows', 500)
+    return jsonify(summary)
+
 # API routes for AJAX updates
+def device_status_entry(device_data):
+    """Status fields for one device, preferring the liveness table over devices.json"""
+    status = liveness.get(device_data['id']) or device_data
+    latency = status.get('latency')
+    return {
+        'id': device_data['id'],
+        'name': device_data['name'],
+        'station_id': device_data['station_id'],
+        'is_online': status.get('is_online', False),
+        'last_ping': status.get('last_ping'),
+        'changed_at': status.get('changed_at'),
+        'latency_ms': round(latency * 1000, 1) if latency is not None else None
+    }
+
+# Version counters are per process, so ETags carry a per-process token and a
+# tag from one worker is never mistaken for current data by another
+ETAG_TOKEN = os.urandom(4).hex()
+
+def device_status_etag(*parts):
+    """ETag that stays the same until a device, station or device status changes"""
+    versions = (repository.devices.version, repository.stations.version, liveness.version)
+    return '-'.join(str(part) for part in (ETAG_TOKEN,) + versions + parts)
+
+def json_error(message, status_code):
+    response = jsonify({'error': message})
+    response.status_code = status_code
+    return response
+
 @app.route('/api/device_status')
 def device_status():
-    devices_data = load_json_data(DEVICES_FILE)
-    status_data = []
-    
-    for device_data in devices_data:
-        status_data.append({
-            'id': device_data['id'],
-            'name': device_data['name'],
-            'is_online': device_data.get('is_online', False),
-            'last_ping': device_data.get('last_ping')
-        })
+    """Device status, optionally filtered and paginated
+
+    Query parameters: station_id, lab_id, ids (comma-separated), online
+    (true/false), since (ISO timestamp; devices whose status changed after
+    it), cursor (last id of the previous page) and limit. When limit or
+    cursor is given, X-Next-Cursor and a Link header point at the next page.
+    """
+    repository.devices.refresh()
+    repository.stations.refresh()
+    etag = device_status_etag(zlib.crc32(request.query_string))
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    
+    station_id = request.args.get('station_id', type=int)
+    lab_id = request.args.get('lab_id', type=int)
+    try:
+        ids = [int(i) for i in request.args['ids'].split(',') if i] if 'ids' in request.args else None
+        since = datetime.fromisoformat(request.args['since']) if 'since' in request.args else None
+    except ValueError:
+        return json_error('ids must be integers and since an ISO timestamp', 400)
+    online = request.args.get('online')
+    if online is not None:
+        online = online.lower() in ('1', 'true', 'yes')
+    cursor = request.args.get('cursor', type=int)
+    limit = request.args.get('limit', type=int)
+    
+    # Narrow the candidates through the indexes before filtering
+    if ids is not None:
+        candidates = [d for d in (repository.devices.get(i) for i in ids) if d]
+    elif station_id is not None:
+        candidates = repository.devices.find('station_id', station_id)
+    elif lab_id is not None:
+        candidates = [
+            device_data
+            for station_data in repository.stations.find('lab_id', lab_id)
+            for device_data in repository.devices.find('station_id', station_data['id'])
+        ]
+    else:
+        candidates = repository.devices.all()
+    
+    # Filters that did not pick the index above still apply
+    if ids is not None and station_id is not None:
+        candidates = [d for d in candidates if d['station_id'] == station_id]
+    if lab_id is not None and (ids is not None or station_id is not None):
+        lab_station_ids = {station_data['id'] for station_data in repository.stations.find('lab_id', lab_id)}
+        candidates = [d for d in candidates if d['station_id'] in lab_station_ids]
+    if since is not None:
+        changed = liveness.changed_since(since)
+        candidates = [d for d in candidates if d['id'] in changed]
+    
+    entries = [device_status_entry(d) for d in candidates]
+    if online is not None:
+        entries = [e for e in entries if e['is_online'] == online]
+    
+    next_cursor = None
+    if cursor is not None or limit is not None:
+        entries.sort(key=lambda e: e['id'])
+        if cursor is not None:
+            entries = [e for e in entries if e['id'] > cursor]
+        limit = max(1, min(limit or 500, 1000))
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = entries[-1]['id']
+    
+    response = jsonify(entries)
+    response.set_etag(etag)
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args.update(cursor=next_cursor, limit=limit)
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{url_for("device_status", **args)}>; rel="next"'
+    return response
+
+@app.route('/api/device_status/<int:device_id>')
+def single_device_status(device_id):
+    """Status of one device"""
+    repository.devices.refresh()
+    etag = device_status_etag(device_id)
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    
+    device_data = repository.devices.get(device_id)
+    if not device_data:
+        return json_error('Device not found', 404)
+    
+    response = jsonify(device_status_entry(device_data))
+    response.set_etag(etag)
+    return response
+
+@app.route('/api/stats')
+def dashboard_stats():
+    """Station counters overall, or for one lab with ?lab_id=, or per lab with ?by_lab=1"""
+    lab_id = request.args.get('lab_id', type=int)
+    if lab_id is not None:
+        if not repository.labs.get(lab_id):
+            return json_error('Lab not found', 404)
+        return jsonify(dict(station_stats.for_lab(lab_id), lab_id=lab_id))
+    
+    stats = station_stats.totals()
+    if request.args.get('by_lab') in ('1', 'true'):
+        stats['labs'] = {str(lab_id): counts for lab_id, counts in station_stats.by_lab().items()}
+    return jsonify(stats)
+
+@app.route('/api/metrics')
+def device_metrics():
+    """Uptime percentage and latency percentiles over the last window seconds
+
+    Pass exactly one of device_id, station_id or lab_id; station and lab
+    results also list each of their devices.
+    """
+    window = request.args.get('window', 86400, type=int)
+    if window <= 0:
+        return json_error('window must be a positive number of seconds', 400)
+    
+    device_id = request.args.get('device_id', type=int)
+    station_id = request.args.get('station_id', type=int)
+    lab_id = request.args.get('lab_id', type=int)
+    if sum(value is not None for value in (device_id, station_id, lab_id)) != 1:
+        return json_error('Pass one of device_id, station_id or lab_id', 400)
+    
+    if device_id is not None:
+        if not repository.devices.get(device_id):
+            return json_error('Device not found', 404)
+        device_ids = [device_id]
+        scope = {'device_id': device_id}
+    elif station_id is not None:
+        if not repository.stations.get(station_id):
+            return json_error('Station not found', 404)
+        device_ids = [device_data['id'] for device_data in repository.devices.find('station_id', station_id)]
+        scope = {'station_id': station_id}
+    else:
+        if not repository.labs.get(lab_id):
+            return json_error('Lab not found', 404)
+        device_ids = [
+            device_data['id']
+            for station_data in repository.stations.find('lab_id', lab_id)
+            for device_data in repository.devices.find('station_id', station_data['id'])
+        ]
+        scope = {'lab_id': lab_id}
+    
+    # Windows longer than the kept history are cut to it
+    resolution, window, buckets = metrics.query(device_ids, window)
+    total = Bucket()
+    for bucket in buckets.values():
+        total.merge(bucket)
+    result = dict(scope, window=window, resolution=resolution, **total.summary())
+    if device_id is None:
+        result['devices'] = {str(device_id): bucket.summary() for device_id, bucket in buckets.items()}
+    return jsonify(result)
+
+def parse_time_arg(name, default=None):
+    """Parse an ISO timestamp query parameter; raises ValueError if it is malformed"""
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else default
+
+@app.route('/api/stations/<int:station_id>/next_free')
+def station_next_free(station_id):
+    """Earliest time from ?after= (default now) at which the station is free for ?duration= minutes (default 60)"""
+    station_data = repository.stations.get(station_id)
+    if not station_data:
+        return json_error('Station not found', 404)
+    duration = request.args.get('duration', 60, type=int)
+    try:
+        after = parse_time_arg('after', datetime.now())
+    except ValueError:
+        return json_error('after must be an ISO timestamp', 400)
+    if duration <= 0:
+        return json_error('duration must be a positive number of minutes', 400)
+    
+    occupation = occupation_interval(station_data)
+    starts_at = reservation_index.next_free(station_id, after, timedelta(minutes=duration),
+                                            busy_until=occupation[1] if occupation else None)
+    return jsonify({
+        'station_id': station_id,
+        'starts_at': starts_at.isoformat() if starts_at else None,
+        'ends_at': (starts_at + timedelta(minutes=duration)).isoformat() if starts_at else None
+    })
+
+@app.route('/api/available_stations')
+def available_stations():
+    """Functional stations with no occupation or reservation between ?start= and ?end=, optionally in one ?lab_id="""
+    try:
+        start = parse_time_arg('start', datetime.now())
+        end = parse_time_arg('end', start + timedelta(hours=1))
+    except ValueError:
+        return json_error('start and end must be ISO timestamps', 400)
+    if end <= start:
+        return json_error('end must be after start', 400)
     
-    return jsonify(status_data)
+    lab_id = request.args.get('lab_id', type=int)
+    stations_data = repository.stations.find('lab_id', lab_id) if lab_id is not None else repository.stations.all()
+    free = reservation_index.free_stations(
+        [station_data for station_data in stations_data if station_data.get('is_functional', True)], start, end)
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'stations': [
+            {'id': station_data['id'], 'name': station_data['name'], 'lab_id': station_data['lab_id']}
+            for station_data in free
+        ]
+    })
+
+@app.route('/api/station_search')
+def station_search():
+    """Free, functional stations with a device matching every given filter
+
+    Query parameters: lab_id, device_type, os (every word must appear in the
+    device's OS), app (repeatable; the device must have each app), start and
+    end (also free of reservations in that window), cursor (last id of the
+    previous page) and limit.
+    """
+    lab_id = request.args.get('lab_id', type=int)
+    terms = query_terms(device_type=request.args.get('device_type'),
+                        os=request.args.get('os'),
+                        apps=request.args.getlist('app'))
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None and cursor < -1:
+        return json_error('cursor must be a station id', 400)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 1000))
+    
+    accept = None
+    if request.args.get('start') or request.args.get('end'):
+        try:
+            start = parse_time_arg('start', datetime.now())
+            end = parse_time_arg('end', start + timedelta(hours=1))
+        except ValueError:
+            return json_error('start and end must be ISO timestamps', 400)
+        if end <= start:
+            return json_error('end must be after start', 400)
+        accept = lambda station_id: reservation_index.conflict(station_id, start, end) is None
+    
+    station_ids, more = station_search_index.search(lab_id=lab_id, terms=terms, after=cursor,
+                                                    limit=limit, accept=accept)
+    stations = []
+    for station_id in station_ids:
+        station_data = repository.stations.get(station_id)
+        if station_data:
+            stations.append({'id': station_id, 'name': station_data['name'], 'lab_id': station_data['lab_id']})
+    
+    response = jsonify(stations)
+    if more:
+        next_cursor = station_ids[-1]
+        args = request.args.to_dict(flat=False)
+        args.update(cursor=next_cursor, limit=limit)
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{url_for("station_search", **args)}>; rel="next"'
+    return response
+
+def parse_date_arg(name, default=None):
+    """Parse a YYYY-MM-DD query parameter; raises ValueError if it is malformed"""
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else default
+
+def usage_range():
+    """(start, end) dates of a usage report: start/end parameters, by default the last 30 days"""
+    end_day = parse_date_arg('end', date.today())
+    start_day = parse_date_arg('start', end_day - timedelta(days=29))
+    if end_day < start_day:
+        raise ValueError('end must not be before start')
+    return start_day, end_day
+
+@app.route('/api/usage')
+@login_required
+def station_usage():
+    """Station and user utilisation between start and end (dates, inclusive; admin only)
+
+    Optional lab_id limits the stations, the users' time and the peak
+    number of stations occupied at once to that lab.
+    """
+    if not current_user.is_admin:
+        return json_error('Admin privileges required', 403)
+    try:
+        start_day, end_day = usage_range()
+    except ValueError:
+        return json_error('start and end must be YYYY-MM-DD dates, end not before start', 400)
+    lab_id = request.args.get('lab_id', type=int)
+    days = (end_day - start_day).days + 1
+    report = usage_rollups.report(start_day, end_day, lab_id=lab_id)
+    
+    stations_data = repository.stations.find('lab_id', lab_id) if lab_id is not None else repository.stations.all()
+    stations = []
+    idle = []
+    for station_data in stations_data:
+        seconds, sessions = report['stations'].get(station_data['id'], (0, 0))
+        entry = {'station_id': station_data['id'], 'name': station_data['name'], 'lab_id': station_data['lab_id']}
+        if not seconds and not sessions:
+            idle.append(entry)
+            continue
+        stations.append(dict(entry,
+                             occupied_hours=round(seconds / 3600, 2),
+                             hours_per_day=round(seconds / 3600 / days, 2),
+                             utilisation_percent=round(100 * seconds / (days * 86400), 2),
+                             sessions=sessions))
+    stations.sort(key=lambda entry: entry['occupied_hours'], reverse=True)
+    
+    users = []
+    for user_id, (seconds, sessions) in report['users'].items():
+        user = user_cache.get(user_id)
+        users.append({'user_id': user_id, 'username': user.username if user else None,
+                      'occupied_hours': round(seconds / 3600, 2),
+                      'hours_per_day': round(seconds / 3600 / days, 2),
+                      'sessions': sessions})
+    users.sort(key=lambda entry: entry['occupied_hours'], reverse=True)
+    
+    peak_day = max(report['peak'], key=report['peak'].get, default=None)
+    return jsonify({
+        'start': start_day.isoformat(),
+        'end': end_day.isoformat(),
+        'days': days,
+        'stations': stations,
+        'users': users,
+        'idle_stations': idle,
+        'peak_concurrency': {'stations': report['peak'][peak_day] if peak_day else 0, 'day': peak_day},
+        'daily_peak': report['peak']
+    })
+
+@app.route('/api/usage/daily')
+@login_required
+def station_usage_daily():
+    """Hours occupied and sessions per day for one station_id or user_id between start and end
+
+    Admins can look up any station or user; other users only themselves.
+    """
+    station_id = request.args.get('station_id', type=int)
+    user_id = request.args.get('user_id', type=int)
+    if (station_id is None) == (user_id is None):
+        return json_error('Give either station_id or user_id', 400)
+    if not current_user.is_admin and user_id != current_user.id:
+        return json_error('Admin privileges required', 403)
+    try:
+        start_day, end_day = usage_range()
+    except ValueError:
+        return json_error('start and end must be YYYY-MM-DD dates, end not before start', 400)
+    
+    if station_id is not None:
+        series = usage_rollups.daily('stations', station_id, start_day, end_day)
+    else:
+        series = usage_rollups.daily('users', user_id, start_day, end_day)
+    return jsonify({
+        'start': start_day.isoformat(),
+        'end': end_day.isoformat(),
+        'station_id': station_id,
+        'user_id': user_id,
+        'days': {day: {'hours': round(seconds / 3600, 2), 'sessions': sessions}
+                 for day, (seconds, sessions) in series.items()}
+    })
+
+@app.route('/api/cache_stats')
+@login_required
+def cache_stats():
+    """Size and hit/miss counters of the rendered page cache (admin only)"""
+    if not current_user.is_admin:
+        return json_error('Admin privileges required', 403)
+    return jsonify(fragment_cache.stats())
+
+@app.route('/api/events')
+def status_events():
+    """Server-Sent Events stream of device and station changes
+
+    Optional lab_id / station_id query parameters limit the stream to one lab
+    or one station. Answers 503 when EVENT_STREAMS streams are already open.
+    """
+    subscription = event_broker.subscribe(lab_id=request.args.get('lab_id', type=int),
+                                          station_id=request.args.get('station_id', type=int))
+    if subscription is None:
+        # Every stream holds a thread; the page polls /api/device_status instead
+        response = json_error('Too many open event streams, poll /api/device_status instead', 503)
+        response.headers['Retry-After'] = '300'
+        return response
+    return Response(event_broker.stream(subscription),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 if __name__ == '__main__':
     # Create admin user in file storage if none exists
-    admin_data = get_user_by_username('admin')
-    if not admin_data:
-        create_user('admin', 'admin@swlabs.com', 'admin123', is_admin=True)
-        print("✓ Admin user created in file storage")
+    ensure_admin_user()
     
-    # Start monitoring threads
-    ping_thread = threading.Thread(target=ping_devices, daemon=True)
-    ping_thread.start()
-    
-    auto_release_thread = threading.Thread(target=auto_release_stations, daemon=True)
-    auto_release_thread.start()
+    # Start monitoring threads. With debug=True the reloader runs the app in a
+    # child process; only that one serves requests, so only it runs the loops
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_monitor_threads()
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
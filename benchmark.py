@@ -0,0 +1,812 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for SW Labs Management System
+Runs against synthetic in-memory data so the real data/ directory is never touched
+
+Usage:
+    python benchmark.py              # run every benchmark
+    python benchmark.py hydration    # run a single benchmark
+    python benchmark.py user_cache   # authenticated requests/sec, users.json scan vs cache
+    python benchmark.py index        # home page time and size, lazy tabs vs every tab
+    python benchmark.py pages        # lab/station page requests/sec, rendered vs cached
+    python benchmark.py models       # model memory and build time, eager dict vs lazy slotted
+    python benchmark.py bulk_import  # adding devices one form post at a time vs one bulk import
+    python benchmark.py workers      # requests/sec through serve.py by number of web workers
+    python benchmark.py reservations # conflict checks and availability search over many bookings
+    python benchmark.py station_search # free station search by device type, OS and app, bitmaps vs scan
+    python benchmark.py admin_tables # admin panel size, every row vs one page, and search/sort per page
+    python benchmark.py usage        # utilisation reports over a year of occupancy events, rollups vs replay
+    python benchmark.py login        # a storm of simultaneous logins, inline hashing vs process pool vs cache
+"""
+
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from models import Lab, Station, Device, LabGraph
+
+
+def make_synthetic_data(num_labs, stations_per_lab, devices_per_station):
+    """Build labs, stations and devices records shaped like the JSON files"""
+    now = datetime.now().isoformat()
+    labs, stations, devices = [], [], []
+    for lab_id in range(1, num_labs + 1):
+        labs.append({
+            'id': lab_id,
+            'name': f'Lab {lab_id}',
+            'description': '',
+            'location': f'Building {lab_id}',
+            'created_at': now
+        })
+        for _ in range(stations_per_lab):
+            station_id = len(stations) + 1
+            stations.append({
+                'id': station_id,
+                'name': f'Station {station_id}',
+                'description': '',
+                'lab_id': lab_id,
+                'is_occupied': station_id % 3 == 0,
+                'occupied_by': 1 if station_id % 3 == 0 else None,
+                'occupied_at': now if station_id % 3 == 0 else None,
+                'occupied_until': None,
+                'is_functional': True,
+                'created_at': now
+            })
+            for _ in range(devices_per_station):
+                device_id = len(devices) + 1
+                devices.append({
+                    'id': device_id,
+                    'name': f'PC {device_id:05d}',
+                    'device_type': 'PC' if device_id % 2 else 'Server',
+                    'ip_address': f'10.{lab_id % 256}.{station_id % 256}.{device_id % 256}',
+                    'os_info': 'Linux',
+                    'special_apps': 'Docker, Git',
+                    'station_id': station_id,
+                    'is_online': device_id % 4 != 0,
+                    'last_ping': now,
+                    'created_at': now
+                })
+    return labs, stations, devices
+
+
+def timed(func, repeat=3):
+    """Return the best wall-clock time of func() over several runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def nested_join(labs_data, stations_data, devices_data):
+    """The original get_all_labs join: every station per lab, every device per station"""
+    labs = []
+    for lab_data in labs_data:
+        lab = Lab(lab_data)
+        for station_data in stations_data:
+            if station_data['lab_id'] == lab.id:
+                station = Station(station_data)
+                for device_data in devices_data:
+                    if device_data['station_id'] == station.id:
+                        station.devices.append(Device(device_data))
+                lab.stations.append(station)
+        labs.append(lab)
+    return labs
+
+
+def bench_hydration():
+    """Nested-loop join versus single-pass LabGraph hydration"""
+    print("Lab graph hydration (best of 3)")
+    print(f"{'labs':>6} {'stations':>9} {'devices':>8} {'nested join':>12} {'LabGraph':>10} {'speedup':>8}")
+    sizes = [(5, 10, 2), (50, 10, 2), (200, 10, 3), (500, 10, 4), (2000, 10, 4)]
+    for num_labs, stations_per_lab, devices_per_station in sizes:
+        labs, stations, devices = make_synthetic_data(num_labs, stations_per_lab, devices_per_station)
+        graph_time = timed(lambda: LabGraph(labs, stations, devices))
+        # The nested join is quadratic; skip it once it would take minutes
+        if len(labs) * len(stations) <= 5_000_000:
+            join_time = timed(lambda: nested_join(labs, stations, devices), repeat=1)
+            join_text = f"{join_time * 1000:10.1f}ms"
+            speedup = f"{join_time / graph_time:7.0f}x"
+        else:
+            join_text = f"{'skipped':>12}"
+            speedup = f"{'-':>8}"
+        print(f"{len(labs):>6} {len(stations):>9} {len(devices):>8} {join_text} {graph_time * 1000:8.1f}ms {speedup}")
+
+
+def make_synthetic_users(num_users):
+    """Build user records shaped like users.json; the last one is an admin"""
+    now = datetime.now().isoformat()
+    return [
+        {
+            'id': user_id,
+            'username': f'user{user_id}',
+            'email': f'user{user_id}@example.com',
+            # Never checked here; login goes through the session cookie
+            'password_hash': 'pbkdf2:sha256:1$bench$0',
+            'is_admin': user_id == num_users,
+            'created_at': now
+        }
+        for user_id in range(1, num_users + 1)
+    ]
+
+
+@contextmanager
+def synthetic_app():
+    """Import app.py with its data/ directory pointed at an empty temporary folder"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'data'
+        data_dir.mkdir()
+        for name in ('users', 'labs', 'stations', 'devices'):
+            (data_dir / f'{name}.json').write_text('[]')
+        os.chdir(tmp)
+        try:
+            import app as webapp
+            yield webapp
+        finally:
+            os.chdir(cwd)
+
+
+def bench_user_cache():
+    """Authenticated page requests/sec with the old users.json loader versus UserCache"""
+    print("Authenticated requests per second (GET /admin/lab/add, best of 3)")
+    print(f"{'users':>6} {'users.json scan':>16} {'UserCache':>10} {'speedup':>8}")
+    with synthetic_app() as webapp:
+        users_file = Path('data') / 'users.json'
+
+        def legacy_load_user(user_id):
+            # What load_user did before: parse users.json and scan it per request
+            with open(users_file, 'r', encoding='utf-8') as f:
+                users = json.load(f)
+            for user_data in users:
+                if user_data['id'] == int(user_id):
+                    return webapp.User(user_data)
+            return None
+
+        requests = 300
+        for num_users in (10, 100, 1000, 5000):
+            users = make_synthetic_users(num_users)
+            webapp.repository.users.save(users)
+            client = webapp.app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(num_users)
+                session['_fresh'] = True
+
+            def run():
+                for _ in range(requests):
+                    response = client.get('/admin/lab/add')
+                    assert response.status_code == 200, response.status_code
+
+            webapp.login_manager.user_loader(legacy_load_user)
+            legacy_time = timed(run)
+            webapp.login_manager.user_loader(webapp.load_user)
+            cached_time = timed(run)
+            print(f"{num_users:>6} {requests / legacy_time:12.0f} r/s {requests / cached_time:6.0f} r/s "
+                  f"{legacy_time / cached_time:7.1f}x")
+
+
+def bench_index():
+    """Home page with only the first lab tab rendered versus rendering every tab"""
+    print("Home page, 10 stations x 2 devices per lab (best of 3)")
+    print(f"{'labs':>6} {'all tabs':>10} {'size':>9} {'lazy tabs':>10} {'size':>9}")
+    with synthetic_app() as webapp:
+        client = webapp.app.test_client()
+        for num_labs in (5, 50, 500, 2000):
+            labs, stations, devices = make_synthetic_data(num_labs, 10, 2)
+            webapp.repository.labs.save(labs)
+            webapp.repository.stations.save(stations)
+            webapp.repository.devices.save(devices)
+
+            def render_all_tabs():
+                # The old page body: every lab's stations rendered up front
+                with webapp.app.test_request_context('/'):
+                    return ''.join(
+                        webapp.render_template('lab_tab.html', lab=lab)
+                        for lab in webapp.get_all_labs()
+                    )
+
+            def get_index():
+                return client.get('/').get_data()
+
+            all_size = len(render_all_tabs())
+            all_time = timed(render_all_tabs)
+            lazy_size = len(get_index())
+            lazy_time = timed(get_index)
+            print(f"{num_labs:>6} {all_time * 1000:8.1f}ms {all_size / 1024:7.0f}KB "
+                  f"{lazy_time * 1000:8.1f}ms {lazy_size / 1024:7.0f}KB")
+
+
+
+def bench_pages():
+    """Lab and station page requests/sec, rendering every time versus the fragment cache"""
+    print("Page requests per second, logged in, 2000 labs x 10 stations x 4 devices (best of 3)")
+    print(f"{'page':>16} {'uncached':>10} {'cached':>10} {'speedup':>8}")
+    with synthetic_app() as webapp:
+        labs, stations, devices = make_synthetic_data(2000, 10, 4)
+        webapp.repository.users.save(make_synthetic_users(1))
+        webapp.repository.labs.save(labs)
+        webapp.repository.stations.save(stations)
+        webapp.repository.devices.save(devices)
+        client = webapp.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = '1'
+            session['_fresh'] = True
+
+        requests = 200
+        for name, url in (('lab_detail', '/lab/1000'), ('station_detail', '/station/10000')):
+            def run(clear):
+                for _ in range(requests):
+                    if clear:
+                        webapp.fragment_cache.clear()
+                    response = client.get(url)
+                    assert response.status_code == 200, response.status_code
+
+            uncached_time = timed(lambda: run(True))
+            cached_time = timed(lambda: run(False))
+            print(f"{name:>16} {requests / uncached_time:6.0f} r/s {requests / cached_time:6.0f} r/s "
+                  f"{uncached_time / cached_time:7.1f}x")
+        print(f"cache: {webapp.fragment_cache.stats()}")
+
+
+
+class EagerLab:
+    """The model classes before __slots__: instance dicts and eager datetime parsing"""
+
+    def __init__(self, lab_data):
+        self.id = lab_data['id']
+        self.name = lab_data['name']
+        self.description = lab_data.get('description', '')
+        self.location = lab_data.get('location', '')
+        self.created_at = datetime.fromisoformat(lab_data['created_at'])
+        self.stations = []
+
+
+class EagerStation:
+    def __init__(self, station_data):
+        self.id = station_data['id']
+        self.name = station_data['name']
+        self.description = station_data.get('description', '')
+        self.lab_id = station_data['lab_id']
+        self.is_occupied = station_data['is_occupied']
+        self.occupied_by = station_data.get('occupied_by')
+        self.occupied_at = datetime.fromisoformat(station_data['occupied_at']) if station_data.get('occupied_at') else None
+        self.occupied_until = datetime.fromisoformat(station_data['occupied_until']) if station_data.get('occupied_until') else None
+        self.is_functional = station_data.get('is_functional', True)
+        self.created_at = datetime.fromisoformat(station_data['created_at'])
+        self.devices = []
+        self.lab = None
+
+
+class EagerDevice:
+    def __init__(self, device_data):
+        self.id = device_data['id']
+        self.name = device_data['name']
+        self.device_type = device_data['device_type']
+        self.ip_address = device_data['ip_address']
+        self.os_info = device_data.get('os_info', '')
+        self.special_apps = device_data.get('special_apps', '')
+        self.station_id = device_data['station_id']
+        self.created_at = datetime.fromisoformat(device_data['created_at'])
+        self.station = None
+        self._stored_status = {
+            'is_online': device_data.get('is_online', False),
+            'last_ping': device_data.get('last_ping')
+        }
+
+
+def eager_graph(labs_data, stations_data, devices_data):
+    """LabGraph's single pass, building the eager classes"""
+    labs_by_id = {}
+    for lab_data in labs_data:
+        lab = EagerLab(lab_data)
+        labs_by_id[lab.id] = lab
+    stations_by_id = {}
+    for station_data in stations_data:
+        station = EagerStation(station_data)
+        station.lab = labs_by_id.get(station.lab_id)
+        if station.lab is not None:
+            station.lab.stations.append(station)
+        stations_by_id[station.id] = station
+    devices_by_id = {}
+    for device_data in devices_data:
+        device = EagerDevice(device_data)
+        device.station = stations_by_id.get(device.station_id)
+        if device.station is not None:
+            device.station.devices.append(device)
+        devices_by_id[device.id] = device
+    return labs_by_id, stations_by_id, devices_by_id
+
+
+def measure_memory(build):
+    """Return the bytes still allocated by the object build() returns"""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_models():
+    """Graph memory and build time, eager dict-based models versus lazy slotted models"""
+    print("Model graph build (10 stations per lab, 10 devices per station, best of 3)")
+    print(f"{'devices':>8} {'eager time':>11} {'memory':>9} {'slotted time':>13} {'memory':>9}")
+    for num_devices in (10_000, 100_000):
+        labs, stations, devices = make_synthetic_data(num_devices // 100, 10, 10)
+        eager_time = timed(lambda: eager_graph(labs, stations, devices))
+        slotted_time = timed(lambda: LabGraph(labs, stations, devices))
+        eager_memory = measure_memory(lambda: eager_graph(labs, stations, devices))
+        slotted_memory = measure_memory(lambda: LabGraph(labs, stations, devices))
+        print(f"{len(devices):>8} {eager_time * 1000:9.1f}ms {eager_memory / 2**20:7.1f}MB "
+              f"{slotted_time * 1000:11.1f}ms {slotted_memory / 2**20:7.1f}MB")
+
+
+
+def bench_bulk_import():
+    """Adding devices one insert at a time (the add_device form) versus one bulk import"""
+    from bulk import import_rows, read_rows
+    from storage import Repository
+
+    print("Device import into a JSON data directory (single run)")
+    print(f"{'devices':>8} {'one by one':>11} {'bulk import':>12} {'speedup':>8}")
+    for num_devices in (200, 1000, 2000):
+        lines = ['name,device_type,ip_address,station_id']
+        lines += [f'PC {i},PC,10.0.{i // 250}.{i % 250 + 1},1' for i in range(num_devices)]
+        rows = list(read_rows(lines, 'csv'))
+        with tempfile.TemporaryDirectory() as tmp:
+            repository = Repository(tmp)
+            labs, stations, _ = make_synthetic_data(1, 1, 0)
+            repository.labs.save(labs)
+            repository.stations.save(stations)
+
+            def one_by_one():
+                for _, row, _ in rows:
+                    repository.devices.insert(dict(row, station_id=1))
+
+            def bulk():
+                summary = import_rows(repository, 'devices', rows)
+                assert summary['created'] == num_devices, summary
+
+            single_time = timed(one_by_one, repeat=1)
+            repository.devices.save([])
+            bulk_time = timed(bulk, repeat=1)
+        print(f"{num_devices:>8} {single_time * 1000:9.0f}ms {bulk_time * 1000:10.0f}ms {single_time / bulk_time:7.0f}x")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def load_test(port, paths, clients, duration):
+    """Request paths round-robin from clients keep-alive connections for duration seconds; return requests/sec"""
+    stop = threading.Event()
+
+    def client(index):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        done = 0
+        while not stop.is_set():
+            conn.request('GET', paths[(index + done) % len(paths)])
+            response = conn.getresponse()
+            response.read()
+            assert response.status == 200, response.status
+            done += 1
+        conn.close()
+        return done
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        futures = [executor.submit(client, i) for i in range(clients)]
+        start = time.perf_counter()
+        time.sleep(duration)
+        stop.set()
+        total = sum(future.result() for future in futures)
+        elapsed = time.perf_counter() - start
+    return total / elapsed
+
+
+def bench_workers():
+    """Requests/sec through serve.py (gunicorn or waitress) as the number of web workers grows"""
+    from serve import available_server
+
+    server = available_server()
+    if server is None:
+        print("workers: skipped, no WSGI server installed (pip install gunicorn)")
+        return
+    clients, duration = 64, 5
+    paths = ['/', '/api/stats', '/api/device_status?lab_id=1', '/lab/1/tab']
+    print(f"Requests per second through {server}, {clients} keep-alive clients, {duration}s per run")
+    print(f"  paths: {', '.join(paths)}")
+    print(f"{'workers':>8} {'threads':>8} {'requests/s':>11} {'scaling':>8}")
+    serve_py = Path(__file__).resolve().with_name('serve.py')
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'data'
+        data_dir.mkdir()
+        labs, stations, devices = make_synthetic_data(50, 10, 2)
+        for name, records in (('users', make_synthetic_users(1)), ('labs', labs),
+                              ('stations', stations), ('devices', devices)):
+            (data_dir / f'{name}.json').write_text(json.dumps(records))
+
+        baseline = None
+        for workers in (1, 2, 4, 8):
+            port = free_port()
+            process = subprocess.Popen(
+                [sys.executable, str(serve_py), 'web', '--server', server, '--workers', str(workers),
+                 '--threads', '4', '--bind', f'127.0.0.1:{port}'],
+                cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_for_port(port)
+                load_test(port, paths, clients, 1)  # warm every worker's caches
+                rate = load_test(port, paths, clients, duration)
+            finally:
+                process.terminate()
+                process.wait()
+            baseline = baseline or rate
+            print(f"{workers:>8} {4:>8} {rate:11.0f} {rate / baseline:7.1f}x")
+
+
+
+def bench_reservations():
+    """Conflict checks, next-free-slot queries and lab availability search with many bookings"""
+    from reservations import ReservationIndex
+    from storage import Repository
+
+    print("Reservation index, 100 labs x 10 stations (best of 3)")
+    print(f"{'bookings':>9} {'build':>9} {'conflict':>10} {'next free':>10} {'lab search':>11} {'all stations':>13}")
+    labs, stations, _ = make_synthetic_data(100, 10, 0)
+    base = datetime(2030, 1, 1, 8)
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = Repository(tmp)
+        for num_bookings in (1000, 10_000, 50_000):
+            # Two-hour bookings with one-hour gaps, spread over every station
+            reservations = []
+            for i in range(num_bookings):
+                station = stations[i % len(stations)]
+                slot = i // len(stations)
+                starts_at = base + timedelta(hours=3 * slot)
+                reservations.append({
+                    'id': i + 1, 'station_id': station['id'], 'user_id': 1,
+                    'starts_at': starts_at.isoformat(),
+                    'ends_at': (starts_at + timedelta(hours=2)).isoformat(),
+                    'created_at': base.isoformat()
+                })
+            repository.reservations.save(reservations)
+            index = ReservationIndex(repository.reservations)
+            build_time = timed(lambda: index.for_station(1), repeat=1)
+
+            checks = 10_000
+            window = (base + timedelta(hours=3 * (num_bookings // len(stations)) // 2),)
+            window += (window[0] + timedelta(hours=1),)
+
+            def conflicts():
+                for i in range(checks):
+                    index.conflict(stations[i % len(stations)]['id'], *window)
+
+            def next_free():
+                for i in range(checks):
+                    index.next_free(stations[i % len(stations)]['id'], window[0], timedelta(hours=1))
+
+            lab_stations = [station for station in stations if station['lab_id'] == 1]
+            conflict_time = timed(conflicts) / checks
+            next_free_time = timed(next_free) / checks
+            lab_time = timed(lambda: index.free_stations(lab_stations, *window))
+            all_time = timed(lambda: index.free_stations(stations, *window))
+            print(f"{num_bookings:>9} {build_time * 1000:7.1f}ms {conflict_time * 1e6:8.2f}us "
+                  f"{next_free_time * 1e6:8.2f}us {lab_time * 1e6:9.1f}us {all_time * 1000:11.2f}ms")
+
+
+
+def scan_search(stations_data, devices_data, lab_id, terms, limit):
+    """The search without indexes: check every station and its devices"""
+    from station_search import device_terms
+
+    devices_by_station = {}
+    for device_data in devices_data:
+        devices_by_station.setdefault(device_data['station_id'], []).append(device_data)
+    found = []
+    for station_data in stations_data:
+        if station_data.get('is_occupied') or not station_data.get('is_functional', True):
+            continue
+        if lab_id is not None and station_data['lab_id'] != lab_id:
+            continue
+        if any(terms <= device_terms(device_data) for device_data in devices_by_station.get(station_data['id'], [])):
+            found.append(station_data['id'])
+            if len(found) == limit:
+                break
+    return found
+
+
+def bench_station_search():
+    """Free station search by device requirements, bitmap index versus scanning every station"""
+    from station_search import StationSearchIndex, query_terms
+    from storage import Repository
+
+    print("Station search, 1000 labs x 10 stations x 5 devices (10k stations, 50k devices)")
+    labs, stations, devices = make_synthetic_data(1000, 10, 5)
+    oses = ('Windows 10', 'Windows 11', 'Ubuntu 22.04', 'Ubuntu 20.04', 'macOS 14')
+    apps = ('Docker', 'Git', 'Matlab', 'Vivado', 'Wireshark', 'Recording', 'Debug')
+    for device in devices:
+        device['os_info'] = oses[device['id'] % len(oses)]
+        device['special_apps'] = ', '.join(apps[(device['id'] * k) % len(apps)] for k in (1, 3))
+    queries = (
+        ('any free station', None, {}),
+        ('type=Server', None, {'device_type': 'Server'}),
+        ('lab 500, os=ubuntu', 500, {'os': 'ubuntu'}),
+        ('Server+Ubuntu 22.04+Vivado', None, {'device_type': 'Server', 'os': 'Ubuntu 22.04', 'apps': ['Vivado']}),
+        ('no match', None, {'apps': ['photoshop']}),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = Repository(tmp)
+        repository.stations.save(stations)
+        repository.devices.save(devices)
+        index = StationSearchIndex(repository.stations, repository.devices)
+        build_time = timed(lambda: index.search(limit=1), repeat=1)
+        print(f"index build: {build_time * 1000:.0f}ms")
+        print(f"{'query':>28} {'scan':>10} {'index':>10} {'matches':>8}")
+        for name, lab_id, filters in queries:
+            terms = query_terms(**filters)
+            scan_time = timed(lambda: scan_search(stations, devices, lab_id, terms, 50))
+            index_time = timed(lambda: index.search(lab_id=lab_id, terms=terms, limit=50), repeat=20)
+            found, _ = index.search(lab_id=lab_id, terms=terms, limit=50)
+            assert found == scan_search(stations, devices, lab_id, terms, 50), name
+            print(f"{name:>28} {scan_time * 1000:8.2f}ms {index_time * 1000:8.3f}ms {len(found):>8}")
+
+        # A combination of terms is answered from per-device bitmaps the
+        # first time, then from its cached station bitmap
+        terms = query_terms(device_type='PC', os='Windows 11', apps=['Git'])
+        first_time = timed(lambda: index.search(terms=terms, limit=50), repeat=1)
+        print(f"first search for a new combination of terms: {first_time * 1000:.2f}ms")
+
+        # Another process edits one device: the index applies the difference
+        other = Repository(tmp)
+        other.devices.update(devices[0]['id'], {'os_info': 'Fedora 40'})
+        repository.devices.refresh(force=True)
+        catch_up_time = timed(lambda: index.search(limit=1), repeat=1)
+        print(f"catching up with a device edited by another process: {catch_up_time * 1000:.0f}ms "
+              f"(full build {build_time * 1000:.0f}ms)")
+
+
+def scan_page(rows, query, sort_key, descending, offset, limit):
+    """Filter and sort every row per request, as the browser used to on the full admin panel"""
+    words = query.lower().split()
+    matches = [row for row in rows
+               if all(any(value.startswith(word) for value in row['_words']) for word in words)]
+    matches.sort(key=lambda row: (sort_key(row), row['id']), reverse=descending)
+    return len(matches), matches[offset:offset + limit]
+
+
+def bench_admin_tables():
+    """Admin panel bytes with every row versus one page per table, and search/sort per page request"""
+    from admin_tables import search_tokens
+
+    print("Admin panel, 1000 labs x 10 stations x 5 devices (10k stations, 50k devices), 1000 users")
+    labs, stations, devices = make_synthetic_data(1000, 10, 5)
+    with synthetic_app() as webapp:
+        webapp.repository.users.save(make_synthetic_users(1000))
+        webapp.repository.labs.save(labs)
+        webapp.repository.stations.save(stations)
+        webapp.repository.devices.save(devices)
+        client = webapp.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = '1000'
+            session['_fresh'] = True
+
+        def fetch(url):
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+            return response
+
+        paged = len(fetch('/admin').data)
+        every_row = paged
+        for name in ('labs', 'stations', 'devices', 'users'):
+            paged += len(fetch(f'/admin/table/{name}?format=html').data)
+            total = int(fetch(f'/admin/table/{name}?limit=1').headers['X-Total-Count'])
+            every_row += sum(len(fetch(f'/admin/table/{name}?format=html&offset={offset}&limit=500').data)
+                             for offset in range(0, total, 500))
+        print(f"admin panel: every row {every_row / 1024:.0f}KB, one page per table {paged / 1024:.0f}KB")
+
+        table = webapp.admin_tables['devices']
+        table._versions = None  # as after a write from another process
+        build_time = timed(lambda: table.page(limit=1), repeat=1)
+        print(f"devices table build: {build_time * 1000:.0f}ms")
+        rows = [dict(row, _words=search_tokens(' '.join(str(row[field] or '') for field in table.search_fields)))
+                for row in table.page(limit=len(devices))[1]]
+        queries = (
+            ('first page by id', '', 'id', False, 0),
+            ('page 500 by name', '', 'name', False, 25000),
+            ('ip desc', '', 'ip_address', True, 0),
+            ('search "station 42"', 'station 42', 'name', False, 0),
+            ('search "10.7"', '10.7', 'ip_address', False, 0),
+            ('search "server" by station', 'server', 'station', True, 50),
+        )
+        print(f"{'request':>28} {'scan+sort':>10} {'index':>10} {'matches':>8}")
+        for name, query, sort, descending, offset in queries:
+            sort_key = table.sort_keys[sort]
+            scan_time = timed(lambda: scan_page(rows, query, sort_key, descending, offset, 50))
+            index_time = timed(lambda: table.page(query, sort, descending, offset, 50), repeat=20)
+            total, page = table.page(query, sort, descending, offset, 50)
+            expected_total, expected = scan_page(rows, query, sort_key, descending, offset, 50)
+            assert total == expected_total and [r['id'] for r in page] == [r['id'] for r in expected], name
+            print(f"{name:>28} {scan_time * 1000:8.2f}ms {index_time * 1000:8.3f}ms {total:>8}")
+
+
+def replay_usage(log, start, end):
+    """Occupied seconds per station in [start, end), replaying every raw event of the log"""
+    totals = {}
+    for event, _ in log.read():
+        if event['type'] not in ('release', 'auto_release'):
+            continue
+        session_start = max(start, datetime.fromisoformat(event['occupied_at']))
+        session_end = min(end, datetime.fromisoformat(event['at']))
+        if session_start < session_end:
+            totals[event['station_id']] = totals.get(event['station_id'], 0) + (session_end - session_start).total_seconds()
+    return totals
+
+
+def bench_usage():
+    """Utilisation reports from the occupancy rollups versus replaying the raw event log"""
+    from usage import OccupancyLog, UsageRollups
+
+    num_stations, num_users, days = 200, 100, 365
+    print(f"Occupancy history: {num_stations} stations, {num_users} users, {days} days, 2 sessions per station per day")
+    first_day = datetime(2025, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        log = OccupancyLog(tmp)
+        for day in range(days):
+            for station_id in range(1, num_stations + 1):
+                for hour, length in ((8 + station_id % 3, 3), (14, 2 + station_id % 4)):
+                    start = first_day + timedelta(days=day, hours=hour)
+                    end = start + timedelta(hours=length)
+                    occupation = {'station_id': station_id, 'lab_id': station_id % 10 + 1,
+                                  'user_id': (station_id * 7 + day + hour) % num_users + 1,
+                                  'occupied_at': start.isoformat(), 'occupied_until': end.isoformat()}
+                    log.append(dict(occupation, type='occupy', at=start.isoformat()))
+                    log.append(dict(occupation, type='release', at=end.isoformat()))
+        size = sum(log.segment_path(number).stat().st_size for number in log.segments())
+        print(f"log: {len(log.segments())} segments, {size / 1024 / 1024:.0f}MB")
+
+        rollups = UsageRollups(log, Path(tmp) / 'rollups.json')
+        build_time = timed(rollups.update, repeat=1)
+        rollups.checkpoint()
+        restart_time = timed(lambda: UsageRollups(log, Path(tmp) / 'rollups.json').update(), repeat=1)
+        print(f"rollup build from the log: {build_time:.1f}s, restart from checkpoint: {restart_time * 1000:.0f}ms")
+
+        print(f"{'report':>12} {'replay':>10} {'rollups':>10}")
+        last_day = first_day.date() + timedelta(days=days - 1)
+        for name, first in (('year', first_day.date()), ('month', last_day.replace(day=1)), ('week', last_day - timedelta(days=6))):
+            start = datetime.combine(first, datetime.min.time())
+            end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+            replay_time = timed(lambda: replay_usage(log, start, end), repeat=1)
+            rollup_time = timed(lambda: rollups.report(first, last_day))
+            expected = replay_usage(log, start, end)
+            report = rollups.report(first, last_day)['stations']
+            assert all(abs(report[station_id][0] - seconds) < 1e-3 for station_id, seconds in expected.items()), name
+            print(f"{name:>12} {replay_time * 1000:8.0f}ms {rollup_time * 1000:8.1f}ms")
+
+
+def login_storm(webapp, num_users, clients):
+    """Log every user in from clients threads while another thread polls /api/stats
+
+    Returns (seconds for the storm, median login ms, logins turned away as busy,
+    worst /api/stats ms meanwhile).
+    """
+    done = threading.Event()
+    stats_times = []
+
+    def poll_stats():
+        client = webapp.app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            assert client.get('/api/stats').status_code == 200
+            stats_times.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    def log_in(user_id):
+        client = webapp.app.test_client()
+        start = time.perf_counter()
+        response = client.post('/login', data={'username': f'user{user_id}', 'password': f'secret{user_id}'})
+        assert response.status_code in (302, 503), response.status_code
+        return time.perf_counter() - start, response.status_code == 503
+
+    poller = threading.Thread(target=poll_stats)
+    poller.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(log_in, range(1, num_users + 1)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    poller.join()
+    login_times = sorted(seconds for seconds, _ in results)
+    busy = sum(1 for _, turned_away in results if turned_away)
+    return elapsed, login_times[len(login_times) // 2] * 1000, busy, max(stats_times, default=0) * 1000
+
+
+def bench_login():
+    """Simultaneous logins at the start of a lab session: inline hashing, the process pool, and repeat logins"""
+    from passwords import CredentialCache, PasswordHasher
+    from werkzeug.security import generate_password_hash
+
+    num_users, clients = 100, 16
+    with synthetic_app() as webapp:
+        method = webapp.app.config['PASSWORD_HASH_METHOD']
+        workers = webapp.app.config['PASSWORD_WORKERS']
+        users = make_synthetic_users(num_users)
+        for user_data in users:
+            user_data['password_hash'] = generate_password_hash(f"secret{user_data['id']}", method)
+        webapp.repository.users.save(users)
+        print(f"{num_users} users logging in from {clients} threads, {method}, {workers} hashing workers")
+        print(f"{'hashing':>20} {'storm':>8} {'login p50':>10} {'busy':>5} {'worst /api/stats':>17}")
+
+        pooled = webapp.password_hasher
+        runs = [
+            ('inline', PasswordHasher(method=method, workers=0)),
+            ('process pool', PasswordHasher(method=method, workers=workers).start()),
+            ('pool, repeat logins', pooled),
+        ]
+        pooled.cache = CredentialCache()
+        login_storm(webapp, num_users, clients)  # fills the credential cache of the last run
+        try:
+            for name, hasher in runs:
+                webapp.password_hasher = hasher
+                elapsed, login_ms, busy, stats_ms = login_storm(webapp, num_users, clients)
+                print(f"{name:>20} {elapsed:7.2f}s {login_ms:8.1f}ms {busy:>5} {stats_ms:15.1f}ms")
+        finally:
+            webapp.password_hasher = pooled
+            runs[1][1].shutdown()
+
+
+BENCHMARKS = {
+    'hydration': bench_hydration,
+    'user_cache': bench_user_cache,
+    'index': bench_index,
+    'pages': bench_pages,
+    'models': bench_models,
+    'bulk_import': bench_bulk_import,
+    'workers': bench_workers,
+    'reservations': bench_reservations,
+    'station_search': bench_station_search,
+    'admin_tables': bench_admin_tables,
+    'usage': bench_usage,
+    'login': bench_login,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            return 1
+    for name in names:
+        print("=" * 60)
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Bulk import and export of labs, stations and devices
+Reads and writes CSV or JSON lines one row at a time. An import validates
+every row first and then adds all valid rows to the collection in one write.
+
+Usage:
+    python bulk.py export devices -f csv -o devices.csv
+    python bulk.py import devices devices.csv
+"""
+
+import argparse
+import csv
+import io
+import ipaddress
+import json
+import os
+import sys
+from datetime import datetime
+
+from storage import open_repository
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+EXPORT_FIELDS = {
+    'labs': ('id', 'name', 'description', 'location', 'created_at'),
+    'stations': ('id', 'name', 'description', 'lab_id', 'is_functional',
+                 'is_occupied', 'occupied_by', 'occupied_until', 'created_at'),
+    'devices': ('id', 'name', 'device_type', 'ip_address', 'os_info', 'special_apps',
+                'station_id', 'created_at'),
+}
+
+DEVICE_TYPES = ('PC', 'Server')
+MAX_REPORTED_ERRORS = 1000
+
+
+def format_for_filename(filename, default='csv'):
+    """Guess the format from a file extension (.csv, .jsonl or .ndjson)"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    return default
+
+
+# Export
+def export_lines(records, fields, fmt, chunk_size=65536):
+    """Yield records as CSV or JSON-lines text in chunks of about chunk_size characters"""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        write = lambda record: writer.writerow([record.get(field) for field in fields])
+    else:
+        write = lambda record: buffer.write(json.dumps({field: record.get(field) for field in fields}) + '\n')
+    for record in records:
+        write(record)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Import
+def read_rows(lines, fmt):
+    """Yield (line number, row dict, error) for every row of CSV or JSON-lines text"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            for row in reader:
+                # Extra cells end up under the None key
+                if None in row:
+                    yield reader.line_num, None, 'more cells than columns'
+                else:
+                    yield reader.line_num, row, None
+        except csv.Error as e:
+            yield reader.line_num, None, f'invalid CSV: {e}'
+        return
+
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f'invalid JSON: {e.msg}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'expected a JSON object'
+            continue
+        yield line_number, row, None
+
+
+def text(row, field, required=False):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f'{field} is required')
+    return value
+
+
+def parse_bool(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 'yes', 'y'):
+        return True
+    if value in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f'not a boolean: {value}')
+
+
+def parse_id(row, field):
+    value = text(row, field)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{field} must be a number') from None
+
+
+class ImportContext:
+    """Lookups used to resolve the lab and station a row refers to"""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self._labs_by_name = None
+        self._stations_by_name = None
+
+    def lab_id(self, row):
+        lab_id = parse_id(row, 'lab_id')
+        if lab_id is not None:
+            if not self.repository.labs.get(lab_id):
+                raise ValueError(f'lab {lab_id} does not exist')
+            return lab_id
+        lab_name = text(row, 'lab_name')
+        if not lab_name:
+            raise ValueError('lab_id or lab_name is required')
+        if self._labs_by_name is None:
+            self._labs_by_name = {lab['name']: lab['id'] for lab in self.repository.labs.all()}
+        if lab_name not in self._labs_by_name:
+            raise ValueError(f'lab {lab_name!r} does not exist')
+        return self._labs_by_name[lab_name]
+
+    def station_id(self, row):
+        station_id = parse_id(row, 'station_id')
+        if station_id is not None:
+            if not self.repository.stations.get(station_id):
+                raise ValueError(f'station {station_id} does not exist')
+            return station_id
+        station_name = text(row, 'station_name')
+        if not station_name:
+            raise ValueError('station_id, or lab_name and station_name, is required')
+        key = (self.lab_id(row), station_name)
+        if self._stations_by_name is None:
+            self._stations_by_name = {
+                (station['lab_id'], station['name']): station['id']
+                for station in self.repository.stations.all()
+            }
+        if key not in self._stations_by_name:
+            raise ValueError(f'station {station_name!r} does not exist in that lab')
+        return self._stations_by_name[key]
+
+
+def lab_record(row, context):
+    return {
+        'name': text(row, 'name', required=True),
+        'description': text(row, 'description'),
+        'location': text(row, 'location'),
+    }
+
+
+def station_record(row, context):
+    return {
+        'name': text(row, 'name', required=True),
+        'description': text(row, 'description'),
+        'lab_id': context.lab_id(row),
+        'is_occupied': False,
+        'occupied_by': None,
+        'occupied_at': None,
+        'occupied_until': None,
+        'is_functional': parse_bool(row.get('is_functional'), True),
+    }
+
+
+def device_record(row, context):
+    device_type = text(row, 'device_type', required=True)
+    if device_type not in DEVICE_TYPES:
+        raise ValueError(f'device_type must be one of {", ".join(DEVICE_TYPES)}')
+    ip_address = text(row, 'ip_address', required=True)
+    try:
+        ipaddress.IPv4Address(ip_address)
+    except ValueError:
+        raise ValueError(f'invalid IPv4 address: {ip_address}') from None
+    return {
+        'name': text(row, 'name', required=True),
+        'device_type': device_type,
+        'ip_address': ip_address,
+        'os_info': text(row, 'os_info'),
+        'special_apps': text(row, 'special_apps'),
+        'station_id': context.station_id(row),
+        'is_online': False,
+        'last_ping': None,
+    }
+
+
+RECORD_BUILDERS = {
+    'labs': lab_record,
+    'stations': station_record,
+    'devices': device_record,
+}
+
+
+def import_rows(repository, name, rows):
+    """Validate rows and add the valid ones to the collection in a single write
+
+    rows yields (line number, row, error) as read_rows does. Returns a summary
+    with the number of records created, their ids and the per-row errors.
+    """
+    build = RECORD_BUILDERS[name]
+    context = ImportContext(repository)
+    created_at = datetime.now().isoformat()
+    records, errors = [], []
+    error_count = 0
+    for line_number, row, error in rows:
+        if error is None:
+            try:
+                record = build(row, context)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line_number, 'error': error})
+            continue
+        record['created_at'] = created_at
+        records.append(record)
+
+    created = getattr(repository, name).insert_many(records) if records else []
+    return {
+        'created': len(created),
+        'ids': [record['id'] for record in created],
+        'error_count': error_count,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import and export of labs, stations and devices')
+    parser.add_argument('--backend', default=os.environ.get('SW_LABS_STORAGE', 'json'), choices=('json', 'sqlite'),
+                        help='storage backend (default: $SW_LABS_STORAGE or json)')
+    parser.add_argument('--data-dir', default='data', help='JSON data directory (default: data)')
+    parser.add_argument('--db', default=os.environ.get('SW_LABS_SQLITE_PATH', 'instance/sw_labs.db'),
+                        help='SQLite database for the sqlite backend')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='write a collection to a file or stdout')
+    export_parser.add_argument('collection', choices=sorted(EXPORT_FIELDS))
+    export_parser.add_argument('-f', '--format', choices=sorted(FORMATS), help='csv or jsonl (default: from -o, else csv)')
+    export_parser.add_argument('-o', '--output', help='output file (default: stdout)')
+
+    import_parser = commands.add_parser('import', help='add the rows of a file to a collection')
+    import_parser.add_argument('collection', choices=sorted(RECORD_BUILDERS))
+    import_parser.add_argument('file')
+    import_parser.add_argument('-f', '--format', choices=sorted(FORMATS), help='csv or jsonl (default: from the file name)')
+    args = parser.parse_args()
+
+    repository = open_repository(args.backend, args.data_dir, args.db)
+
+    if args.command == 'export':
+        fmt = args.format or format_for_filename(args.output)
+        collection = getattr(repository, args.collection)
+        output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+        try:
+            for chunk in export_lines(collection.all(), EXPORT_FIELDS[args.collection], fmt):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+        if args.output:
+            print(f"✅ Exported {len(collection.all())} {args.collection} to {args.output}")
+        return 0
+
+    fmt = args.format or format_for_filename(args.file)
+    with open(args.file, 'r', encoding='utf-8-sig', newline='') as f:
+        summary = import_rows(repository, args.collection, read_rows(f, fmt))
+    print(f"✅ Imported {summary['created']} {args.collection}")
+    if summary['error_count']:
+        print(f"⚠️  Skipped {summary['error_count']} invalid rows:")
+        for error in summary['errors']:
+            print(f"   line {error['line']}: {error['error']}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
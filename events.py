@@ -0,0 +1,90 @@
+"""
+Live status events for SW Labs Management System
+Fans out device and station changes to Server-Sent Events subscribers, each
+filtered to the lab or station its page shows. Every open stream holds a
+server thread, so a broker can be limited to a number of streams and turn
+further subscribers away; their pages poll /api/device_status instead.
+"""
+
+import json
+import queue
+import threading
+
+
+class Subscription:
+    """Queue of events for one connected client"""
+
+    def __init__(self, lab_id=None, station_id=None, max_queue=100):
+        self.lab_id = lab_id
+        self.station_id = station_id
+        self.closed = False
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def matches(self, data):
+        if self.station_id is not None and data.get('station_id') != self.station_id:
+            return False
+        if self.lab_id is not None and data.get('lab_id') != self.lab_id:
+            return False
+        return True
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A client this far behind reconnects and re-reads the page state
+            self.closed = True
+
+    def get(self, timeout):
+        """Return the next (event_type, data), or None if nothing arrived in time"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """Publishes status deltas to every matching subscription
+
+    With max_subscriptions, at most that many streams are open at once.
+    """
+
+    def __init__(self, max_subscriptions=None):
+        self.max_subscriptions = max_subscriptions
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self, lab_id=None, station_id=None):
+        """Return a new Subscription, or None when max_subscriptions are already open"""
+        subscription = Subscription(lab_id=lab_id, station_id=station_id)
+        with self._lock:
+            if self.max_subscriptions and len(self._subscriptions) >= self.max_subscriptions:
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event_type, data):
+        """Send an event to subscribers whose lab/station filter matches data"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.closed and subscription.matches(data):
+                subscription.put((event_type, data))
+
+    def stream(self, subscription, heartbeat=15):
+        """Yield the subscription's events in text/event-stream format"""
+        try:
+            yield 'retry: 5000\n\n'
+            while not subscription.closed:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    # Comment line that keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                event_type, data = event
+                yield f'event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n'
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,194 @@
+"""
+Device liveness state for SW Labs Management System
+Keeps the latest ping result per device in memory, apart from the device
+configuration in devices.json. The table is flushed to a compact sidecar file
+in batches and every online/offline transition is appended to an event log.
+"""
+
+import bisect
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from storage import write_json_atomic
+
+
+class LivenessTable:
+    """Latest online/offline state per device"""
+
+    def __init__(self, status_path, events_path, flush_interval=300):
+        self.status_path = Path(status_path)
+        self.events_path = Path(events_path)
+        self.flush_interval = flush_interval
+        self.version = 0         # increases whenever any status or last_ping changes
+        self.status_version = 0  # increases on online/offline transitions only
+        self._lock = threading.Lock()
+        # device_id -> {'is_online': bool, 'last_ping': iso string, 'changed_at': iso string,
+        #               'latency': seconds of the last successful probe or None}
+        self._status = {}
+        # (changed_at datetime, device_id) in time order, for changed_since()
+        self._changes = []
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        # When the monitor runs in another process, web workers follow the
+        # sidecar it writes; _stamp identifies the version last read or written
+        self._stamp = None
+
+    def _file_stamp(self):
+        try:
+            stat = self.status_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_status(self, status):
+        """Add the sidecar file's entries to status; return False if it could not be parsed"""
+        try:
+            with open(self.status_path, 'r', encoding='utf-8') as f:
+                for device_id, entry in json.load(f).items():
+                    is_online, last_ping = entry[0], entry[1]
+                    # Files written before changed_at and latency were tracked have fewer fields
+                    changed_at = entry[2] if len(entry) > 2 else last_ping
+                    latency = entry[3] if len(entry) > 3 else None
+                    status[int(device_id)] = {'is_online': is_online, 'last_ping': last_ping,
+                                              'changed_at': changed_at, 'latency': latency}
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, ValueError, TypeError, IndexError) as e:
+            print(f"Error loading {self.status_path}: {e}")
+            return False
+        return True
+
+    def load(self, devices_data=()):
+        """Load the sidecar file, seeding unknown devices from legacy devices.json fields"""
+        status = {}
+        for device_data in devices_data:
+            if device_data.get('last_ping'):
+                status[device_data['id']] = {
+                    'is_online': bool(device_data.get('is_online')),
+                    'last_ping': device_data['last_ping'],
+                    'changed_at': device_data['last_ping'],
+                    'latency': None
+                }
+        stamp = self._file_stamp()
+        self._read_status(status)
+        with self._lock:
+            self._status = status
+            self._changes = self._sorted_changes(status)
+            self._stamp = stamp
+            self.version += 1
+            self.status_version += 1
+
+    def refresh(self):
+        """Reload the sidecar if another process rewrote it and return the ids whose online state changed
+
+        Used by web workers when the monitor runs as a separate process.
+        """
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return []
+        status = {}
+        if not self._read_status(status):
+            return []
+        with self._lock:
+            changed = [
+                device_id for device_id, entry in status.items()
+                if device_id not in self._status or self._status[device_id]['is_online'] != entry['is_online']
+            ]
+            # Devices only known from devices.json keep their seeded entry
+            for device_id, entry in self._status.items():
+                status.setdefault(device_id, entry)
+            self._status = status
+            self._changes = self._sorted_changes(status)
+            self._stamp = stamp
+            self.version += 1
+            if changed:
+                self.status_version += 1
+        return changed
+
+    @staticmethod
+    def _sorted_changes(status):
+        return sorted(
+            (datetime.fromisoformat(entry['changed_at']), device_id)
+            for device_id, entry in status.items()
+        )
+
+    def get(self, device_id):
+        """Return {'is_online', 'last_ping', 'changed_at', 'latency'} for a device, or None if it was never probed"""
+        return self._status.get(device_id)
+
+    def record_sweep(self, results, checked_at=None):
+        """Store the results of a ping sweep and return the online/offline transitions
+
+        results maps device_id to the round-trip time, or None when the device
+        did not answer.
+        """
+        checked_at = checked_at or datetime.now().isoformat()
+        transitions = []
+        checked_dt = datetime.fromisoformat(checked_at)
+        with self._lock:
+            status = dict(self._status)
+            for device_id, rtt in results.items():
+                is_online = rtt is not None
+                previous = status.get(device_id)
+                if previous is None or previous['is_online'] != is_online:
+                    transitions.append({'device_id': device_id, 'is_online': is_online, 'at': checked_at})
+                    changed_at = checked_at
+                    self._changes.append((checked_dt, device_id))
+                else:
+                    changed_at = previous['changed_at']
+                status[device_id] = {'is_online': is_online, 'last_ping': checked_at,
+                                     'changed_at': changed_at, 'latency': round(rtt, 6) if is_online else None}
+            # Readers keep using the old dict until the new one is complete
+            self._status = status
+            self._dirty = True
+            self.version += 1
+            if transitions:
+                self.status_version += 1
+            # Older entries for the same device are superseded; compact now and then
+            if len(self._changes) > 2 * len(status) + 1000:
+                self._changes = self._sorted_changes(status)
+
+        if transitions:
+            self._append_events(transitions)
+        if transitions or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return transitions
+
+    def changed_since(self, since):
+        """Return the ids of devices whose online/offline state changed after since
+
+        Change times are naive local time; an aware since is converted to it.
+        """
+        if since.tzinfo is not None:
+            since = since.astimezone().replace(tzinfo=None)
+        changes = self._changes
+        start = bisect.bisect_right(changes, (since, float('inf')))
+        return {device_id for _, device_id in changes[start:]}
+
+    def _append_events(self, transitions):
+        """Append transitions to the event log, one JSON object per line"""
+        try:
+            with open(self.events_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(event) + '\n' for event in transitions))
+        except OSError as e:
+            print(f"Error writing to {self.events_path}: {e}")
+
+    def flush(self):
+        """Write the table to the sidecar file if it changed since the last flush"""
+        with self._lock:
+            if not self._dirty:
+                return
+            compact = {
+                str(device_id): [entry['is_online'], entry['last_ping'], entry['changed_at'], entry['latency']]
+                for device_id, entry in self._status.items()
+            }
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        try:
+            write_json_atomic(self.status_path, compact, separators=(',', ':'))
+            self._stamp = self._file_stamp()
+        except OSError as e:
+            print(f"Error saving to {self.status_path}: {e}")
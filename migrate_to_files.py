@@ -1,127 +1,71 @@
 #!/usr/bin/env python3
 """
-Migration script to convert SQLite database to JSON files
+Migration script to move data between the SQLite database and JSON files
 """
 
+import argparse
 import json
-import sqlite3
 from datetime import datetime
 from pathlib import Path
 
-def migrate_database():
+from sqlite_storage import SqliteRepository
+from storage import Repository
+
+COLLECTIONS = ('users', 'labs', 'stations', 'devices', 'reservations')
+
+def migrate_database(db_path='instance/sw_labs.db', data_dir='data'):
     """Migrate data from SQLite to JSON files"""
-    
-    # Create data directory
-    data_dir = Path('data')
+    db_path = Path(db_path)
+    data_dir = Path(data_dir)
     data_dir.mkdir(exist_ok=True)
     
-    # Database file path
-    db_path = Path('instance/sw_labs.db')
-    
     if not db_path.exists():
         print("❌ Database file not found. Please run the application first to create the database.")
         return False
     
     try:
-        # Connect to SQLite database
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        database = SqliteRepository(db_path)
+        files = Repository(data_dir)
         
         print("🔄 Starting migration from SQLite to JSON files...")
         
-        # Migrate Users
-        print("📝 Migrating users...")
-        cursor.execute("SELECT id, username, email, password_hash, is_admin, created_at FROM user")
-        users = cursor.fetchall()
-        
-        users_data = []
-        for user in users:
-            users_data.append({
-                'id': user[0],
-                'username': user[1],
-                'email': user[2],
-                'password_hash': user[3],
-                'is_admin': bool(user[4]),
-                'created_at': user[5]
-            })
-        
-        with open(data_dir / 'users.json', 'w', encoding='utf-8') as f:
-            json.dump(users_data, f, indent=2)
-        print(f"✅ Migrated {len(users_data)} users")
-        
-        # Migrate Labs
-        print("🏢 Migrating labs...")
-        cursor.execute("SELECT id, name, description, location, created_at FROM lab")
-        labs = cursor.fetchall()
-        
-        labs_data = []
-        for lab in labs:
-            labs_data.append({
-                'id': lab[0],
-                'name': lab[1],
-                'description': lab[2],
-                'location': lab[3],
-                'created_at': lab[4]
-            })
-        
-        with open(data_dir / 'labs.json', 'w', encoding='utf-8') as f:
-            json.dump(labs_data, f, indent=2)
-        print(f"✅ Migrated {len(labs_data)} labs")
-        
-        # Migrate Stations
-        print("🖥️ Migrating stations...")
-        cursor.execute("SELECT id, name, description, lab_id, is_occupied, occupied_by, occupied_at, created_at FROM station")
-        stations = cursor.fetchall()
-        
-        stations_data = []
-        for station in stations:
-            stations_data.append({
-                'id': station[0],
-                'name': station[1],
-                'description': station[2],
-                'lab_id': station[3],
-                'is_occupied': bool(station[4]),
-                'occupied_by': station[5],
-                'occupied_at': station[6],
-                'created_at': station[7]
-            })
+        for name in COLLECTIONS:
+            records = getattr(database, name).all()
+            getattr(files, name).save(records)
+            print(f"✅ Migrated {len(records)} {name}")
         
-        with open(data_dir / 'stations.json', 'w', encoding='utf-8') as f:
-            json.dump(stations_data, f, indent=2)
-        print(f"✅ Migrated {len(stations_data)} stations")
+        print("\n🎉 Migration completed successfully!")
+        print(f"📁 Data files created in the '{data_dir}' directory:")
+        for name in COLLECTIONS:
+            print(f"   - {name}.json")
         
-        # Migrate Devices
-        print("💻 Migrating devices...")
-        cursor.execute("SELECT id, name, device_type, ip_address, os_info, special_apps, is_online, last_ping, station_id, created_at FROM device")
-        devices = cursor.fetchall()
+        return True
         
-        devices_data = []
-        for device in devices:
-            devices_data.append({
-                'id': device[0],
-                'name': device[1],
-                'device_type': device[2],
-                'ip_address': device[3],
-                'os_info': device[4],
-                'special_apps': device[5],
-                'is_online': bool(device[6]),
-                'last_ping': device[7],
-                'station_id': device[8],
-                'created_at': device[9]
-            })
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+def migrate_files_to_database(data_dir='data', db_path='instance/sw_labs.db'):
+    """Migrate data from JSON files to SQLite (the inverse of migrate_database)"""
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        print("❌ Data directory not found.")
+        return False
+    
+    try:
+        files = Repository(data_dir)
+        database = SqliteRepository(db_path)
         
-        with open(data_dir / 'devices.json', 'w', encoding='utf-8') as f:
-            json.dump(devices_data, f, indent=2)
-        print(f"✅ Migrated {len(devices_data)} devices")
+        print("🔄 Starting migration from JSON files to SQLite...")
         
-        conn.close()
+        # Parents first so foreign keys always point at existing rows
+        for name in COLLECTIONS:
+            records = getattr(files, name).all()
+            getattr(database, name).save(records)
+            print(f"✅ Migrated {len(records)} {name}")
         
         print("\n🎉 Migration completed successfully!")
-        print("📁 Data files created in the 'data' directory:")
-        print("   - users.json")
-        print("   - labs.json")
-        print("   - stations.json")
-        print("   - devices.json")
+        print(f"🗄️ Database written to {db_path}")
         
         return True
         
@@ -236,16 +180,29 @@ def create_sample_data_files():
     print("✅ Sample data files created!")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Move SW Labs data between JSON files and SQLite")
+    direction = parser.add_mutually_exclusive_group()
+    direction.add_argument('--to-sqlite', action='store_true', help="copy data/*.json into the SQLite database")
+    direction.add_argument('--from-sqlite', action='store_true', help="copy the SQLite database into data/*.json")
+    parser.add_argument('--db', default='instance/sw_labs.db', help="SQLite database path")
+    parser.add_argument('--data-dir', default='data', help="JSON data directory")
+    args = parser.parse_args()
+    
     print("=" * 50)
     print("SW Labs Management System - Data Migration")
     print("=" * 50)
     
-    # Check if database exists and migrate
-    if Path('instance/sw_labs.db').exists():
-        migrate_database()
+    if args.to_sqlite:
+        if migrate_files_to_database(args.data_dir, args.db):
+            print("\n🚀 You can now run the application with SQLite storage!")
+            print("   Run: SW_LABS_STORAGE=sqlite python run.py")
     else:
-        print("📁 No existing database found. Creating sample data files...")
-        create_sample_data_files()
-    
-    print("\n🚀 You can now run the application with file-based storage!")
-    print("   Run: python run.py") 
\ No newline at end of file
+        if args.from_sqlite or Path(args.db).exists():
+            # Check if database exists and migrate
+            migrate_database(args.db, args.data_dir)
+        else:
+            print("📁 No existing database found. Creating sample data files...")
+            create_sample_data_files()
+        
+        print("\n🚀 You can now run the application with file-based storage!")
+        print("   Run: python run.py")
@@ -0,0 +1,206 @@
+"""
+Data models for SW Labs Management System
+Thin slotted objects built from the JSON records for use in templates;
+timestamps stay ISO strings until a template reads them
+"""
+
+from datetime import datetime
+
+
+class lazy_datetime:
+    """Attribute that keeps the stored ISO string and parses it on first access
+
+    The string lives in the slot named after the attribute with a leading
+    underscore (constructors fill that slot directly) and is replaced by the
+    parsed datetime the first time it is read.
+    """
+
+    def __set_name__(self, owner, name):
+        self.slot = '_' + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if not value:
+            return None
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value or None)
+
+
+class User:
+    # Flask-Login's UserMixin has no __slots__, so deriving from it would give
+    # every User a __dict__ again; its four members are implemented here instead
+    __slots__ = ('id', 'username', 'email', 'password_hash', 'is_admin', '_created_at')
+    created_at = lazy_datetime()
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_data):
+        self.id = user_data['id']
+        self.username = user_data['username']
+        self.email = user_data['email']
+        self.password_hash = user_data['password_hash']
+        self.is_admin = user_data['is_admin']
+        self._created_at = user_data['created_at']
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.id == other.id
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+class Lab:
+    __slots__ = ('id', 'name', 'description', 'location', '_created_at', 'stations')
+    created_at = lazy_datetime()
+
+    def __init__(self, lab_data):
+        self.id = lab_data['id']
+        self.name = lab_data['name']
+        self.description = lab_data.get('description', '')
+        self.location = lab_data.get('location', '')
+        self._created_at = lab_data['created_at']
+        self.stations = []
+
+class Station:
+    __slots__ = ('id', 'name', 'description', 'lab_id', 'is_occupied', 'occupied_by',
+                 '_occupied_at', '_occupied_until', 'is_functional', '_created_at', 'devices', 'lab')
+    occupied_at = lazy_datetime()
+    occupied_until = lazy_datetime()
+    created_at = lazy_datetime()
+
+    def __init__(self, station_data):
+        self.id = station_data['id']
+        self.name = station_data['name']
+        self.description = station_data.get('description', '')
+        self.lab_id = station_data['lab_id']
+        self.is_occupied = station_data['is_occupied']
+        self.occupied_by = station_data.get('occupied_by')
+        self._occupied_at = station_data.get('occupied_at')
+        self._occupied_until = station_data.get('occupied_until')
+        self.is_functional = station_data.get('is_functional', True)
+        self._created_at = station_data['created_at']
+        self.devices = []
+        self.lab = None  # Will be set when needed
+
+class Device:
+    __slots__ = ('id', 'name', 'device_type', 'ip_address', 'os_info', 'special_apps', 'station_id',
+                 '_created_at', 'station', '_liveness', '_stored_online', '_stored_last_ping')
+    created_at = lazy_datetime()
+
+    def __init__(self, device_data, liveness=None):
+        self.id = device_data['id']
+        self.name = device_data['name']
+        self.device_type = device_data['device_type']
+        self.ip_address = device_data['ip_address']
+        self.os_info = device_data.get('os_info', '')
+        self.special_apps = device_data.get('special_apps', '')
+        self.station_id = device_data['station_id']
+        self._created_at = device_data['created_at']
+        self.station = None  # Will be set when needed
+        # Ping results live in the liveness table; the devices.json fields are
+        # only used for devices that have not been probed yet
+        self._liveness = liveness
+        self._stored_online = device_data.get('is_online', False)
+        self._stored_last_ping = device_data.get('last_ping')
+
+    def _status(self):
+        if self._liveness is not None:
+            status = self._liveness.get(self.id)
+            if status is not None:
+                return status['is_online'], status['last_ping']
+        return self._stored_online, self._stored_last_ping
+
+    @property
+    def is_online(self):
+        return self._status()[0]
+
+    @property
+    def last_ping(self):
+        last_ping = self._status()[1]
+        return datetime.fromisoformat(last_ping) if last_ping else None
+
+
+class LabGraph:
+    """Lab/Station/Device object graph hydrated in a single pass per collection
+
+    Stations and devices are attached to their parents through id dicts, so
+    building the graph costs O(labs + stations + devices) instead of a nested
+    join. The graph is shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, labs_data, stations_data, devices_data, key=None, liveness=None):
+        self.key = key
+        self.labs = [Lab(lab_data) for lab_data in labs_data]
+        self.labs_by_id = {lab.id: lab for lab in self.labs}
+
+        self.stations = []
+        self.stations_by_id = {}
+        for station_data in stations_data:
+            station = Station(station_data)
+            station.lab = self.labs_by_id.get(station.lab_id)
+            if station.lab is not None:
+                station.lab.stations.append(station)
+            self.stations.append(station)
+            self.stations_by_id[station.id] = station
+
+        self.devices = []
+        self.devices_by_id = {}
+        for device_data in devices_data:
+            device = Device(device_data, liveness)
+            device.station = self.stations_by_id.get(device.station_id)
+            if device.station is not None:
+                device.station.devices.append(device)
+            self.devices.append(device)
+            self.devices_by_id[device.id] = device
+
+
+class UserCache:
+    """User objects for flask-login, rebuilt only when the users collection changes
+
+    load_user runs on every authenticated request; this keeps it to a dict
+    lookup instead of reading and scanning users.json each time.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._state = (None, {})  # (collection version, user_id -> User)
+
+    def all(self):
+        """Return every User, built once per version of the users collection"""
+        version, records = self.collection.snapshot()
+        users = self._current(version)
+        for record in records:
+            if record['id'] not in users:
+                users[record['id']] = User(record)
+        return [users[record['id']] for record in records]
+
+    def _current(self, version):
+        cached_version, users = self._state
+        if cached_version != version:
+            users = {}
+            self._state = (version, users)
+        return users
+
+    def get(self, user_id):
+        """Return the User with the given id, or None"""
+        self.collection.refresh()
+        users = self._current(self.collection.version)
+        user = users.get(user_id)
+        if user is None:
+            user_data = self.collection.get(user_id)
+            if user_data is None:
+                return None
+            user = users[user_id] = User(user_data)
+        return user
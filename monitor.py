@@ -0,0 +1,234 @@
+"""
+Device monitoring for SW Labs Management System
+Probes devices in parallel so a sweep takes about as long as the slowest batch,
+not the sum of every device's timeout. Each device type is checked with its own
+probe (ICMP echo, TCP connect, UDP or HTTP HEAD); every probe runs on one
+asyncio event loop with non-blocking sockets instead of a thread per probe.
+
+ICMP needs a socket the operating system may refuse: an unprivileged "ping"
+socket (Linux with net.ipv4.ping_group_range covering the monitor's group,
+and macOS), else a raw socket, which takes root, CAP_NET_RAW or, on Windows,
+an administrator. Where neither opens, use TCP probes instead.
+"""
+
+import asyncio
+import ipaddress
+import itertools
+import os
+import socket
+import struct
+import time
+
+# Probe used for device types missing from the probe_types mapping
+DEFAULT_PROBE = {'type': 'icmp'}
+
+# Echo request and echo reply types per address family
+ICMP_ECHO = {
+    socket.AF_INET: (8, 0),
+    socket.AF_INET6: (128, 129),
+}
+ICMP_HEADER = struct.Struct('!BBHHH')   # type, code, checksum, identifier, sequence
+_icmp_sequence = itertools.count()
+_icmp_socket_types = {}   # family -> the socket type that opened last time
+_icmp_warned = False
+
+
+def icmp_checksum(data):
+    """Internet checksum (RFC 1071) of an ICMP message"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def icmp_socket(family):
+    """Open a non-blocking ICMP socket: a ping socket if allowed, else a raw one"""
+    global _icmp_warned
+    protocol = socket.IPPROTO_ICMP if family == socket.AF_INET else socket.IPPROTO_ICMPV6
+    preferred = _icmp_socket_types.get(family)
+    kinds = [preferred] if preferred else [socket.SOCK_DGRAM, socket.SOCK_RAW]
+    error = None
+    for kind in kinds:
+        try:
+            sock = socket.socket(family, kind, protocol)
+        except OSError as e:
+            error = e
+            continue
+        _icmp_socket_types[family] = kind
+        sock.setblocking(False)
+        return sock
+    if not _icmp_warned:
+        _icmp_warned = True
+        print(f"Cannot open ICMP sockets ({error}); allow ping sockets, run the monitor with "
+              f"CAP_NET_RAW or use 'tcp' probes in PROBE_TYPES")
+    raise error
+
+
+def parse_echo_reply(data, family, token):
+    """True when data is the echo reply carrying token; IPv4 replies may start with the IP header"""
+    if family == socket.AF_INET and data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0f) * 4:]
+    if len(data) < ICMP_HEADER.size + len(token):
+        return False
+    return data[0] == ICMP_ECHO[family][1] and data[ICMP_HEADER.size:ICMP_HEADER.size + len(token)] == token
+
+
+async def icmp_probe(address, timeout):
+    """ICMP echo on a non-blocking socket; the reply is matched by a random payload
+
+    Ping sockets pick their own identifier, and raw sockets see every reply
+    to this host, so the payload rather than the identifier tells replies apart.
+    """
+    loop = asyncio.get_running_loop()
+    family, _, _, _, sockaddr = (await loop.getaddrinfo(address, None, type=socket.SOCK_DGRAM))[0]
+    sock = icmp_socket(family)
+    try:
+        token = os.urandom(8)
+        request_type = ICMP_ECHO[family][0]
+        identifier, sequence = os.getpid() & 0xffff, next(_icmp_sequence) & 0xffff
+        checksum = 0
+        if family == socket.AF_INET:
+            # The kernel fills in the ICMPv6 checksum, which covers the IPv6 addresses
+            checksum = icmp_checksum(ICMP_HEADER.pack(request_type, 0, 0, identifier, sequence) + token)
+        started = time.perf_counter()
+        sock.sendto(ICMP_HEADER.pack(request_type, 0, checksum, identifier, sequence) + token, sockaddr)
+        while True:
+            data = await loop.sock_recv(sock, 1024)
+            if parse_echo_reply(data, family, token):
+                return time.perf_counter() - started
+    finally:
+        sock.close()
+
+
+async def tcp_probe(address, timeout, port=22):
+    """TCP connect to port; a refused connection still proves the host answered"""
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.open_connection(address, port)
+    except ConnectionRefusedError:
+        return time.perf_counter() - started
+    rtt = time.perf_counter() - started
+    writer.close()
+    return rtt
+
+
+class _UdpReply(asyncio.DatagramProtocol):
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(True)
+
+    def error_received(self, exc):
+        # ICMP port unreachable comes back as ECONNREFUSED: the host is up
+        if not self.future.done():
+            if isinstance(exc, ConnectionRefusedError):
+                self.future.set_result(True)
+            else:
+                self.future.set_exception(exc)
+
+
+async def udp_probe(address, timeout, port=7, payload='\n'):
+    """Send one datagram and wait for a reply or a port-unreachable error"""
+    loop = asyncio.get_running_loop()
+    answered = loop.create_future()
+    started = time.perf_counter()
+    transport, _ = await loop.create_datagram_endpoint(lambda: _UdpReply(answered), remote_addr=(address, port))
+    try:
+        transport.sendto(payload.encode())
+        await answered
+    finally:
+        transport.close()
+    return time.perf_counter() - started
+
+
+async def http_probe(address, timeout, port=80, path='/'):
+    """HTTP HEAD request; any HTTP status line counts as online"""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(address, port)
+    try:
+        writer.write(f'HEAD {path} HTTP/1.0\r\nHost: {address}\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+    finally:
+        writer.close()
+    if not status_line.startswith(b'HTTP/'):
+        return None
+    return time.perf_counter() - started
+
+
+PROBES = {
+    'icmp': icmp_probe,
+    'tcp': tcp_probe,
+    'udp': udp_probe,
+    'http': http_probe,
+}
+
+
+def subnet_of(ip_address):
+    """Return the /24 (IPv4) or /64 (IPv6) network of an address, or the name itself for host names"""
+    try:
+        address = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return ip_address
+    prefix = 24 if address.version == 4 else 64
+    return ipaddress.ip_network(f'{address}/{prefix}', strict=False)
+
+
+async def _run_probe(device, spec, timeout, limit, subnet_limit):
+    options = dict(spec)
+    probe = PROBES[options.pop('type')]
+    # The subnet slot is taken first, so probes queued behind a busy subnet do
+    # not hold global slots that other subnets could use
+    async with subnet_limit, limit:
+        try:
+            return await asyncio.wait_for(probe(device['ip_address'], timeout, **options), timeout)
+        except (asyncio.TimeoutError, OSError, ValueError):
+            return None
+
+
+async def _sweep(devices, probe_types, concurrency, per_subnet, timeout, deadline):
+    limit = asyncio.Semaphore(concurrency)
+    subnet_limits = {}
+    tasks = {}
+    for device in devices:
+        spec = probe_types.get(device.get('device_type'), DEFAULT_PROBE)
+        if spec.get('type') not in PROBES:
+            print(f"Unknown probe type {spec.get('type')!r} for device {device['id']}")
+            continue
+        subnet = subnet_of(device['ip_address'])
+        if subnet not in subnet_limits:
+            subnet_limits[subnet] = asyncio.Semaphore(per_subnet)
+        task = asyncio.ensure_future(_run_probe(device, spec, timeout, limit, subnet_limits[subnet]))
+        tasks[task] = device['id']
+
+    results = {}
+    if not tasks:
+        return results
+    done, not_done = await asyncio.wait(tasks, timeout=deadline)
+    for task in done:
+        results[tasks[task]] = task.result()
+    for task in not_done:
+        task.cancel()
+    if not_done:
+        await asyncio.wait(not_done)
+        print(f"Probe sweep deadline reached, {len(not_done)} devices were not probed")
+    return results
+
+
+def probe_sweep(devices, probe_types=None, concurrency=256, per_subnet=64, timeout=2.0, deadline=25.0):
+    """Probe every device concurrently and return {device_id: rtt in seconds or None}
+
+    probe_types maps a device_type to a probe spec such as {'type': 'tcp',
+    'port': 22}; other device types are pinged. At most `concurrency` probes
+    run at once, and at most `per_subnet` of them against the same subnet.
+    Each probe is limited to `timeout` seconds. Devices whose probe has not
+    finished when `deadline` seconds have passed are left out of the result,
+    so callers keep their previous status instead of marking them offline.
+    """
+    if not devices:
+        return {}
+    return asyncio.run(_sweep(devices, probe_types or {}, concurrency, per_subnet, timeout, deadline))
@@ -0,0 +1,142 @@
+"""
+Rendered fragment cache for SW Labs Management System
+Fragments are stored with the version stamps of the records they were rendered
+from and re-rendered only after one of those records changes. Parts that
+depend on who is looking (action buttons, admin links) are left as slot
+markers in the cached HTML and filled in per request.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+# Which counters a changed record bumps besides its own ('<collection>', id):
+# the collection field that names its parent, and the counter kind to bump
+PARENT_COUNTERS = {
+    'stations': ('lab_id', 'lab_stations'),
+    'devices': ('station_id', 'station_devices'),
+}
+
+
+class EntityVersions:
+    """Change counters per record and per parent, fed by collection listeners
+
+    A counter key is ('labs', id), ('stations', id), ('devices', id),
+    ('users', id), or ('lab_stations', lab_id) / ('station_devices', station_id)
+    for the set of stations in a lab or devices on a station. When a collection
+    changes without a matching listener call (another process wrote to it),
+    the epoch moves on, which invalidates every stamp at once.
+    """
+
+    def __init__(self, collections):
+        self.collections = tuple(collections)
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._counters = {}
+        self._seen = {}  # collection name -> last version accounted for
+        for collection in self.collections:
+            collection.add_listener(self._listener(collection.name))
+
+    def _listener(self, name):
+        def on_change(previous_version, version, changes):
+            with self._lock:
+                if changes is None or self._seen.get(name) != previous_version:
+                    self._epoch += 1
+                else:
+                    for old, new in changes:
+                        for record in (old, new):
+                            if record is not None:
+                                self._touch(name, record)
+                self._seen[name] = version
+        return on_change
+
+    def _touch(self, name, record):
+        key = (name, record.get('id'))
+        self._counters[key] = self._counters.get(key, 0) + 1
+        if name in PARENT_COUNTERS:
+            field, kind = PARENT_COUNTERS[name]
+            key = (kind, record.get(field))
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def touch(self, key):
+        """Bump one counter for a change that does not go through a collection"""
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def _check_collections(self):
+        for collection in self.collections:
+            collection.refresh()
+            version = collection.version
+            if self._seen.get(collection.name) != version:
+                self._seen[collection.name] = version
+                self._epoch += 1
+
+    def stamp(self, *keys):
+        """Return a value that changes whenever any of the given counters does"""
+        with self._lock:
+            self._check_collections()
+            return (self._epoch,) + tuple(self._counters.get(key, 0) for key in keys)
+
+
+class FragmentCache:
+    """Size-bounded LRU cache of rendered fragments, one entry per fragment key"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stamp, value)
+        self.hits = 0
+        self.misses = 0         # includes stale entries that had to be re-rendered
+        self.evictions = 0
+
+    def get_or_render(self, key, stamp, render):
+        """Return the cached value for key if it was rendered at stamp, else render() it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = render()
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        """Return the size and hit/miss counters of the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# <!--slot:station_card_actions:12--> -> ('station_card_actions', 'station', '12')
+SLOT_MARKER = re.compile(r'<!--slot:(([a-z]+)_\w+):(\d+)-->')
+
+
+def fill_slots(html, objects, render_slot):
+    """Replace the slot markers in html with render_slot(name, obj)
+
+    objects maps an object kind ('lab', 'station', 'device') to {id: object};
+    markers whose object is unknown are removed.
+    """
+    def replace(match):
+        name, kind, object_id = match.groups()
+        obj = objects.get(kind, {}).get(int(object_id))
+        return render_slot(name, obj) if obj is not None else ''
+    return SLOT_MARKER.sub(replace, html)
@@ -0,0 +1,175 @@
+"""
+Password hashing for SW Labs Management System
+Hashes and checks passwords in a small pool of worker processes, so a burst of
+logins at the start of a lab session keeps the CPU-heavy key derivation off
+the request threads. The pool is started on the first login and runs a
+bounded number of jobs at a time, turning further logins away instead of
+queueing them without limit. Where no pool can be started, passwords are
+hashed on the request thread, one at a time. A login
+whose password was already verified recently is answered from memory, and
+hashes made with an older work factor are replaced when their user logs in.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when every hashing slot stayed taken for the whole queue timeout"""
+
+
+def hash_method(stored_hash):
+    """The method and work factor part of a werkzeug hash: 'scrypt:32768:8:1'"""
+    return (stored_hash or '').split('$', 1)[0]
+
+
+def pool_share(total, web_workers):
+    """Hashing processes for each of web_workers processes sharing a budget of total
+
+    Every web worker gets at least one, so no login is hashed on a request
+    thread; 0 only when the budget itself is 0.
+    """
+    if total <= 0:
+        return 0
+    return max(total // max(web_workers, 1), 1)
+
+
+class CredentialCache:
+    """Recently verified (user id, stored hash, password) triples
+
+    Passwords are never kept: each entry is an HMAC of the password under a
+    key that lives only in this process. Entries are keyed by the stored hash
+    too, so changing a password invalidates them, and expire after ttl seconds.
+    """
+
+    def __init__(self, ttl=900, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()   # (user id, stored hash) -> (digest, expires at)
+        self._lock = threading.Lock()
+
+    def _digest(self, password):
+        return hmac.new(self._key, password.encode('utf-8'), hashlib.sha256).digest()
+
+    def check(self, user_id, stored_hash, password):
+        """True when this password was verified against this hash within ttl seconds"""
+        with self._lock:
+            entry = self._entries.get((user_id, stored_hash))
+            if entry is None:
+                return False
+            if entry[1] < time.monotonic():
+                del self._entries[(user_id, stored_hash)]
+                return False
+            self._entries.move_to_end((user_id, stored_hash))
+        return hmac.compare_digest(entry[0], self._digest(password))
+
+    def remember(self, user_id, stored_hash, password):
+        digest = self._digest(password)
+        with self._lock:
+            self._entries[(user_id, stored_hash)] = (digest, time.monotonic() + self.ttl)
+            self._entries.move_to_end((user_id, stored_hash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class PasswordHasher:
+    """generate_password_hash/check_password_hash run in a bounded process pool
+
+    method is a werkzeug method string; its numbers are the work factor
+    ('scrypt:32768:8:1' is werkzeug's default, raise the first number to make
+    hashing slower, or use e.g. 'pbkdf2:sha256:1000000'). With workers=0,
+    or when the pool cannot be started, jobs run on the calling thread one at
+    a time.
+
+    At most workers * queue_per_worker jobs are submitted at once; a caller
+    that cannot get a slot within queue_timeout seconds gets HasherBusy.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', workers=2, queue_per_worker=4,
+                 queue_timeout=10, cache=None):
+        self.method = method
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.cache = cache
+        self._slots = threading.BoundedSemaphore(max(workers, 1) * queue_per_worker)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._inline_lock = threading.Lock()
+        self._method_prefix = None
+
+    def start(self):
+        """Start the worker processes now rather than on the first login"""
+        if self.workers:
+            self._submit(os.getpid)
+        return self
+
+    def _executor(self):
+        """The pool, started on first use with the platform's default start method; None to hash inline"""
+        with self._pool_lock:
+            if self._pool is None and self.workers:
+                try:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                except (OSError, ValueError, NotImplementedError) as e:
+                    # e.g. no working semaphores on this platform
+                    print(f"Could not start the password hashing pool, hashing inline: {e}")
+                    self.workers = 0
+            return self._pool
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusy()
+        try:
+            pool = self._executor()
+            if pool is None:
+                # One at a time, so inline hashing never takes more than one CPU
+                with self._inline_lock:
+                    return func(*args)
+            try:
+                return pool.submit(func, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool next time
+                print("Password hashing pool broke, restarting it")
+                with self._pool_lock:
+                    if self._pool is pool:
+                        self._pool = None
+                return func(*args)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def hash(self, password):
+        return self._submit(generate_password_hash, password, self.method)
+
+    def verify(self, user_id, stored_hash, password):
+        """Check password against a user's stored hash, from the cache when it was checked recently"""
+        if not stored_hash:
+            return False
+        if self.cache is not None and self.cache.check(user_id, stored_hash, password):
+            return True
+        if not self._submit(check_password_hash, stored_hash, password):
+            return False
+        if self.cache is not None:
+            self.cache.remember(user_id, stored_hash, password)
+        return True
+
+    def needs_rehash(self, stored_hash):
+        """True when a hash was made with another method or work factor than the configured one"""
+        if self._method_prefix is None:
+            # werkzeug fills in the defaults ('scrypt' -> 'scrypt:32768:8:1'), so
+            # ask it rather than comparing against the configured string
+            self._method_prefix = hash_method(self.hash(''))
+        return hash_method(stored_hash) != self._method_prefix
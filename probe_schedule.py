@@ -0,0 +1,144 @@
+"""
+Adaptive probe scheduling for SW Labs Management System
+Every device has its own next-probe time instead of being probed on every
+sweep: devices that answer are probed at the normal interval, devices on
+occupied stations more often, and devices that stay offline back off
+exponentially up to a cap, so long-dead devices stop taking up each sweep
+"""
+
+import heapq
+import json
+import threading
+import time
+from pathlib import Path
+
+from storage import FileLock
+
+
+class ProbeSchedule:
+    """Next probe time per device, kept in a min-heap of (due, device_id)"""
+
+    def __init__(self, interval=30, occupied_interval=10, max_backoff=1800):
+        self.interval = interval
+        self.occupied_interval = occupied_interval
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._heap = []       # (due monotonic time, device_id); stale entries are skipped
+        self._due = {}        # device_id -> due time currently scheduled
+        self._devices = {}    # device_id -> device record the schedule was built from
+        self._failures = {}   # device_id -> probes in a row that got no answer
+
+    def _schedule(self, device_id, due):
+        self._due[device_id] = due
+        heapq.heappush(self._heap, (due, device_id))
+
+    def sync(self, devices_data):
+        """Follow the devices collection: new devices and devices whose address
+        or probe type changed are due at once, deleted devices are dropped"""
+        now = time.monotonic()
+        with self._lock:
+            devices = {device_data['id']: device_data for device_data in devices_data}
+            for device_id in set(self._devices) - set(devices):
+                self._due.pop(device_id, None)
+                self._failures.pop(device_id, None)
+            for device_id, device_data in devices.items():
+                previous = self._devices.get(device_id)
+                if (previous is None or previous['ip_address'] != device_data['ip_address']
+                        or previous.get('device_type') != device_data.get('device_type')):
+                    self._failures.pop(device_id, None)
+                    self._schedule(device_id, now)
+            self._devices = devices
+
+    def delay_for(self, device_id, occupied):
+        """Seconds until the next probe of a device, given its failure count"""
+        failures = self._failures.get(device_id, 0)
+        base = self.occupied_interval if occupied else self.interval
+        if not failures:
+            return base
+        # Devices on occupied stations are never backed off past the normal interval
+        cap = self.interval if occupied else self.max_backoff
+        return min(base * 2 ** (failures - 1), cap)
+
+    def expedite(self, device_ids, within=0):
+        """Probe the devices within `within` seconds unless they are already due sooner"""
+        due = time.monotonic() + within
+        with self._lock:
+            for device_id in device_ids:
+                if device_id in self._devices and self._due.get(device_id, due + 1) > due:
+                    self._schedule(device_id, due)
+
+    def take_due(self):
+        """Remove and return the records of every device whose probe is due"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, device_id = heapq.heappop(self._heap)
+                if self._due.get(device_id) == when:
+                    del self._due[device_id]
+                    due.append(self._devices[device_id])
+        return due
+
+    def next_due(self):
+        """Return the monotonic time of the earliest scheduled probe, or None"""
+        with self._lock:
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def reschedule(self, devices, results, occupied_station_ids=()):
+        """Schedule the next probe of devices taken by take_due, from the sweep results
+
+        Devices missing from results were not probed before the sweep
+        deadline; they keep their failure count and come back after one interval.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for device_data in devices:
+                device_id = device_data['id']
+                if device_id not in self._devices or device_id in self._due:
+                    # Deleted, or expedited again while it was being probed
+                    continue
+                if device_id in results:
+                    if results[device_id] is None:
+                        self._failures[device_id] = self._failures.get(device_id, 0) + 1
+                    else:
+                        self._failures.pop(device_id, None)
+                occupied = device_data['station_id'] in occupied_station_ids
+                self._schedule(device_id, now + self.delay_for(device_id, occupied))
+
+
+class ProbeRequests:
+    """Device ids waiting for an immediate probe, queued in a small file
+
+    Web workers add to it and the monitor takes from it, so a request reaches
+    the monitor whether it runs in the same process or another one.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = FileLock(self.path.with_name(self.path.name + '.lock'))
+
+    def add(self, device_ids):
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(list(device_ids)) + '\n')
+
+    def take(self):
+        """Return and clear the queued device ids"""
+        try:
+            if self.path.stat().st_size == 0:
+                return set()
+        except FileNotFoundError:
+            return set()
+        device_ids = set()
+        with self.lock:
+            with open(self.path, 'r+', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        device_ids.update(json.loads(line))
+                    except ValueError:
+                        continue
+                f.seek(0)
+                f.truncate()
+        return device_ids
@@ -0,0 +1,127 @@
+"""
+Station reservations for SW Labs Management System
+Bookings of future time slots are indexed per station as a list of
+non-overlapping (start, end, reservation_id) intervals sorted by start, so a
+conflict check or the start of a "next free slot" search is one binary search
+"""
+
+import bisect
+from datetime import datetime
+
+from storage import VersionedIndex
+
+
+def reservation_interval(reservation_data):
+    return (datetime.fromisoformat(reservation_data['starts_at']),
+            datetime.fromisoformat(reservation_data['ends_at']),
+            reservation_data['id'])
+
+
+def occupation_interval(station_data):
+    """Return the (start, end) the station is occupied for right now, or None
+
+    An occupation without an end time blocks the station indefinitely
+    (end is datetime.max).
+    """
+    if not station_data.get('is_occupied'):
+        return None
+    start = datetime.fromisoformat(station_data['occupied_at']) if station_data.get('occupied_at') else datetime.min
+    end = datetime.fromisoformat(station_data['occupied_until']) if station_data.get('occupied_until') else datetime.max
+    return start, end
+
+
+class ReservationIndex(VersionedIndex):
+    """Sorted reservation intervals per station, kept in step with the reservations collection"""
+
+    def __init__(self, reservations):
+        self.reservations = reservations
+        self._by_station = {}   # station_id -> [(start, end, reservation_id), ...] sorted by start
+        super().__init__(reservations)
+
+    def _add(self, reservation_data):
+        bisect.insort(self._by_station.setdefault(reservation_data['station_id'], []),
+                      reservation_interval(reservation_data))
+
+    def _remove(self, reservation_data):
+        intervals = self._by_station.get(reservation_data['station_id'], [])
+        interval = reservation_interval(reservation_data)
+        i = bisect.bisect_left(intervals, interval)
+        if i < len(intervals) and intervals[i] == interval:
+            del intervals[i]
+
+    def _apply(self, position, changes):
+        for old, new in changes:
+            if old is not None:
+                self._remove(old)
+            if new is not None:
+                self._add(new)
+
+    def _rebuild(self, record_lists):
+        self._by_station = {}
+        for reservation_data in record_lists[0]:
+            self._by_station.setdefault(reservation_data['station_id'], []).append(
+                reservation_interval(reservation_data))
+        for intervals in self._by_station.values():
+            intervals.sort()
+
+    def _conflict(self, intervals, start, end):
+        # Intervals do not overlap each other, so only the one starting just
+        # before `start` and the one starting at or after it can overlap [start, end)
+        i = bisect.bisect_left(intervals, (start,))
+        for j in (i - 1, i):
+            if 0 <= j < len(intervals):
+                other_start, other_end, reservation_id = intervals[j]
+                if other_start < end and start < other_end:
+                    return reservation_id
+        return None
+
+    def conflict(self, station_id, start, end):
+        """Return the id of a reservation of the station overlapping [start, end), or None"""
+        with self._lock:
+            self._current()
+            return self._conflict(self._by_station.get(station_id, []), start, end)
+
+    def for_station(self, station_id, after=None):
+        """Return the station's (start, end, reservation_id) intervals that end after `after`"""
+        with self._lock:
+            self._current()
+            intervals = self._by_station.get(station_id, [])
+            if after is None:
+                return list(intervals)
+            i = max(0, bisect.bisect_left(intervals, (after,)) - 1)
+            return [interval for interval in intervals[i:] if interval[1] > after]
+
+    def next_free(self, station_id, after, duration, busy_until=None):
+        """Return the earliest start >= after at which the station is free for duration
+
+        busy_until is the end of the station's current occupation, if any;
+        datetime.max (no end time) means there is no free slot and None is returned.
+        """
+        if busy_until == datetime.max:
+            return None
+        if busy_until is not None and busy_until > after:
+            after = busy_until
+        with self._lock:
+            self._current()
+            intervals = self._by_station.get(station_id, [])
+            i = bisect.bisect_left(intervals, (after,))
+            if i > 0 and intervals[i - 1][1] > after:
+                after = intervals[i - 1][1]
+            # Walk the gaps between the following bookings until one is long enough
+            while i < len(intervals) and intervals[i][0] < after + duration:
+                after = max(after, intervals[i][1])
+                i += 1
+            return after
+
+    def free_stations(self, stations_data, start, end):
+        """Return the stations with no reservation or occupation overlapping [start, end)"""
+        free = []
+        with self._lock:
+            self._current()
+            for station_data in stations_data:
+                occupation = occupation_interval(station_data)
+                if occupation and occupation[0] < end and start < occupation[1]:
+                    continue
+                if self._conflict(self._by_station.get(station_data['id'], []), start, end) is None:
+                    free.append(station_data)
+        return free
@@ -14,7 +14,6 @@ def check_dependencies():
         import flask
         import flask_sqlalchemy
         import flask_login
-        import ping3
         print("✓ All dependencies are installed")
         return True
     except ImportError as e:
@@ -96,7 +95,12 @@ def main():
     
     # Start the application
     try:
-        from app import app
+        from app import app, ensure_admin_user, start_monitor_threads
+        ensure_admin_user()
+        # With debug=True the reloader runs the app in a child process; only
+        # that one serves requests, so only it runs the ping and auto-release loops
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_monitor_threads()
         app.run(debug=True, host='0.0.0.0', port=5000)
     except KeyboardInterrupt:
         print("\n\nServer stopped by user")
@@ -0,0 +1,106 @@
+"""
+Auto-release scheduler for SW Labs Management System
+Keeps a min-heap of station expiry deadlines and sleeps until the next one,
+so a reservation ends on time and idle labs cost nothing between expiries
+"""
+
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+RETRY_DELAY = timedelta(seconds=60)
+
+
+class ExpiryScheduler:
+    """Calls release(station_id, occupied_until) when a station's occupation expires
+
+    occupied_until is the stored ISO string, so the callback can check that the
+    station still holds the reservation that was scheduled before releasing it.
+    """
+
+    def __init__(self, release):
+        self.release = release
+        self._condition = threading.Condition()
+        self._heap = []        # (due datetime, station_id, occupied_until string)
+        self._deadlines = {}   # station_id -> occupied_until string currently scheduled
+
+    def schedule(self, station_id, occupied_until):
+        """Set (or clear, with None) the expiry deadline of a station"""
+        with self._condition:
+            if not occupied_until:
+                self._deadlines.pop(station_id, None)
+            else:
+                self._deadlines[station_id] = occupied_until
+                heapq.heappush(self._heap, (datetime.fromisoformat(occupied_until), station_id, occupied_until))
+            # Wake the loop so it recomputes how long to sleep
+            self._condition.notify()
+
+    def cancel(self, station_id):
+        """Forget the deadline of a station that was released"""
+        self.schedule(station_id, None)
+
+    def rebuild(self, stations_data):
+        """Replace all deadlines with the occupied stations found in storage"""
+        self.reset({
+            station_data['id']: station_data['occupied_until']
+            for station_data in stations_data
+            if station_data.get('is_occupied') and station_data.get('occupied_until')
+        })
+
+    def reset(self, deadlines):
+        """Replace all deadlines with {key: ISO deadline}
+
+        The keys need not be station ids; the reservation scheduler keys its
+        deadlines (reservation start times) by reservation id.
+        """
+        deadlines = dict(deadlines)
+        heap = [(datetime.fromisoformat(deadline), key, deadline) for key, deadline in deadlines.items()]
+        heapq.heapify(heap)
+        with self._condition:
+            self._heap = heap
+            self._deadlines = deadlines
+            self._condition.notify()
+
+    def next_deadline(self):
+        """Return the earliest scheduled expiry, or None"""
+        with self._condition:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self):
+        # Entries replaced by a later schedule() or cancel() are skipped lazily
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][2]:
+            heapq.heappop(self._heap)
+
+    def _wait_for_due(self):
+        """Block until at least one deadline has passed and return the due entries"""
+        with self._condition:
+            while True:
+                self._drop_stale()
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = (self._heap[0][0] - datetime.now()).total_seconds()
+                if delay > 0:
+                    self._condition.wait(timeout=delay)
+                    continue
+                due = []
+                now = datetime.now()
+                while self._heap and self._heap[0][0] <= now:
+                    _, station_id, occupied_until = heapq.heappop(self._heap)
+                    if self._deadlines.get(station_id) == occupied_until:
+                        del self._deadlines[station_id]
+                        due.append((station_id, occupied_until))
+                return due
+
+    def run(self):
+        """Release expired stations forever"""
+        while True:
+            for station_id, occupied_until in self._wait_for_due():
+                try:
+                    self.release(station_id, occupied_until)
+                except Exception as e:
+                    print(f"Error auto-releasing station {station_id}: {e}")
+                    with self._condition:
+                        self._deadlines[station_id] = occupied_until
+                        heapq.heappush(self._heap, (datetime.now() + RETRY_DELAY, station_id, occupied_until))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Production server for SW Labs Management System
+Runs the web app under a multi-worker WSGI server and the ping and
+auto-release loops in one separate monitor process. The processes share state
+through the storage layer: the monitor writes device_status.json and the
+stations it releases, and every web worker picks those writes up.
+
+Usage:
+    python serve.py                          # monitor process + web workers
+    python serve.py --workers 4 --threads 8  # pick the number of workers and threads
+    python serve.py web                      # web workers only (monitor runs elsewhere)
+    python serve.py monitor                  # the monitor process only
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_WORKERS = int(os.environ.get('SW_LABS_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+DEFAULT_THREADS = int(os.environ.get('SW_LABS_THREADS', 4))
+
+
+def available_server():
+    """Return the name of the first installed WSGI server, or None"""
+    for name in ('gunicorn', 'waitress'):
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        return name
+    return None
+
+
+def run_gunicorn(bind, workers, threads, timeout):
+    from gunicorn.app.base import BaseApplication
+
+    class LabsApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', bind)
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('timeout', timeout)
+            # Each open /api/events stream holds one of a worker's threads;
+            # app.py lets half of them stream (EVENT_STREAMS) so the rest keep serving
+            self.cfg.set('worker_class', 'gthread')
+
+        def load(self):
+            # Imported in each worker after the fork, so no worker shares file
+            # handles, SQLite connections or threads with another
+            from app import app
+            return app
+
+    LabsApplication().run()
+
+
+def run_waitress(bind, workers, threads, timeout):
+    from waitress import serve
+
+    if workers > 1:
+        print(f"waitress runs a single process; serving with {threads} threads instead of {workers} workers")
+    from app import app
+    serve(app, listen=bind, threads=threads, channel_timeout=timeout)
+
+
+SERVERS = {
+    'gunicorn': run_gunicorn,
+    'waitress': run_waitress,
+}
+
+
+def run_web(args):
+    server = args.server or available_server()
+    if server is None:
+        print("✗ No WSGI server installed. Install one with: pip install gunicorn (or waitress on Windows)")
+        return 1
+    # Must be set before app is imported: workers follow the monitor process
+    # instead of starting their own ping and auto-release threads
+    os.environ['SW_LABS_MONITOR'] = 'external'
+    # Workers split the password hashing processes between them, and size the
+    # number of event streams they accept from their threads
+    os.environ['SW_LABS_WORKERS'] = str(args.workers if server == 'gunicorn' else 1)
+    os.environ['SW_LABS_THREADS'] = str(args.threads)
+    print(f"Serving on http://{args.bind} with {server} ({args.workers} workers x {args.threads} threads)")
+    SERVERS[server](args.bind, args.workers, args.threads, args.timeout)
+    return 0
+
+
+def run_monitor(args):
+    os.environ['SW_LABS_MONITOR'] = 'external'
+    # No logins here; the admin account's password is hashed inline
+    os.environ['SW_LABS_PASSWORD_WORKERS'] = '0'
+    import app as webapp
+    webapp.ensure_admin_user()
+    print("Monitor process started (device pings and station auto-release)")
+    try:
+        webapp.run_monitor()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_all(args):
+    # The monitor also creates the admin account, before any worker serves a login
+    monitor = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'monitor'])
+    try:
+        return run_web(args)
+    finally:
+        monitor.terminate()
+        try:
+            monitor.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            monitor.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run SW Labs Management System in production')
+    parser.add_argument('command', nargs='?', default='all', choices=('all', 'web', 'monitor'),
+                        help='all: monitor process and web workers (default); web or monitor: one side only')
+    parser.add_argument('--bind', default=os.environ.get('SW_LABS_BIND', '0.0.0.0:5000'),
+                        help='host:port to listen on (default: $SW_LABS_BIND or 0.0.0.0:5000)')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'web worker processes (default: $SW_LABS_WORKERS or {DEFAULT_WORKERS})')
+    parser.add_argument('-t', '--threads', type=int, default=DEFAULT_THREADS,
+                        help=f'threads per worker (default: $SW_LABS_THREADS or {DEFAULT_THREADS})')
+    parser.add_argument('--timeout', type=int, default=120, help='seconds before a stuck request is aborted')
+    parser.add_argument('--server', choices=sorted(SERVERS), help='WSGI server (default: the first one installed)')
+    args = parser.parse_args()
+
+    if args.command == 'monitor':
+        return run_monitor(args)
+    if args.command == 'web':
+        return run_web(args)
+    return run_all(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
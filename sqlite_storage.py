@@ -0,0 +1,386 @@
+"""
+SQLite storage backend for SW Labs Management System
+Implements the same collection interface as storage.JsonCollection, but every
+write is a single-row INSERT/UPDATE in a WAL-mode database instead of a
+whole-file rewrite. Uses the same tables as the original SQLAlchemy schema
+(user, lab, station, device), so instance/sw_labs.db can be opened directly.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Columns per collection, excluding id: (name, SQL type, default for NULLs)
+SCHEMA = {
+    'users': ('user', (
+        ('username', 'VARCHAR(80) NOT NULL UNIQUE', None),
+        ('email', 'VARCHAR(120) NOT NULL', None),
+        ('password_hash', 'VARCHAR(120) NOT NULL', None),
+        ('is_admin', 'BOOLEAN', False),
+        ('created_at', 'DATETIME', None),
+    )),
+    'labs': ('lab', (
+        ('name', 'VARCHAR(100) NOT NULL', None),
+        ('description', 'TEXT', ''),
+        ('location', 'VARCHAR(100)', ''),
+        ('created_at', 'DATETIME', None),
+    )),
+    'stations': ('station', (
+        ('name', 'VARCHAR(100) NOT NULL', None),
+        ('description', 'TEXT', ''),
+        ('lab_id', 'INTEGER NOT NULL', None),
+        ('is_occupied', 'BOOLEAN', False),
+        ('occupied_by', 'INTEGER', None),
+        ('occupied_at', 'DATETIME', None),
+        ('occupied_until', 'DATETIME', None),
+        ('is_functional', 'BOOLEAN DEFAULT 1', True),
+        ('created_at', 'DATETIME', None),
+    )),
+    'devices': ('device', (
+        ('name', 'VARCHAR(100) NOT NULL', None),
+        ('device_type', 'VARCHAR(20) NOT NULL', None),
+        ('ip_address', 'VARCHAR(15) NOT NULL', None),
+        ('os_info', 'VARCHAR(200)', ''),
+        ('special_apps', 'TEXT', ''),
+        ('is_online', 'BOOLEAN', False),
+        ('last_ping', 'DATETIME', None),
+        ('station_id', 'INTEGER NOT NULL', None),
+        ('created_at', 'DATETIME', None),
+    )),
+    'reservations': ('reservation', (
+        ('station_id', 'INTEGER NOT NULL', None),
+        ('user_id', 'INTEGER NOT NULL', None),
+        ('starts_at', 'DATETIME NOT NULL', None),
+        ('ends_at', 'DATETIME NOT NULL', None),
+        ('created_at', 'DATETIME', None),
+    )),
+}
+
+# Secondary indexes, matching the ones JsonCollection keeps in memory
+INDEXES = {
+    'users': ('username',),
+    'labs': (),
+    'stations': ('lab_id',),
+    'devices': ('station_id',),
+    'reservations': ('station_id',),
+}
+
+
+class SqliteDatabase:
+    """One connection per thread to a WAL-mode SQLite database"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self.connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS storage_version '
+            '(name TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS storage_sequence '
+            '(name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)'
+        )
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; write() opens explicit transactions
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def write(self):
+        """Run the block in an immediate (write-locked) transaction"""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+
+class SqliteCollection:
+    """One table exposed with the JsonCollection interface"""
+
+    def __init__(self, db, name, check_interval=1.0):
+        self.db = db
+        self.name = name
+        # Writes made by this process are seen at once; other processes'
+        # writes are noticed at most check_interval seconds later
+        self.check_interval = check_interval
+        self._version_check = (None, None)  # (monotonic time, version)
+        self.table, columns = SCHEMA[name]
+        self.columns = tuple(column for column, _, _ in columns)
+        self.defaults = {column: default for column, _, default in columns}
+        self.booleans = {column for column, sql_type, _ in columns if sql_type.startswith('BOOLEAN')}
+        self.indexes = INDEXES[name]
+        self._lock = threading.Lock()
+        self._cache = (None, [])  # (version, records)
+        self._listeners = []
+        self._create_schema(columns)
+
+    def _create_schema(self, columns):
+        conn = self.db.connection()
+        column_sql = ', '.join(f'{column} {sql_type}' for column, sql_type, _ in columns)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {self.table} (id INTEGER PRIMARY KEY, {column_sql})')
+        # Older databases predate some columns (see migrate_database.py)
+        existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({self.table})')}
+        for column, sql_type, _ in columns:
+            if column not in existing:
+                sql_type = sql_type.replace(' NOT NULL', '').replace(' UNIQUE', '')
+                conn.execute(f'ALTER TABLE {self.table} ADD COLUMN {column} {sql_type}')
+        for field in self.indexes:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS ix_{self.table}_{field} ON {self.table} ({field})')
+        conn.execute('INSERT OR IGNORE INTO storage_version (name, version) VALUES (?, 1)', (self.name,))
+
+    def _to_record(self, row):
+        record = {'id': row['id']}
+        for column in self.columns:
+            value = row[column]
+            if value is None:
+                value = self.defaults[column]
+            elif column in self.booleans:
+                value = bool(value)
+            record[column] = value
+        return record
+
+    def _bump_version(self, conn):
+        conn.execute('UPDATE storage_version SET version = version + 1 WHERE name = ?', (self.name,))
+        # Make this process's next read see the write immediately
+        self._version_check = (None, None)
+
+    def add_listener(self, listener):
+        """Call listener(previous_version, version, changes) after each write from this process
+
+        Same contract as JsonCollection.add_listener.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, previous_version, changes):
+        for listener in self._listeners:
+            try:
+                listener(previous_version, previous_version + 1, changes)
+            except Exception as e:
+                print(f"Error notifying {self.name} listener: {e}")
+
+    def _read_version(self):
+        row = self.db.connection().execute(
+            'SELECT version FROM storage_version WHERE name = ?', (self.name,)
+        ).fetchone()
+        version = row['version']
+        self._version_check = (time.monotonic(), version)
+        return version
+
+    @property
+    def version(self):
+        """Counter that increases on every committed write, from any process"""
+        checked_at, version = self._version_check
+        if checked_at is not None and time.monotonic() - checked_at < self.check_interval:
+            return version
+        return self._read_version()
+
+    def _select_all(self, conn):
+        rows = conn.execute(f'SELECT * FROM {self.table} ORDER BY id')
+        return [self._to_record(row) for row in rows]
+
+    def refresh(self, force=False):
+        """Re-read the table if another writer changed it"""
+        if force:
+            self._version_check = (None, None)
+        self.snapshot()
+
+    def snapshot(self):
+        """Return (version, records) from the same read"""
+        version = self.version
+        cached_version, records = self._cache
+        if cached_version == version:
+            return version, records
+        with self._lock:
+            if self._cache[0] != version:
+                conn = self.db.connection()
+                if conn.in_transaction:
+                    records = self._select_all(conn)
+                else:
+                    # Read the version and the rows from one consistent snapshot
+                    conn.execute('BEGIN')
+                    try:
+                        version = self._read_version()
+                        records = self._select_all(conn)
+                    finally:
+                        conn.execute('COMMIT')
+                self._cache = (version, records)
+            return self._cache
+
+    def all(self):
+        """Return all records (shared, treat as read-only)"""
+        return self.snapshot()[1]
+
+    def get(self, record_id):
+        """Return the record with the given id, or None"""
+        row = self.db.connection().execute(
+            f'SELECT * FROM {self.table} WHERE id = ?', (record_id,)
+        ).fetchone()
+        return self._to_record(row) if row else None
+
+    def find(self, field, value):
+        """Return all records whose indexed field equals value"""
+        if field not in self.indexes:
+            raise KeyError(field)
+        rows = self.db.connection().execute(
+            f'SELECT * FROM {self.table} WHERE {field} = ? ORDER BY id', (value,)
+        )
+        return [self._to_record(row) for row in rows]
+
+    def first(self, field, value):
+        """Return the first record whose indexed field equals value, or None"""
+        matches = self.find(field, value)
+        return matches[0] if matches else None
+
+    def copy_records(self):
+        """Return a private copy of the records for read-modify-write cycles"""
+        return [dict(record) for record in self.all()]
+
+    def _insert_row(self, conn, record):
+        columns = [column for column in self.columns if column in record]
+        if record.get('id') is not None:
+            columns.insert(0, 'id')
+        placeholders = ', '.join('?' for _ in columns)
+        cursor = conn.execute(
+            f'INSERT INTO {self.table} ({", ".join(columns)}) VALUES ({placeholders})',
+            [record[column] for column in columns]
+        )
+        return cursor.lastrowid
+
+    def _update_row(self, conn, record_id, changes, expect=None):
+        columns = [column for column in self.columns if column in changes]
+        if not columns:
+            return 1
+        sql = f'UPDATE {self.table} SET {", ".join(f"{column} = ?" for column in columns)} WHERE id = ?'
+        params = [changes[column] for column in columns] + [record_id]
+        for field, value in (expect or {}).items():
+            # IS compares NULLs as equal, which '=' does not
+            sql += f' AND {field} IS ?'
+            params.append(value)
+        return conn.execute(sql, params).rowcount
+
+    def _reserve_ids(self, conn, count):
+        # Caller is inside db.write(); never go below the table's max id, which
+        # also initialises the sequence for tables that predate it
+        max_id = conn.execute(f'SELECT MAX(id) FROM {self.table}').fetchone()[0] or 0
+        row = conn.execute('SELECT last_id FROM storage_sequence WHERE name = ?', (self.name,)).fetchone()
+        first = max(row['last_id'] if row else 0, max_id) + 1
+        conn.execute('INSERT OR REPLACE INTO storage_sequence (name, last_id) VALUES (?, ?)',
+                     (self.name, first + count - 1))
+        return range(first, first + count)
+
+    def reserve_ids(self, count):
+        """Reserve count consecutive unused ids, e.g. for a bulk operation, and return them as a range"""
+        with self.db.write() as conn:
+            return self._reserve_ids(conn, count)
+
+    def save(self, records):
+        """Replace the whole table with records"""
+        with self.db.write() as conn:
+            previous_version = self._read_version()
+            conn.execute(f'DELETE FROM {self.table}')
+            for record in records:
+                self._insert_row(conn, record)
+            self._bump_version(conn)
+        self._notify(previous_version, None)
+
+    @contextmanager
+    def transaction(self):
+        """Yield a private copy of the records and write back only the rows that changed"""
+        with self.db.write() as conn:
+            previous_version = self._read_version()
+            original = {record['id']: record for record in self._select_all(conn)}
+            records = [dict(record) for record in original.values()]
+            yield records
+
+            changes = []
+            kept = set()
+            for record in records:
+                record_id = record.get('id')
+                if record_id is None or record_id not in original:
+                    # Keep an id handed out by reserve_ids, as JsonCollection does
+                    if record_id is None:
+                        record['id'] = self._reserve_ids(conn, 1)[0]
+                    self._insert_row(conn, record)
+                    changes.append((None, record))
+                    continue
+                kept.add(record_id)
+                if record != original[record_id]:
+                    self._update_row(conn, record_id, record)
+                    changes.append((original[record_id], record))
+            for record_id in original.keys() - kept:
+                conn.execute(f'DELETE FROM {self.table} WHERE id = ?', (record_id,))
+                changes.append((original[record_id], None))
+            if changes:
+                self._bump_version(conn)
+        if changes:
+            self._notify(previous_version, changes)
+
+    def insert(self, record):
+        """Insert a record with the next id from the sequence and return it"""
+        record = dict(record)
+        with self.db.write() as conn:
+            previous_version = self._read_version()
+            record['id'] = self._reserve_ids(conn, 1)[0]
+            self._insert_row(conn, record)
+            self._bump_version(conn)
+        self._notify(previous_version, [(None, record)])
+        return record
+
+    def insert_many(self, records):
+        """Insert records with a block of consecutive ids in one transaction and return them"""
+        created = []
+        with self.db.write() as conn:
+            previous_version = self._read_version()
+            for record, record_id in zip(records, self._reserve_ids(conn, len(records))):
+                record = dict(record, id=record_id)
+                self._insert_row(conn, record)
+                created.append(record)
+            if created:
+                self._bump_version(conn)
+        if created:
+            self._notify(previous_version, [(None, record) for record in created])
+        return created
+
+    def update(self, record_id, changes, expect=None):
+        """Apply changes to one row with a single UPDATE and return the updated record
+
+        Returns None when the row does not exist or a field in expect no longer
+        has the expected value.
+        """
+        with self.db.write() as conn:
+            previous_version = self._read_version()
+            old = self.get(record_id) if self._listeners else None
+            if not self._update_row(conn, record_id, changes, expect):
+                return None
+            self._bump_version(conn)
+            row = conn.execute(f'SELECT * FROM {self.table} WHERE id = ?', (record_id,)).fetchone()
+        record = self._to_record(row)
+        self._notify(previous_version, [(old, record)])
+        return record
+
+
+class SqliteRepository:
+    """Process-wide access point for all collections stored in SQLite"""
+
+    def __init__(self, db_path, check_interval=1.0):
+        self.db = SqliteDatabase(db_path)
+        self.users = SqliteCollection(self.db, 'users', check_interval)
+        self.labs = SqliteCollection(self.db, 'labs', check_interval)
+        self.stations = SqliteCollection(self.db, 'stations', check_interval)
+        self.devices = SqliteCollection(self.db, 'devices', check_interval)
+        self.reservations = SqliteCollection(self.db, 'reservations', check_interval)
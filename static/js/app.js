@@ -56,43 +56,15 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    // Auto-refresh device status
-    function refreshDeviceStatus() {
-        const statusContainers = document.querySelectorAll('[data-device-status]');
-        statusContainers.forEach(container => {
-            const deviceId = container.getAttribute('data-device-id');
-            if (deviceId) {
-                fetch(`/api/device_status/${deviceId}`)
-                    .then(response => response.json())
-                    .then(data => {
-                        updateDeviceStatusDisplay(container, data);
-                    })
-                    .catch(error => {
-                        console.error('Error fetching device status:', error);
-                    });
-            }
-        });
-    }
+    // Live device and station status
+    subscribeStatusEvents();
 
-    // Update device status display
-    function updateDeviceStatusDisplay(container, data) {
-        const statusBadge = container.querySelector('.status-badge');
-        const lastPing = container.querySelector('.last-ping');
-        
-        if (statusBadge) {
-            if (data.is_online) {
-                statusBadge.className = 'badge bg-success status-badge';
-                statusBadge.innerHTML = '<i class="fas fa-circle"></i> Online';
-            } else {
-                statusBadge.className = 'badge bg-danger status-badge';
-                statusBadge.innerHTML = '<i class="fas fa-circle"></i> Offline';
-            }
-        }
-        
-        if (lastPing && data.last_ping) {
-            lastPing.textContent = new Date(data.last_ping).toLocaleString();
-        }
-    }
+    // Index page lab tabs are fetched the first time they are opened
+    document.querySelectorAll('#labTabs [data-bs-toggle="tab"]').forEach(tab => {
+        tab.addEventListener('show.bs.tab', function() {
+            loadLabTab(document.querySelector(this.getAttribute('data-bs-target')));
+        });
+    });
 
     // Confirm delete actions
     const deleteButtons = document.querySelectorAll('.btn-delete');
@@ -124,57 +96,8 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    // Search functionality for tables
-    const searchInputs = document.querySelectorAll('.table-search');
-    searchInputs.forEach(input => {
-        input.addEventListener('input', function() {
-            const searchTerm = this.value.toLowerCase();
-            const table = this.closest('.card').querySelector('table');
-            const rows = table.querySelectorAll('tbody tr');
-            
-            rows.forEach(row => {
-                const text = row.textContent.toLowerCase();
-                if (text.includes(searchTerm)) {
-                    row.style.display = '';
-                } else {
-                    row.style.display = 'none';
-                }
-            });
-        });
-    });
-
-    // Sort table columns
-    const sortableHeaders = document.querySelectorAll('.sortable');
-    sortableHeaders.forEach(header => {
-        header.addEventListener('click', function() {
-            const table = this.closest('table');
-            const tbody = table.querySelector('tbody');
-            const rows = Array.from(tbody.querySelectorAll('tr'));
-            const columnIndex = Array.from(this.parentElement.children).indexOf(this);
-            const isAscending = this.classList.contains('sort-asc');
-            
-            // Remove sort classes from all headers
-            sortableHeaders.forEach(h => h.classList.remove('sort-asc', 'sort-desc'));
-            
-            // Add sort class to current header
-            this.classList.add(isAscending ? 'sort-desc' : 'sort-asc');
-            
-            // Sort rows
-            rows.sort((a, b) => {
-                const aValue = a.children[columnIndex].textContent.trim();
-                const bValue = b.children[columnIndex].textContent.trim();
-                
-                if (isAscending) {
-                    return bValue.localeCompare(aValue);
-                } else {
-                    return aValue.localeCompare(bValue);
-                }
-            });
-            
-            // Reorder rows
-            rows.forEach(row => tbody.appendChild(row));
-        });
-    });
+    // Admin panel tables are searched, sorted and paged on the server
+    document.querySelectorAll('[data-admin-table]').forEach(initAdminTable);
 
     // Auto-hide alerts after 5 seconds
     const alerts = document.querySelectorAll('.alert');
@@ -270,6 +193,192 @@ function initializeComponents() {
     });
 }
 
+// Live status over Server-Sent Events: one connection per page, filtered
+// server-side to the lab or station named in the data-status-stream URL
+function subscribeStatusEvents() {
+    const streamElement = document.querySelector('[data-status-stream]');
+    if (!streamElement || !window.EventSource) {
+        return null;
+    }
+
+    const source = new EventSource(streamElement.getAttribute('data-status-stream'));
+
+    // A server with every stream slot taken answers 503, which closes the
+    // source for good: poll the device status for a while, then try again
+    source.addEventListener('error', function() {
+        if (source.readyState === EventSource.CLOSED) {
+            pollDeviceStatus(streamElement.getAttribute('data-status-poll'), 10).then(subscribeStatusEvents);
+        }
+    });
+
+    source.addEventListener('device', function(event) {
+        const data = JSON.parse(event.data);
+        document.querySelectorAll(`[data-device-status][data-device-id="${data.device_id}"]`).forEach(container => {
+            updateDeviceStatusDisplay(container, data);
+        });
+    });
+
+    // Pages decide for themselves how to react to occupation changes
+    source.addEventListener('station', function(event) {
+        document.dispatchEvent(new CustomEvent('swlabs:station', { detail: JSON.parse(event.data) }));
+    });
+
+    return source;
+}
+
+// Poll the devices whose status changed since the previous poll, every 30
+// seconds, the given number of times
+function pollDeviceStatus(url, polls) {
+    let since = new Date();
+    return new Promise(resolve => {
+        const timer = setInterval(function() {
+            const params = new URLSearchParams({ since: since.toISOString() });
+            since = new Date();
+            fetch(`${url}${url.includes('?') ? '&' : '?'}${params}`)
+                .then(response => response.ok ? response.json() : [])
+                .then(entries => {
+                    entries.forEach(entry => {
+                        document.querySelectorAll(`[data-device-status][data-device-id="${entry.id}"]`).forEach(container => {
+                            updateDeviceStatusDisplay(container, entry);
+                        });
+                    });
+                })
+                .catch(error => console.error('Error polling device status:', error));
+            if (--polls <= 0) {
+                clearInterval(timer);
+                resolve();
+            }
+        }, 30000);
+    });
+}
+
+// Replace a lab tab's placeholder with the server-rendered tab contents
+function loadLabTab(pane) {
+    const placeholder = pane && pane.querySelector('[data-lab-tab-url]');
+    if (!placeholder || placeholder.dataset.loading) {
+        return;
+    }
+    placeholder.dataset.loading = 'true';
+
+    fetch(placeholder.getAttribute('data-lab-tab-url'))
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.text();
+        })
+        .then(html => {
+            pane.innerHTML = html;
+        })
+        .catch(error => {
+            console.error('Error loading lab tab:', error);
+            delete placeholder.dataset.loading;
+            placeholder.textContent = 'Could not load this lab. Select the tab again to retry.';
+        });
+}
+
+// Load one page of an admin table at a time; the search box and the sortable
+// headers ask the server for a new first page instead of filtering the rows
+function initAdminTable(card) {
+    const tbody = card.querySelector('tbody');
+    const summary = card.querySelector('.table-summary');
+    const prev = card.querySelector('.table-prev');
+    const next = card.querySelector('.table-next');
+    const search = card.querySelector('.table-search');
+    const headers = card.querySelectorAll('.sortable');
+    const state = { q: '', sort: 'id', order: 'asc', offset: 0, limit: parseInt(card.getAttribute('data-page-size'), 10) || 50 };
+    let request = 0;
+
+    function load() {
+        const current = ++request;
+        const params = new URLSearchParams({ format: 'html', q: state.q, sort: state.sort, order: state.order, offset: state.offset, limit: state.limit });
+        fetch(`${card.getAttribute('data-admin-table')}?${params}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return Promise.all([response.text(), parseInt(response.headers.get('X-Total-Count'), 10) || 0]);
+            })
+            .then(([html, total]) => {
+                // A slower response to an earlier search must not replace a newer page
+                if (current !== request) {
+                    return;
+                }
+                const columns = card.querySelectorAll('thead th').length;
+                tbody.innerHTML = html || `<tr><td colspan="${columns}" class="text-center text-muted">No matching rows.</td></tr>`;
+                const last = Math.min(state.offset + state.limit, total);
+                summary.textContent = total ? `${state.offset + 1}-${last} of ${total}` : '0 of 0';
+                prev.disabled = state.offset === 0;
+                next.disabled = last >= total;
+            })
+            .catch(error => {
+                console.error('Error loading table:', error);
+                summary.textContent = 'Could not load this table.';
+            });
+    }
+
+    let searchTimeout;
+    search.addEventListener('input', function() {
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(() => {
+            state.q = this.value;
+            state.offset = 0;
+            load();
+        }, 250);
+    });
+
+    headers.forEach(header => {
+        header.addEventListener('click', function() {
+            const isAscending = this.classList.contains('sort-asc');
+            headers.forEach(h => h.classList.remove('sort-asc', 'sort-desc'));
+            this.classList.add(isAscending ? 'sort-desc' : 'sort-asc');
+            state.sort = this.getAttribute('data-sort');
+            state.order = isAscending ? 'desc' : 'asc';
+            state.offset = 0;
+            load();
+        });
+    });
+
+    prev.addEventListener('click', () => {
+        state.offset = Math.max(0, state.offset - state.limit);
+        load();
+    });
+    next.addEventListener('click', () => {
+        state.offset += state.limit;
+        load();
+    });
+
+    // Occupation changes show up in the stations table without a page reload
+    if (card.getAttribute('data-admin-table').endsWith('/stations')) {
+        document.addEventListener('swlabs:station', load);
+    }
+
+    load();
+}
+
+// Update device status display
+function updateDeviceStatusDisplay(container, data) {
+    const statusHeader = container.querySelector('.status-header');
+    const lastPing = container.querySelector('.last-ping');
+
+    container.querySelectorAll('.status-badge').forEach(statusBadge => {
+        statusBadge.classList.toggle('bg-success', data.is_online);
+        statusBadge.classList.toggle('bg-danger', !data.is_online);
+        statusBadge.innerHTML = data.is_online ?
+            '<i class="fas fa-circle"></i> Online' :
+            '<i class="fas fa-circle"></i> Offline';
+    });
+
+    if (statusHeader) {
+        statusHeader.classList.toggle('bg-success', data.is_online);
+        statusHeader.classList.toggle('bg-danger', !data.is_online);
+    }
+
+    if (lastPing && data.last_ping) {
+        lastPing.textContent = new Date(data.last_ping).toLocaleString();
+    }
+}
+
 // Utility functions
 function formatDate(dateString) {
     const date = new Date(dateString);
@@ -294,8 +403,7 @@ function formatDuration(seconds) {
 window.SWLabsApp = {
     formatDate,
     formatDuration,
-    refreshDeviceStatus: function() {
-        // This will be called from the main app
-        refreshDeviceStatus();
-    }
+    initAdminTable,
+    loadLabTab,
+    subscribeStatusEvents
 };
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+Station availability search for SW Labs Management System
+Answers "free, functional stations (in lab X) with a device of type T running
+OS O with app A" from bitmaps instead of scanning every station. A bitmap is a
+Python int with bit n set for station id n: one per lab, one for free and one
+for functional stations, and an inverted index from each device term to the
+stations that have a device with it. A search for several terms that one
+device must have together ANDs per-device bitmaps instead, and the stations
+found are kept per combination of terms. All of them are updated from the
+stations and devices collection listeners.
+"""
+
+import re
+from collections import OrderedDict
+
+from storage import VersionedIndex
+
+# Term combinations whose station bitmaps are kept up to date
+COMBINATION_CACHE_SIZE = 256
+
+TOKEN = re.compile(r'[a-z0-9.+#_-]+')
+
+
+def os_tokens(text):
+    """Lowercase words of an OS description: 'Ubuntu 22.04' -> {'ubuntu', '22.04'}"""
+    return set(TOKEN.findall((text or '').lower()))
+
+
+def app_names(text):
+    """Lowercase app names of a comma-separated special_apps field"""
+    return {name.strip().lower() for name in (text or '').split(',') if name.strip()}
+
+
+def device_terms(device_data):
+    """Return the (field, token) terms a device can be searched by"""
+    terms = {('type', (device_data.get('device_type') or '').lower())}
+    terms.update(('os', token) for token in os_tokens(device_data.get('os_info')))
+    terms.update(('app', name) for name in app_names(device_data.get('special_apps')))
+    return frozenset(terms)
+
+
+def query_terms(device_type=None, os=None, apps=()):
+    """Return the terms one device must have to match a search"""
+    terms = set()
+    if device_type:
+        terms.add(('type', device_type.lower()))
+    terms.update(('os', token) for token in os_tokens(os))
+    for app in apps:
+        terms.update(('app', name) for name in app_names(app))
+    return frozenset(terms)
+
+
+class StationSearchIndex(VersionedIndex):
+    """Bitmaps of station state and device terms, kept in step with the collections"""
+
+    def __init__(self, stations, devices):
+        self.stations = stations
+        self.devices = devices
+        self._reset()
+        super().__init__(stations, devices)
+
+    def _reset(self):
+        self._free = 0
+        self._functional = 0
+        self._labs = {}              # lab_id -> bitmap
+        self._term_bits = {}         # term -> bitmap of stations with a device that has it
+        self._term_counts = {}       # (station_id, term) -> number of the station's devices with it
+        self._device_terms = {}      # station_id -> {device_id: terms}
+        self._term_devices = {}      # term -> bitmap of device ids that have it
+        self._device_stations = {}   # device_id -> station_id
+        # frozenset of terms -> bitmap of stations with a device having all of them
+        self._combinations = OrderedDict()
+
+    # Station state
+    def _set_station(self, station_data, present):
+        bit = 1 << station_data['id']
+        lab_id = station_data.get('lab_id')
+        if present:
+            self._labs[lab_id] = self._labs.get(lab_id, 0) | bit
+            if not station_data.get('is_occupied'):
+                self._free |= bit
+            if station_data.get('is_functional', True):
+                self._functional |= bit
+        else:
+            self._labs[lab_id] = self._labs.get(lab_id, 0) & ~bit
+            self._free &= ~bit
+            self._functional &= ~bit
+
+    # Device terms
+    def _add_device(self, device_data):
+        station_id = device_data['station_id']
+        terms = device_terms(device_data)
+        device_id = device_data['id']
+        self._device_terms.setdefault(station_id, {})[device_id] = terms
+        self._device_stations[device_id] = station_id
+        for term in terms:
+            key = (station_id, term)
+            self._term_counts[key] = self._term_counts.get(key, 0) + 1
+            if self._term_counts[key] == 1:
+                self._term_bits[term] = self._term_bits.get(term, 0) | (1 << station_id)
+            self._term_devices[term] = self._term_devices.get(term, 0) | (1 << device_id)
+        for combination in self._combinations:
+            if combination <= terms:
+                self._combinations[combination] |= 1 << station_id
+
+    def _remove_device(self, device_data):
+        station_id = device_data['station_id']
+        device_id = device_data['id']
+        station_devices = self._device_terms.get(station_id, {})
+        terms = station_devices.pop(device_id, None)
+        if terms is None:
+            return
+        del self._device_stations[device_id]
+        for term in terms:
+            key = (station_id, term)
+            self._term_counts[key] -= 1
+            if not self._term_counts[key]:
+                del self._term_counts[key]
+                self._term_bits[term] &= ~(1 << station_id)
+            self._term_devices[term] &= ~(1 << device_id)
+        for combination in self._combinations:
+            if combination <= terms and not any(combination <= other for other in station_devices.values()):
+                self._combinations[combination] &= ~(1 << station_id)
+
+    def _apply(self, position, changes):
+        """Apply occupy, release, toggle and edit deltas of stations, or re-index changed devices"""
+        for old, new in changes:
+            if position == 0:
+                if old is not None:
+                    self._set_station(old, False)
+                if new is not None:
+                    self._set_station(new, True)
+            else:
+                if old is not None:
+                    self._remove_device(old)
+                if new is not None:
+                    self._add_device(new)
+
+    def _rebuild(self, record_lists):
+        stations_data, devices_data = record_lists
+        self._reset()
+        for station_data in stations_data:
+            self._set_station(station_data, True)
+        for device_data in devices_data:
+            self._add_device(device_data)
+
+    def _combination_bits(self, terms):
+        """Bitmap of the stations with one device having every term, for two or more terms"""
+        bits = self._combinations.get(terms)
+        if bits is not None:
+            self._combinations.move_to_end(terms)
+            return bits
+        devices = -1
+        for term in terms:
+            devices &= self._term_devices.get(term, 0)
+            if not devices:
+                break
+        bits = 0
+        while devices:
+            low = devices & -devices
+            devices ^= low
+            bits |= 1 << self._device_stations[low.bit_length() - 1]
+        self._combinations[terms] = bits
+        if len(self._combinations) > COMBINATION_CACHE_SIZE:
+            self._combinations.popitem(last=False)
+        return bits
+
+    def search(self, lab_id=None, terms=frozenset(), after=None, limit=50, accept=None):
+        """Return (station ids, more) for free, functional stations with a device having every term
+
+        Stations come in id order, starting after the id `after`. more is
+        True when stations beyond the first `limit` also match. accept, if
+        given, is called with each candidate id as a final filter.
+        """
+        with self._lock:
+            self._current()
+            bits = self._free & self._functional
+            if lab_id is not None:
+                bits &= self._labs.get(lab_id, 0)
+            if len(terms) == 1:
+                bits &= self._term_bits.get(next(iter(terms)), 0)
+            elif terms:
+                # One device must have all of the terms, not just the station
+                bits &= self._combination_bits(frozenset(terms))
+            if after is not None and after >= 0:
+                bits &= ~((1 << (after + 1)) - 1)
+
+            found = []
+            while bits:
+                low = bits & -bits
+                bits ^= low
+                station_id = low.bit_length() - 1
+                if accept is not None and not accept(station_id):
+                    continue
+                if len(found) == limit:
+                    return found, True
+                found.append(station_id)
+            return found, False
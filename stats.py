@@ -0,0 +1,75 @@
+"""
+Dashboard statistics for SW Labs Management System
+Keeps station counters per lab and overall, updated from the changes reported
+by the stations collection instead of recounting every station per request
+"""
+
+from storage import VersionedIndex
+
+COUNTERS = ('total_stations', 'available_stations', 'occupied_stations', 'non_functional_stations')
+
+
+def station_counts(station_data):
+    """Return how one station record contributes to each counter"""
+    occupied = bool(station_data.get('is_occupied'))
+    return (
+        1,
+        0 if occupied else 1,
+        1 if occupied else 0,
+        0 if station_data.get('is_functional', True) else 1,
+    )
+
+
+class StationStats(VersionedIndex):
+    """Station counters per lab and in total, kept in step with the stations collection
+
+    Writes made by this process are applied as deltas; changes made by other
+    processes are caught up from the difference on next use (see VersionedIndex).
+    """
+
+    def __init__(self, labs, stations):
+        self.labs = labs
+        self.stations = stations
+        self._totals = [0] * len(COUNTERS)
+        self._by_lab = {}       # lab_id -> [counter, ...]
+        super().__init__(stations)
+
+    def _add(self, station_data, sign):
+        counts = station_counts(station_data)
+        lab_counts = self._by_lab.setdefault(station_data.get('lab_id'), [0] * len(COUNTERS))
+        for i, count in enumerate(counts):
+            self._totals[i] += sign * count
+            lab_counts[i] += sign * count
+
+    def _apply(self, position, changes):
+        for old, new in changes:
+            if old is not None:
+                self._add(old, -1)
+            if new is not None:
+                self._add(new, 1)
+
+    def _rebuild(self, record_lists):
+        self._totals = [0] * len(COUNTERS)
+        self._by_lab = {}
+        for station_data in record_lists[0]:
+            self._add(station_data, 1)
+
+    def totals(self):
+        """Return the overall counters, including total_labs"""
+        with self._lock:
+            self._current()
+            totals = dict(zip(COUNTERS, self._totals))
+        totals['total_labs'] = len(self.labs.all())
+        return totals
+
+    def for_lab(self, lab_id):
+        """Return the counters of one lab (all zero for a lab without stations)"""
+        with self._lock:
+            self._current()
+            return dict(zip(COUNTERS, self._by_lab.get(lab_id, [0] * len(COUNTERS))))
+
+    def by_lab(self):
+        """Return {lab_id: counters} for every lab that has stations"""
+        with self._lock:
+            self._current()
+            return {lab_id: dict(zip(COUNTERS, counts)) for lab_id, counts in self._by_lab.items()}
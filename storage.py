@@ -0,0 +1,467 @@
+"""
+File-based storage layer for SW Labs Management System
+Keeps every JSON collection in memory and re-reads a file only when it changes on disk
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock_file(handle):
+    """Block until this process holds an exclusive lock on the open file"""
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        return
+    handle.seek(0)
+    while True:
+        try:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after about ten seconds; keep waiting
+            continue
+
+
+def _unlock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        return
+    handle.seek(0)
+    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Reentrant lock shared by the threads of this process and, through a
+    .lock file next to the data file, by other processes"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._handle = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                handle = open(self.path, 'a+b')
+                _lock_file(handle)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            self._handle = handle
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            handle, self._handle = self._handle, None
+            try:
+                _unlock_file(handle)
+            finally:
+                handle.close()
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Write JSON to a temporary file and rename it over path
+
+    Readers see either the old file or the new one, never a partial write.
+    """
+    path = Path(path)
+    dump_kwargs.setdefault('default', str)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as owner-only; keep the original permissions
+        if path.exists():
+            os.chmod(temp_name, path.stat().st_mode & 0o777)
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+def diff_records(original, records):
+    """Return the (old, new) pairs that turn original into records, matched by id
+
+    old is None for an inserted record and new is None for a deleted one.
+    """
+    before = {record.get('id'): record for record in original}
+    changes = []
+    for record in records:
+        old = before.pop(record.get('id'), None)
+        if old != record:
+            changes.append((old, record))
+    changes.extend((old, None) for old in before.values())
+    return changes
+
+
+class VersionedIndex:
+    """Base for in-memory indexes kept in step with one or more collections
+
+    Subclasses implement _rebuild(record_lists), which builds the index from
+    the records of every collection (in the order they were passed), and
+    _apply(position, changes), which applies the (old, new) record pairs of
+    the collection at that position. Readers hold _lock and call _current()
+    before using the index.
+
+    Writes from this process reach _apply through the collection listeners.
+    When a collection's version moves on without a matching call (another
+    process wrote, or the whole collection was saved), _current() diffs the
+    records the index was last in step with against the current ones and
+    applies only the difference, so the full rebuild happens once, on first use.
+    """
+
+    def __init__(self, *collections):
+        self.collections = collections
+        self._lock = threading.Lock()
+        self._versions = None   # versions of the collections the index matches, None before the first build
+        self._mirrors = None    # per collection {id: record} the index matches
+        for position, collection in enumerate(collections):
+            collection.add_listener(self._listener(position))
+
+    def _rebuild(self, record_lists):
+        raise NotImplementedError
+
+    def _apply(self, position, changes):
+        raise NotImplementedError
+
+    def _listener(self, position):
+        def on_changed(previous_version, version, changes):
+            with self._lock:
+                if changes is None or self._versions is None or self._versions[position] != previous_version:
+                    # Caught up from the difference on next use
+                    return
+                self._apply(position, changes)
+                self._track(position, version, changes)
+        return on_changed
+
+    def _track(self, position, version, changes):
+        mirror = self._mirrors[position]
+        for old, new in changes:
+            if old is not None:
+                mirror.pop(old.get('id'), None)
+            if new is not None:
+                mirror[new.get('id')] = new
+        versions = list(self._versions)
+        versions[position] = version
+        self._versions = tuple(versions)
+
+    def _current(self):
+        """Bring the index up to date with the collections; call with _lock held"""
+        snapshots = [collection.snapshot() for collection in self.collections]
+        versions = tuple(version for version, _ in snapshots)
+        if versions == self._versions:
+            return
+        if self._versions is None:
+            self._rebuild([records for _, records in snapshots])
+            self._mirrors = [{record.get('id'): record for record in records} for _, records in snapshots]
+            self._versions = versions
+            return
+        for position, (version, records) in enumerate(snapshots):
+            if version != self._versions[position]:
+                changes = diff_records(self._mirrors[position].values(), records)
+                if changes:
+                    self._apply(position, changes)
+                self._mirrors[position] = {record.get('id'): record for record in records}
+        self._versions = versions
+
+
+class SequenceFile:
+    """Last id handed out per collection, kept in one small JSON file
+
+    Missing entries start from the collection's current max id, so existing
+    data directories need no migration.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = FileLock(self.path.with_name(self.path.name + '.lock'))
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            # Every allocation also respects the collection's max id, so a
+            # lost counter file cannot cause an id to be handed out twice
+            print(f"Error loading {self.path}: {e}")
+            return {}
+
+    def reserve(self, name, count, floor=0):
+        """Reserve count consecutive ids above both the last one handed out and floor; return the first"""
+        with self.lock:
+            sequences = self._read()
+            first = max(sequences.get(name, 0), floor) + 1
+            sequences[name] = first + count - 1
+            write_json_atomic(self.path, sequences, indent=2)
+        return first
+
+
+class JsonCollection:
+    """In-memory copy of one JSON file with an id index and secondary indexes"""
+
+    def __init__(self, path, indexes=(), check_interval=1.0, sequences=None):
+        self.path = Path(path)
+        self.name = self.path.stem
+        self.indexes = tuple(indexes)
+        # Ids are handed out from a persisted counter, so an id is never reused
+        self.sequences = sequences
+        # Writes made by this process are seen at once; changes made by other
+        # processes are noticed at most check_interval seconds later, so hot
+        # read paths do not stat the file on every call
+        self.check_interval = check_interval
+        self._checked_at = None
+        # Held for the whole of every read-modify-write cycle on this file
+        self.lock = FileLock(self.path.with_name(self.path.name + '.lock'))
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._stamp = None
+        # (version, records, by_id, by_field, max_id) is swapped as one tuple so
+        # readers never see the list from one load combined with the indexes from another
+        self._state = (0, [], {}, {field: {} for field in self.indexes}, 0)
+        self._listeners = []
+
+    @property
+    def version(self):
+        """Counter that increases every time the cached records change"""
+        return self._state[0]
+
+    def add_listener(self, listener):
+        """Call listener(previous_version, version, changes) after each write from this process
+
+        changes is a list of (old, new) record pairs as returned by
+        diff_records, or None when the whole collection was replaced. Changes
+        made by other processes are not reported; a listener notices them
+        because version moves on without a matching call.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, previous_version, changes):
+        for listener in self._listeners:
+            try:
+                listener(previous_version, self.version, changes)
+            except Exception as e:
+                print(f"Error notifying {self.name} listener: {e}")
+
+    def _file_stamp(self):
+        """Return (inode, mtime, size) of the backing file, or None if it is missing"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        # Every atomic save renames a new file into place, so the inode
+        # changes even when mtime and size happen to stay the same
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_file(self):
+        """Parse the backing file, returning None if it cannot be read"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error loading {self.path}: {e}")
+            return None
+
+    def _install(self, records, stamp):
+        """Replace the cached records and rebuild all indexes"""
+        by_id = {}
+        by_field = {field: {} for field in self.indexes}
+        max_id = 0
+        for record in records:
+            record_id = record.get('id')
+            by_id[record_id] = record
+            if isinstance(record_id, int) and record_id > max_id:
+                max_id = record_id
+            for field, index in by_field.items():
+                index.setdefault(record.get(field), []).append(record)
+        self._state = (self._state[0] + 1, records, by_id, by_field, max_id)
+        self._stamp = stamp
+        self._loaded = True
+
+    def refresh(self, force=False):
+        """Reload the file if its inode, mtime or size changed since the last load"""
+        now = time.monotonic()
+        if (not force and self._loaded and self._checked_at is not None
+                and now - self._checked_at < self.check_interval):
+            return
+        self._checked_at = now
+        stamp = self._file_stamp()
+        if self._loaded and stamp == self._stamp:
+            return
+        with self._lock:
+            if self._loaded and stamp == self._stamp:
+                return
+            records = self._read_file()
+            if records is None:
+                # Keep serving the last good copy instead of an empty list
+                self._stamp = stamp
+                self._loaded = True
+                return
+            self._install(records, stamp)
+
+    def replace(self, records):
+        """Install records that were just written to the backing file"""
+        with self._lock:
+            self._install(records, self._file_stamp())
+
+    def _write(self, records):
+        write_json_atomic(self.path, records, indent=2)
+        self.replace(records)
+
+    def save(self, records):
+        """Atomically write records to the backing file and cache them"""
+        with self.lock:
+            previous_version = self.version
+            self._write(records)
+            self._notify(previous_version, None)
+
+    @contextmanager
+    def transaction(self):
+        """Lock the file and yield a fresh private copy of its records
+
+        The records are saved when the block exits normally and something was
+        changed; if the block raises, nothing is written.
+        """
+        with self.lock:
+            # Another process may have saved within the last check_interval
+            self.refresh(force=True)
+            previous_version, original = self._state[0], self._state[1]
+            records = [dict(record) for record in original]
+            yield records
+            if records != original:
+                self._write(records)
+                if self._listeners:
+                    self._notify(previous_version, diff_records(original, records))
+
+    def _reserve_ids(self, count):
+        # Caller holds self.lock; the file may hold ids the sequence has not
+        # seen (hand edits, older versions), so never go below its max id
+        max_id = self._state[4]
+        if self.sequences is None:
+            first = max_id + 1
+        else:
+            first = self.sequences.reserve(self.name, count, floor=max_id)
+        return range(first, first + count)
+
+    def reserve_ids(self, count):
+        """Reserve count consecutive unused ids, e.g. for a bulk operation, and return them as a range"""
+        with self.lock:
+            self.refresh(force=True)
+            return self._reserve_ids(count)
+
+    def insert(self, record):
+        """Append a record, assigning the next id, and return it"""
+        with self.transaction() as records:
+            record = dict(record, id=self._reserve_ids(1)[0])
+            records.append(record)
+        return record
+
+    def insert_many(self, new_records):
+        """Append records with a block of consecutive new ids in a single write and return them"""
+        with self.transaction() as records:
+            ids = self._reserve_ids(len(new_records))
+            created = [dict(record, id=record_id) for record, record_id in zip(new_records, ids)]
+            records.extend(created)
+        return created
+
+    def update(self, record_id, changes, expect=None):
+        """Apply changes to one record and return the updated record
+
+        If expect is given, the update only happens when every field in it
+        still has the expected value. Returns None when the record does not
+        exist or the expectation fails, in which case nothing is written.
+        """
+        with self.transaction() as records:
+            for record in records:
+                if record.get('id') == record_id:
+                    break
+            else:
+                return None
+            if expect and any(record.get(field) != value for field, value in expect.items()):
+                return None
+            record.update(changes)
+        return record
+
+    def snapshot(self):
+        """Return (version, records) from the same load"""
+        self.refresh()
+        state = self._state
+        return state[0], state[1]
+
+    def all(self):
+        """Return the cached records (shared, treat as read-only)"""
+        self.refresh()
+        return self._state[1]
+
+    def get(self, record_id):
+        """Return the record with the given id, or None"""
+        self.refresh()
+        return self._state[2].get(record_id)
+
+    def find(self, field, value):
+        """Return all records whose indexed field equals value"""
+        self.refresh()
+        return self._state[3][field].get(value, [])
+
+    def first(self, field, value):
+        """Return the first record whose indexed field equals value, or None"""
+        matches = self.find(field, value)
+        return matches[0] if matches else None
+
+    def copy_records(self):
+        """Return a private copy of the records for read-modify-write cycles"""
+        return [dict(record) for record in self.all()]
+
+
+class Repository:
+    """Process-wide access point for all JSON collections"""
+
+    def __init__(self, data_dir, check_interval=1.0):
+        data_dir = Path(data_dir)
+        self.sequences = SequenceFile(data_dir / 'sequences.json')
+        options = {'check_interval': check_interval, 'sequences': self.sequences}
+        self.users = JsonCollection(data_dir / 'users.json', indexes=('username',), **options)
+        self.labs = JsonCollection(data_dir / 'labs.json', **options)
+        self.stations = JsonCollection(data_dir / 'stations.json', indexes=('lab_id',), **options)
+        self.devices = JsonCollection(data_dir / 'devices.json', indexes=('station_id',), **options)
+        self.reservations = JsonCollection(data_dir / 'reservations.json', indexes=('station_id',), **options)
+
+
+def open_repository(backend, data_dir, sqlite_path=None):
+    """Create the repository for the configured storage backend ('json' or 'sqlite')"""
+    if backend == 'json':
+        return Repository(data_dir)
+    if backend == 'sqlite':
+        from sqlite_storage import SqliteRepository
+        return SqliteRepository(sqlite_path or Path(data_dir) / 'sw_labs.db')
+    raise ValueError(f"Unknown storage backend: {backend}")
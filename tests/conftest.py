@@ -0,0 +1,38 @@
+"""Shared fixtures: app.py imported once with its data/ directory in a temporary folder"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def webapp(tmp_path_factory):
+    """The app module, running against empty collections in a temporary working directory"""
+    root = tmp_path_factory.mktemp('app')
+    data_dir = root / 'data'
+    data_dir.mkdir()
+    for name in ('users', 'labs', 'stations', 'devices', 'reservations'):
+        (data_dir / f'{name}.json').write_text('[]')
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        import app as webapp
+        webapp.app.config['TESTING'] = True
+        yield webapp
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(webapp):
+    return webapp.app.test_client()
+
+
+@pytest.fixture
+def empty_collections(webapp):
+    """Clear every collection before a test"""
+    repository = webapp.repository
+    for collection in (repository.users, repository.labs, repository.stations,
+                       repository.devices, repository.reservations):
+        collection.save([])
+    return repository
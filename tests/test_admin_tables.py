@@ -0,0 +1,112 @@
+"""Tests for the sorted, searchable admin panel tables of admin_tables.py"""
+
+import pytest
+
+from admin_tables import address_key, build_tables, search_tokens
+from liveness import LivenessTable
+from storage import Repository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = Repository(tmp_path, check_interval=0)
+    repository.labs.insert_many([{'name': 'Networks', 'location': 'B-201'}, {'name': 'Embedded', 'location': 'A-101'}])
+    repository.stations.insert_many([
+        {'name': 'Bench 1', 'lab_id': 1},
+        {'name': 'Bench 2', 'lab_id': 1},
+        {'name': 'Scope', 'lab_id': 2},
+    ])
+    repository.devices.insert_many([
+        {'name': 'router', 'device_type': 'Router', 'ip_address': '10.0.0.10', 'station_id': 1},
+        {'name': 'switch', 'device_type': 'Switch', 'ip_address': '10.0.0.9', 'station_id': 1},
+        {'name': 'fpga', 'device_type': 'Board', 'ip_address': 'fpga.lab', 'station_id': 3},
+        {'name': 'pc', 'device_type': 'PC', 'ip_address': '::1', 'station_id': 2},
+    ])
+    return repository
+
+
+@pytest.fixture
+def liveness(tmp_path):
+    table = LivenessTable(tmp_path / 'status.json', tmp_path / 'events.jsonl')
+    table.load()
+    return table
+
+
+@pytest.fixture
+def tables(repository, liveness):
+    return build_tables(repository, liveness)
+
+
+def names(page, field='name'):
+    return [row[field] for row in page[1]]
+
+
+def test_search_tokens():
+    assert search_tokens('ann@lab.org') == {'ann@lab.org', 'ann', 'lab', 'org'}
+    assert search_tokens('10.0.0.5') >= {'10.0.0.5', '10', '0', '5'}
+
+
+def test_address_key_orders_ipv4_ipv6_then_names():
+    addresses = ['fpga.lab', '::1', '10.0.0.10', '10.0.0.9']
+    assert sorted(addresses, key=address_key) == ['10.0.0.9', '10.0.0.10', '::1', 'fpga.lab']
+
+
+def test_paging_and_sorting(tables):
+    devices = tables['devices']
+    assert devices.page(sort='name', limit=2)[0] == 4
+    assert names(devices.page(sort='name')) == ['fpga', 'pc', 'router', 'switch']
+    assert names(devices.page(sort='name', descending=True)) == ['switch', 'router', 'pc', 'fpga']
+    assert names(devices.page(sort='name', offset=1, limit=2)) == ['pc', 'router']
+    assert names(devices.page(sort='name', descending=True, offset=1, limit=2)) == ['router', 'pc']
+    assert names(devices.page(sort='name', offset=10)) == []
+    assert names(devices.page(sort='ip_address')) == ['switch', 'router', 'pc', 'fpga']
+    assert names(tables['labs'].page(sort='stations', descending=True)) == ['Networks', 'Embedded']
+    with pytest.raises(ValueError):
+        devices.page(sort='password')
+
+
+def test_search_by_token_prefix(tables):
+    devices = tables['devices']
+    assert names(devices.page('rout')) == ['router']
+    assert names(devices.page('10.0.0')) == ['router', 'switch']
+    assert names(devices.page('10.0.0 swi')) == ['switch']
+    assert names(devices.page('bench 2')) == ['pc']
+    assert devices.page('nothing') == (0, [])
+    assert names(devices.page('10', sort='name', descending=True, limit=1)) == ['switch']
+
+
+def test_rows_follow_writes_and_related_renames(repository, tables):
+    stations, devices = tables['stations'], tables['devices']
+    repository.stations.update(1, {'name': 'Rack'})
+    assert names(devices.page('rack'), 'station_name') == ['Rack', 'Rack']
+    assert names(devices.page(sort='station'), 'station_name') == ['Bench 2', 'Rack', 'Rack', 'Scope']
+    repository.labs.update(2, {'name': 'Digital'})
+    assert names(stations.page('digital')) == ['Scope']
+    assert stations.page('embedded') == (0, [])
+
+    repository.devices.update(3, {'station_id': 2})
+    assert [row['devices'] for row in stations.page(sort='id')[1]] == [2, 2, 0]
+    repository.devices.insert({'name': 'probe', 'ip_address': '10.0.0.1', 'station_id': 3})
+    assert names(devices.page(sort='ip_address', limit=1)) == ['probe']
+    with repository.devices.transaction() as records:
+        records[:] = [record for record in records if record['name'] != 'router']
+    assert names(devices.page(sort='name')) == ['fpga', 'pc', 'probe', 'switch']
+    assert devices.page('router') == (0, [])
+
+
+def test_writes_from_another_process(tmp_path, repository, tables):
+    devices = tables['devices']
+    assert names(devices.page(sort='name')) == ['fpga', 'pc', 'router', 'switch']
+    other = Repository(tmp_path, check_interval=0)
+    other.devices.update(1, {'name': 'gateway'})
+    other.stations.update(3, {'name': 'Logic'})
+    assert names(devices.page(sort='name')) == ['fpga', 'gateway', 'pc', 'switch']
+    assert names(devices.page('logic')) == ['fpga']
+
+
+def test_live_columns(liveness, tables):
+    devices = tables['devices']
+    liveness.record_sweep({1: None, 2: 0.001, 3: 0.002, 4: None})
+    assert names(devices.page(sort='status', descending=True, limit=2)) == ['fpga', 'switch']
+    liveness.record_sweep({1: 0.001, 3: None})
+    assert names(devices.page(sort='status', descending=True, limit=2)) == ['switch', 'router']
@@ -0,0 +1,107 @@
+"""Tests for the /api/device_status filters, pagination and ETags"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture
+def devices(webapp, empty_collections):
+    """Two labs of two stations with two devices each; odd device ids answered the last ping"""
+    repository = empty_collections
+    lab_ids = [repository.labs.insert({'name': f'Lab {n}'})['id'] for n in (1, 2)]
+    station_ids = [repository.stations.insert({'name': f'S{n}', 'lab_id': lab_ids[n // 2]})['id'] for n in range(4)]
+    device_ids = [
+        repository.devices.insert({'name': f'D{n}', 'station_id': station_ids[n // 2], 'ip_address': f'10.0.0.{n}'})['id']
+        for n in range(8)
+    ]
+    webapp.liveness.load()
+    start = datetime.now() - timedelta(hours=1)
+    webapp.liveness.record_sweep({device_id: 0.001 if device_id % 2 else None for device_id in device_ids},
+                                 checked_at=start.isoformat())
+    return {'labs': lab_ids, 'stations': station_ids, 'devices': device_ids, 'swept_at': start}
+
+
+def ids(response):
+    assert response.status_code == 200, response.data
+    return [entry['id'] for entry in response.get_json()]
+
+
+def test_filters(client, devices):
+    all_ids = devices['devices']
+    assert sorted(ids(client.get('/api/device_status'))) == all_ids
+    assert sorted(ids(client.get(f"/api/device_status?station_id={devices['stations'][1]}"))) == all_ids[2:4]
+    assert sorted(ids(client.get(f"/api/device_status?lab_id={devices['labs'][1]}"))) == all_ids[4:]
+    assert sorted(ids(client.get(f"/api/device_status?ids={all_ids[0]},{all_ids[5]},999"))) == [all_ids[0], all_ids[5]]
+    assert sorted(ids(client.get(f"/api/device_status?ids={all_ids[0]},{all_ids[5]}&lab_id={devices['labs'][1]}"))) == [all_ids[5]]
+
+
+def test_online_filter(client, devices):
+    online = ids(client.get('/api/device_status?online=true'))
+    offline = ids(client.get('/api/device_status?online=false'))
+    assert sorted(online) == [i for i in devices['devices'] if i % 2]
+    assert sorted(offline) == [i for i in devices['devices'] if not i % 2]
+
+
+def test_since_filter(webapp, client, devices):
+    before = (devices['swept_at'] - timedelta(minutes=1)).isoformat()
+    assert sorted(ids(client.get(f'/api/device_status?since={before}'))) == devices['devices']
+
+    # Only the device that went offline in a later sweep changed after the first one
+    flipped = next(device_id for device_id in devices['devices'] if device_id % 2)
+    webapp.liveness.record_sweep({flipped: None}, checked_at=(devices['swept_at'] + timedelta(minutes=30)).isoformat())
+    after = (devices['swept_at'] + timedelta(minutes=1)).isoformat()
+    assert ids(client.get(f'/api/device_status?since={after}')) == [flipped]
+
+
+def test_since_accepts_timezone_aware_timestamps(webapp, client, devices):
+    before = (devices['swept_at'] - timedelta(minutes=1)).astimezone(timezone.utc)
+    after = (devices['swept_at'] + timedelta(minutes=1)).astimezone(timezone.utc)
+    assert len(ids(client.get(f"/api/device_status?since={before.strftime('%Y-%m-%dT%H:%M:%SZ')}"))) == 8
+    assert ids(client.get('/api/device_status', query_string={'since': after.isoformat()})) == []
+
+
+def test_bad_parameters(client, devices):
+    assert client.get('/api/device_status?since=yesterday').status_code == 400
+    assert client.get('/api/device_status?ids=1,x').status_code == 400
+
+
+def test_pagination(client, devices):
+    response = client.get('/api/device_status?limit=3')
+    assert ids(response) == devices['devices'][:3]
+    cursor = response.headers['X-Next-Cursor']
+    assert 'rel="next"' in response.headers['Link']
+    response = client.get(f'/api/device_status?limit=3&cursor={cursor}')
+    assert ids(response) == devices['devices'][3:6]
+    response = client.get(f"/api/device_status?limit=3&cursor={response.headers['X-Next-Cursor']}")
+    assert ids(response) == devices['devices'][6:]
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_etag(webapp, client, devices):
+    response = client.get('/api/device_status?online=true')
+    etag = response.headers['ETag']
+    assert client.get('/api/device_status?online=true', headers={'If-None-Match': etag}).status_code == 304
+    # Another query string gets another tag
+    assert client.get('/api/device_status?online=false', headers={'If-None-Match': etag}).status_code == 200
+
+    webapp.liveness.record_sweep({devices['devices'][0]: 0.002})
+    response = client.get('/api/device_status?online=true', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert devices['devices'][0] in ids(response)
+
+    device_id = devices['devices'][0]
+    etag = client.get(f'/api/device_status/{device_id}').headers['ETag']
+    assert client.get(f'/api/device_status/{device_id}', headers={'If-None-Match': etag}).status_code == 304
+    webapp.repository.devices.update(device_id, {'name': 'renamed'})
+    assert client.get(f'/api/device_status/{device_id}', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_sweep_is_kept_when_metrics_fail(webapp, monkeypatch, devices):
+    def full(results, at=None):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(webapp.metrics, 'record', full)
+    device_id = next(device_id for device_id in devices['devices'] if device_id % 2 == 0)
+    assert not webapp.liveness.get(device_id)['is_online']
+    webapp.record_probe_results({device_id: 0.001})
+    assert webapp.liveness.get(device_id)['is_online']
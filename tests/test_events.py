@@ -0,0 +1,41 @@
+"""Tests for the /api/events broker and its limit on open streams"""
+
+from events import EventBroker
+
+
+def test_publish_matches_filters():
+    broker = EventBroker()
+    lab = broker.subscribe(lab_id=1)
+    station = broker.subscribe(station_id=5)
+    broker.publish('station', {'lab_id': 1, 'station_id': 4})
+    broker.publish('station', {'lab_id': 2, 'station_id': 5})
+    assert lab.get(0) == ('station', {'lab_id': 1, 'station_id': 4})
+    assert lab.get(0) is None
+    assert station.get(0) == ('station', {'lab_id': 2, 'station_id': 5})
+
+
+def test_subscriptions_beyond_the_limit_are_turned_away():
+    broker = EventBroker(max_subscriptions=2)
+    first, second = broker.subscribe(), broker.subscribe()
+    assert broker.subscribe() is None
+    # Closing a stream frees its slot
+    stream = broker.stream(first, heartbeat=0)
+    assert next(stream) == 'retry: 5000\n\n'
+    stream.close()
+    assert broker.subscribe() is not None
+    assert second is not None
+
+
+def test_route_answers_503_when_full(webapp, client, monkeypatch):
+    monkeypatch.setattr(webapp.event_broker, 'max_subscriptions', 1)
+    held = webapp.event_broker.subscribe()
+    try:
+        response = client.get('/api/events')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '300'
+    finally:
+        webapp.event_broker.unsubscribe(held)
+    response = client.get('/api/events')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    response.close()
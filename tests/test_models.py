@@ -0,0 +1,41 @@
+"""Tests for the slotted models of models.py"""
+
+from models import User
+
+
+def user_record(user_id=1, **fields):
+    return dict({'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+                 'password_hash': 'x', 'is_admin': False, 'created_at': '2025-01-02T03:04:05'}, **fields)
+
+
+def test_user_is_slotted():
+    user = User(user_record())
+    assert not hasattr(user, '__dict__')
+    assert user.created_at.year == 2025
+
+
+def test_user_implements_flask_login_interface():
+    user = User(user_record(7))
+    assert user.is_authenticated and user.is_active and not user.is_anonymous
+    assert user.get_id() == '7'
+    assert user == User(user_record(7, username='renamed'))
+    assert user != User(user_record(8))
+    assert len({user, user}) == 1
+
+
+def test_equal_users_hash_alike():
+    first, second = User(user_record(3)), User(user_record(3, email='other@example.com'))
+    assert first == second and hash(first) == hash(second)
+    assert len({first, second}) == 1
+    assert {first: 'a'}[second] == 'a'
+    assert len({first, User(user_record(4))}) == 2
+
+
+def test_login_session(webapp, client, empty_collections):
+    webapp.create_user('ann', 'ann@example.com', 'secret', is_admin=True)
+    assert client.get('/admin/lab/add').status_code == 302
+    response = client.post('/login', data={'username': 'ann', 'password': 'secret'})
+    assert response.status_code == 302
+    assert client.get('/admin/lab/add').status_code == 200
+    client.get('/logout')
+    assert client.get('/admin/lab/add').status_code == 302
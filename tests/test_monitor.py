@@ -0,0 +1,84 @@
+"""Tests for the ICMP echo probe and the probe sweep of monitor.py"""
+
+import socket
+
+import pytest
+
+import monitor
+from monitor import ICMP_HEADER, icmp_checksum, parse_echo_reply, probe_sweep
+
+
+def test_icmp_checksum():
+    # An echo request with its checksum filled in sums to zero
+    header = ICMP_HEADER.pack(8, 0, 0, 0x1234, 1) + b'abc'
+    packet = ICMP_HEADER.pack(8, 0, icmp_checksum(header), 0x1234, 1) + b'abc'
+    assert icmp_checksum(packet) == 0
+
+
+def test_echo_reply_is_matched_by_payload():
+    token = b'12345678'
+    reply = ICMP_HEADER.pack(0, 0, 0, 99, 1) + token
+    assert parse_echo_reply(reply, socket.AF_INET, token)
+    # Raw IPv4 sockets deliver the IP header too
+    ip_header = bytes([0x45]) + bytes(19)
+    assert parse_echo_reply(ip_header + reply, socket.AF_INET, token)
+    assert not parse_echo_reply(reply, socket.AF_INET, b'87654321')
+    assert not parse_echo_reply(ICMP_HEADER.pack(8, 0, 0, 99, 1) + token, socket.AF_INET, token)
+    assert parse_echo_reply(ICMP_HEADER.pack(129, 0, 0, 99, 1) + token, socket.AF_INET6, token)
+
+
+def can_ping():
+    try:
+        monitor.icmp_socket(socket.AF_INET).close()
+    except OSError:
+        return False
+    return True
+
+
+@pytest.mark.skipif(not can_ping(), reason='no ping or raw ICMP sockets here')
+def test_icmp_probe_of_localhost():
+    results = probe_sweep([{'id': 1, 'ip_address': '127.0.0.1'}], timeout=1, deadline=3)
+    assert results[1] is not None and results[1] < 1
+
+
+def test_icmp_socket_falls_back_to_raw(monkeypatch):
+    opened = []
+
+    class FakeSocket:
+        def __init__(self, family, kind, protocol):
+            opened.append(kind)
+            if kind == socket.SOCK_DGRAM:
+                raise PermissionError(13, 'Permission denied')
+
+        def setblocking(self, flag):
+            pass
+
+    monkeypatch.setattr(monitor.socket, 'socket', FakeSocket)
+    monkeypatch.setattr(monitor, '_icmp_socket_types', {})
+    monitor.icmp_socket(socket.AF_INET)
+    monitor.icmp_socket(socket.AF_INET)
+    # The kind that opened is tried first from then on
+    assert opened == [socket.SOCK_DGRAM, socket.SOCK_RAW, socket.SOCK_RAW]
+
+
+def test_devices_are_offline_when_icmp_sockets_are_refused(monkeypatch):
+    def refused(family):
+        raise PermissionError(1, 'Operation not permitted')
+    monkeypatch.setattr(monitor, 'icmp_socket', refused)
+    results = probe_sweep([{'id': 1, 'ip_address': '127.0.0.1'}], timeout=1, deadline=3)
+    assert results == {1: None}
+
+
+def test_tcp_probe_and_unknown_types():
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    port = server.getsockname()[1]
+    try:
+        devices = [{'id': 1, 'ip_address': '127.0.0.1', 'device_type': 'Server'},
+                   {'id': 2, 'ip_address': '127.0.0.1', 'device_type': 'Odd'}]
+        results = probe_sweep(devices, probe_types={'Server': {'type': 'tcp', 'port': port},
+                                                    'Odd': {'type': 'carrier-pigeon'}}, timeout=1, deadline=3)
+    finally:
+        server.close()
+    assert results[1] is not None and 2 not in results
@@ -0,0 +1,100 @@
+"""Tests for the password hashing pool of passwords.py"""
+
+import os
+import threading
+
+import pytest
+
+import passwords
+from passwords import CredentialCache, HasherBusy, PasswordHasher, pool_share
+
+METHOD = 'pbkdf2:sha256:1000'
+
+
+def test_pool_starts_on_first_use():
+    hasher = PasswordHasher(method=METHOD, workers=1)
+    assert hasher._pool is None
+    try:
+        stored = hasher.hash('secret')
+        assert hasher._pool is not None
+        assert hasher._submit(os.getpid) != os.getpid()
+        assert hasher.verify(1, stored, 'secret')
+        assert not hasher.verify(1, stored, 'wrong')
+    finally:
+        hasher.shutdown()
+
+
+def test_inline_without_workers():
+    hasher = PasswordHasher(method=METHOD, workers=0)
+    assert hasher._submit(os.getpid) == os.getpid()
+    assert hasher._pool is None
+    assert hasher.verify(1, hasher.hash('secret'), 'secret')
+
+
+def test_inline_when_the_pool_cannot_start(monkeypatch):
+    def unavailable(**kwargs):
+        raise NotImplementedError('no semaphores')
+    monkeypatch.setattr(passwords, 'ProcessPoolExecutor', unavailable)
+    hasher = PasswordHasher(method=METHOD, workers=2)
+    assert hasher._submit(os.getpid) == os.getpid()
+    assert hasher.workers == 0
+
+
+def test_busy_when_no_slot_frees_up():
+    hasher = PasswordHasher(method=METHOD, workers=0, queue_per_worker=1, queue_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+
+    thread = threading.Thread(target=hasher._submit, args=(slow,))
+    thread.start()
+    started.wait()
+    try:
+        with pytest.raises(HasherBusy):
+            hasher.hash('secret')
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_cache_and_rehash():
+    hasher = PasswordHasher(method=METHOD, workers=0, cache=CredentialCache(ttl=60))
+    stored = hasher.hash('secret')
+    assert hasher.verify(1, stored, 'secret')
+    assert hasher.cache.check(1, stored, 'secret')
+    assert not hasher.cache.check(1, stored, 'wrong')
+    assert not hasher.cache.check(2, stored, 'secret')
+    assert not hasher.needs_rehash(stored)
+    assert hasher.needs_rehash(PasswordHasher(method='pbkdf2:sha256:2000', workers=0).hash('secret'))
+
+
+def test_pool_share():
+    # serve.py's default of 2 x CPUs + 1 web workers against a budget of up to 4
+    assert pool_share(4, 9) == 1
+    assert pool_share(1, 3) == 1
+    assert pool_share(8, 2) == 4
+    assert pool_share(4, 0) == 4
+    assert pool_share(0, 4) == 0
+
+
+@pytest.fixture
+def admin_client(webapp, client, empty_collections):
+    webapp.create_user('root', 'root@example.com', 'secret', is_admin=True)
+    assert client.post('/login', data={'username': 'root', 'password': 'secret'}).status_code == 302
+    return client
+
+
+def test_busy_hasher_when_adding_or_editing_users(webapp, monkeypatch, admin_client):
+    def busy(password):
+        raise HasherBusy()
+    monkeypatch.setattr(webapp.password_hasher, 'hash', busy)
+    form = {'username': 'bob', 'email': 'bob@example.com', 'password': 'pw'}
+    assert admin_client.post('/admin/user/add', data=form).status_code == 503
+    assert webapp.get_user_by_username('bob') is None
+    root = webapp.get_user_by_username('root')
+    form = {'username': 'root', 'email': 'root@example.com', 'password': 'new'}
+    assert admin_client.post(f"/admin/user/{root['id']}/edit", data=form).status_code == 503
+    assert webapp.get_user_by_username('root')['password_hash'] == root['password_hash']
+    assert webapp.create_user('carol', 'carol@example.com', 'pw') is None
@@ -0,0 +1,81 @@
+"""Tests for the per-station reservation intervals of reservations.py"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from reservations import ReservationIndex, occupation_interval
+from storage import JsonCollection
+
+T0 = datetime(2025, 3, 3, 9, 0)
+
+
+def at(hours):
+    return T0 + timedelta(hours=hours)
+
+
+@pytest.fixture
+def reservations(tmp_path):
+    return JsonCollection(tmp_path / 'reservations.json', indexes=('station_id',), check_interval=0)
+
+
+def book(reservations, start, end, station_id=1):
+    return reservations.insert({'station_id': station_id, 'user_id': 1,
+                                'starts_at': at(start).isoformat(), 'ends_at': at(end).isoformat()})['id']
+
+
+def test_conflicts(reservations):
+    index = ReservationIndex(reservations)
+    first = book(reservations, 1, 2)
+    second = book(reservations, 4, 6)
+    assert index.conflict(1, at(0), at(1)) is None          # ends as the booking starts
+    assert index.conflict(1, at(2), at(4)) is None          # fills the gap exactly
+    assert index.conflict(1, at(1.5), at(1.75)) == first    # inside
+    assert index.conflict(1, at(0), at(10)) in (first, second)  # covers both
+    assert index.conflict(1, at(5.9), at(7)) == second      # overlaps the end
+    assert index.conflict(2, at(0), at(10)) is None         # another station
+
+
+def test_next_free(reservations):
+    index = ReservationIndex(reservations)
+    book(reservations, 1, 2)
+    book(reservations, 2.5, 3)
+    book(reservations, 4, 5)
+    hour = timedelta(hours=1)
+    assert index.next_free(1, at(0), hour) == at(0)               # fits before the first booking
+    assert index.next_free(1, at(0.5), hour) == at(3)             # 2-2.5 is too short, 3-4 fits
+    assert index.next_free(1, at(1.5), timedelta(minutes=30)) == at(2)  # starts inside a booking
+    assert index.next_free(1, at(0), 2 * hour) == at(5)           # only after the last one
+    assert index.next_free(2, at(0), hour) == at(0)
+    # The current occupation pushes the search back, or blocks it for good
+    assert index.next_free(1, at(0), hour, busy_until=at(3.5)) == at(5)
+    assert index.next_free(1, at(0), hour, busy_until=datetime.max) is None
+
+
+def test_index_follows_cancellations_and_external_writes(tmp_path, reservations):
+    index = ReservationIndex(reservations)
+    first = book(reservations, 1, 2)
+    assert index.conflict(1, at(1), at(2)) == first
+    with reservations.transaction() as records:
+        records[:] = [record for record in records if record['id'] != first]
+    assert index.conflict(1, at(1), at(2)) is None
+
+    other_process = JsonCollection(tmp_path / 'reservations.json', indexes=('station_id',), check_interval=0)
+    booked = book(other_process, 1, 3)
+    assert index.conflict(1, at(2), at(2.5)) == booked
+    assert [interval[2] for interval in index.for_station(1, after=at(2.9))] == [booked]
+    assert index.for_station(1, after=at(3)) == []
+
+
+def test_free_stations(reservations):
+    index = ReservationIndex(reservations)
+    book(reservations, 1, 2, station_id=1)
+    stations = [
+        {'id': 1},
+        {'id': 2, 'is_occupied': True, 'occupied_at': at(0).isoformat(), 'occupied_until': at(1.5).isoformat()},
+        {'id': 3, 'is_occupied': True, 'occupied_at': at(0).isoformat(), 'occupied_until': None},
+        {'id': 4},
+    ]
+    assert [station['id'] for station in index.free_stations(stations, at(1), at(2))] == [4]
+    assert [station['id'] for station in index.free_stations(stations, at(2), at(3))] == [1, 2, 4]
+    assert occupation_interval(stations[2])[1] == datetime.max
@@ -0,0 +1,92 @@
+"""Tests for the expiry deadline heap of scheduler.py"""
+
+import threading
+from datetime import datetime, timedelta
+
+import scheduler
+from scheduler import ExpiryScheduler
+
+
+def iso(seconds):
+    return (datetime.now() + timedelta(seconds=seconds)).isoformat()
+
+
+def test_next_deadline_is_the_earliest():
+    expiry = ExpiryScheduler(release=None)
+    assert expiry.next_deadline() is None
+    late, early = iso(3600), iso(60)
+    expiry.schedule(1, late)
+    expiry.schedule(2, early)
+    expiry.schedule(3, iso(600))
+    assert expiry.next_deadline() == datetime.fromisoformat(early)
+
+
+def test_due_entries_come_in_deadline_order():
+    expiry = ExpiryScheduler(release=None)
+    deadlines = {1: iso(-10), 2: iso(-30), 3: iso(-20), 4: iso(3600)}
+    for station_id, deadline in deadlines.items():
+        expiry.schedule(station_id, deadline)
+    assert expiry._wait_for_due() == [(2, deadlines[2]), (3, deadlines[3]), (1, deadlines[1])]
+    assert expiry.next_deadline() == datetime.fromisoformat(deadlines[4])
+
+
+def test_cancel_and_reschedule_drop_the_old_deadline():
+    expiry = ExpiryScheduler(release=None)
+    expiry.schedule(1, iso(-20))
+    expiry.schedule(2, iso(-10))
+    expiry.cancel(1)
+    extended = iso(3600)
+    expiry.schedule(2, extended)
+    assert expiry.next_deadline() == datetime.fromisoformat(extended)
+    expiry.schedule(3, iso(-5))
+    assert [station_id for station_id, _ in expiry._wait_for_due()] == [3]
+
+
+def test_rebuild_keeps_only_occupied_stations():
+    expiry = ExpiryScheduler(release=None)
+    expiry.schedule(9, iso(-60))
+    past = iso(-1)
+    expiry.rebuild([
+        {'id': 1, 'is_occupied': True, 'occupied_until': past},
+        {'id': 2, 'is_occupied': False, 'occupied_until': iso(-2)},
+        {'id': 3, 'is_occupied': True, 'occupied_until': None},
+    ])
+    assert expiry._wait_for_due() == [(1, past)]
+    assert expiry.next_deadline() is None
+
+
+def test_run_releases_when_deadlines_pass():
+    released = []
+    done = threading.Event()
+
+    def release(station_id, occupied_until):
+        released.append(station_id)
+        if len(released) == 2:
+            done.set()
+
+    expiry = ExpiryScheduler(release)
+    threading.Thread(target=expiry.run, daemon=True).start()
+    expiry.schedule(1, iso(0.2))
+    expiry.schedule(2, iso(0.1))
+    expiry.schedule(3, iso(0.15))
+    expiry.cancel(3)
+    assert done.wait(5)
+    assert released == [2, 1]
+
+
+def test_failed_release_is_retried(monkeypatch):
+    monkeypatch.setattr(scheduler, 'RETRY_DELAY', timedelta(seconds=0.05))
+    calls = []
+    done = threading.Event()
+
+    def release(station_id, occupied_until):
+        calls.append(station_id)
+        if len(calls) == 1:
+            raise OSError('disk full')
+        done.set()
+
+    expiry = ExpiryScheduler(release)
+    threading.Thread(target=expiry.run, daemon=True).start()
+    expiry.schedule(1, iso(0))
+    assert done.wait(5)
+    assert calls == [1, 1]
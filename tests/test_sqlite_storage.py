@@ -0,0 +1,47 @@
+"""Tests for the SQLite backend's collection interface"""
+
+import pytest
+
+from sqlite_storage import SqliteRepository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    return SqliteRepository(tmp_path / 'labs.db', check_interval=0)
+
+
+def reservation(station_id=1, **fields):
+    return dict({'station_id': station_id, 'user_id': 1, 'starts_at': '2025-01-01T10:00:00',
+                 'ends_at': '2025-01-01T11:00:00'}, **fields)
+
+
+def test_transaction_keeps_reserved_ids(repository):
+    reservations = repository.reservations
+    reserved = reservations.reserve_ids(1)[0]
+    with reservations.transaction() as records:
+        records.append(reservation(id=reserved))
+    assert reservations.get(reserved)['station_id'] == 1
+    assert [record['id'] for record in reservations.all()] == [reserved]
+    # The next id follows the reserved one instead of skipping a second id
+    assert reservations.insert(reservation(2))['id'] == reserved + 1
+
+
+def test_transaction_assigns_ids_to_records_without_one(repository):
+    reservations = repository.reservations
+    reservations.insert(reservation())
+    with reservations.transaction() as records:
+        records.append(reservation(3))
+    assert records[-1]['id'] == 2
+    assert reservations.get(2)['station_id'] == 3
+
+
+def test_transaction_rolls_back_on_exception(repository):
+    labs = repository.labs
+    labs.insert({'name': 'A'})
+    version = labs.version
+    with pytest.raises(RuntimeError):
+        with labs.transaction() as records:
+            records[0]['name'] = 'B'
+            raise RuntimeError('abort')
+    assert labs.version == version
+    assert labs.get(1)['name'] == 'A'
@@ -0,0 +1,84 @@
+"""Tests for the station availability bitmaps of station_search.py"""
+
+import pytest
+
+from station_search import StationSearchIndex, query_terms
+from storage import Repository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = Repository(tmp_path, check_interval=0)
+    repository.stations.insert_many([
+        {'name': f'S{n}', 'lab_id': 1 if n < 3 else 2, 'is_occupied': n == 2, 'is_functional': True}
+        for n in range(1, 5)
+    ])
+    repository.devices.insert_many([
+        # Station 1 has Ubuntu and a Server, but not on the same device
+        {'station_id': 1, 'device_type': 'PC', 'os_info': 'Ubuntu 22.04', 'special_apps': 'Git'},
+        {'station_id': 1, 'device_type': 'Server', 'os_info': 'Windows 11', 'special_apps': ''},
+        {'station_id': 2, 'device_type': 'Server', 'os_info': 'Ubuntu 22.04', 'special_apps': 'Git'},
+        {'station_id': 3, 'device_type': 'Server', 'os_info': 'Ubuntu 22.04', 'special_apps': 'Git, Vivado'},
+        {'station_id': 4, 'device_type': 'PC', 'os_info': 'Windows 11', 'special_apps': 'Git'},
+    ])
+    return repository
+
+
+def search(index, **filters):
+    lab_id = filters.pop('lab_id', None)
+    return index.search(lab_id=lab_id, terms=query_terms(**filters))[0]
+
+
+def test_free_functional_stations(repository):
+    index = StationSearchIndex(repository.stations, repository.devices)
+    assert search(index) == [1, 3, 4]
+    assert search(index, lab_id=2) == [3, 4]
+    assert search(index, device_type='server') == [1, 3]
+    assert search(index, apps=['git']) == [1, 3, 4]
+    repository.stations.update(3, {'is_functional': False})
+    repository.stations.update(2, {'is_occupied': False})
+    assert search(index, device_type='server') == [1, 2]
+
+
+def test_all_terms_on_one_device(repository):
+    index = StationSearchIndex(repository.stations, repository.devices)
+    assert search(index, device_type='Server', os='Ubuntu') == [3]
+    assert search(index, device_type='Server', os='Ubuntu', apps=['Vivado']) == [3]
+    assert search(index, device_type='PC', os='Windows 11', apps=['Git']) == [4]
+
+
+def test_combinations_follow_device_changes(repository):
+    index = StationSearchIndex(repository.stations, repository.devices)
+    assert search(index, device_type='Server', os='Ubuntu') == [3]
+    # Station 1's server gets Ubuntu, station 3's only match moves to station 4
+    repository.devices.update(2, {'os_info': 'Ubuntu 24.04'})
+    repository.devices.update(4, {'station_id': 4})
+    assert search(index, device_type='Server', os='Ubuntu') == [1, 4]
+    with repository.devices.transaction() as records:
+        records[:] = [record for record in records if record['id'] != 2]
+    assert search(index, device_type='Server', os='Ubuntu') == [4]
+    repository.devices.insert({'station_id': 3, 'device_type': 'Server', 'os_info': 'Ubuntu', 'special_apps': ''})
+    assert search(index, device_type='Server', os='Ubuntu') == [3, 4]
+
+
+def test_writes_from_another_process(tmp_path, repository):
+    index = StationSearchIndex(repository.stations, repository.devices)
+    assert search(index, device_type='Server', os='Ubuntu') == [3]
+    other = Repository(tmp_path, check_interval=0)
+    other.devices.update(2, {'os_info': 'Ubuntu 24.04'})
+    other.stations.update(3, {'is_occupied': True})
+    assert search(index, device_type='Server', os='Ubuntu') == [1]
+
+
+def test_after_limit_and_accept(repository):
+    index = StationSearchIndex(repository.stations, repository.devices)
+    assert index.search(limit=2) == ([1, 3], True)
+    assert index.search(after=1, limit=2) == ([3, 4], False)
+    assert index.search(accept=lambda station_id: station_id != 3) == ([1, 4], False)
+    assert index.search(after=-5) == ([1, 3, 4], False)
+
+
+def test_route_rejects_negative_cursors(client, empty_collections):
+    assert client.get('/api/station_search?cursor=-5').status_code == 400
+    response = client.get('/api/station_search?cursor=-1')
+    assert response.status_code == 200 and response.get_json() == []
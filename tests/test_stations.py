@@ -0,0 +1,67 @@
+"""Tests for occupying and releasing stations and the expiry schedule behind them"""
+
+import pytest
+
+
+@pytest.fixture
+def station(webapp, empty_collections):
+    lab = empty_collections.labs.insert({'name': 'Lab', 'created_at': '2025-01-01T00:00:00'})
+    return empty_collections.stations.insert({'name': 'S1', 'lab_id': lab['id'], 'is_occupied': False,
+                                              'is_functional': True, 'created_at': '2025-01-01T00:00:00'})
+
+
+@pytest.fixture
+def user_client(webapp, client, empty_collections):
+    webapp.create_user('ann', 'ann@example.com', 'secret')
+    assert client.post('/login', data={'username': 'ann', 'password': 'secret'}).status_code == 302
+    return client
+
+
+def occupy(client, station_id, hours=2):
+    return client.post(f'/occupy_station/{station_id}', data={'occupation_type': 'duration', 'duration_hours': hours})
+
+
+def test_occupy_and_release(webapp, user_client, station):
+    occupy(user_client, station['id'])
+    occupied = webapp.repository.stations.get(station['id'])
+    assert occupied['is_occupied'] and occupied['occupied_until']
+    user_client.post(f"/release_station/{station['id']}")
+    assert not webapp.repository.stations.get(station['id'])['is_occupied']
+
+
+def test_web_workers_leave_scheduling_to_the_monitor(webapp, monkeypatch, user_client, station):
+    # Without the auto-release loop in this process nothing would drain the heap
+    monkeypatch.setattr(webapp, 'expiry_scheduler', webapp.ExpiryScheduler(webapp.release_expired_station))
+    monkeypatch.setattr(webapp, '_schedulers_running', False)
+    occupy(user_client, station['id'])
+    assert webapp.expiry_scheduler.next_deadline() is None
+    assert webapp.expiry_scheduler._heap == []
+
+
+def test_occupation_is_scheduled_when_the_loop_runs_here(webapp, monkeypatch, user_client, station):
+    monkeypatch.setattr(webapp, 'expiry_scheduler', webapp.ExpiryScheduler(webapp.release_expired_station))
+    monkeypatch.setattr(webapp, '_schedulers_running', True)
+    occupy(user_client, station['id'])
+    until = webapp.repository.stations.get(station['id'])['occupied_until']
+    assert webapp.expiry_scheduler.next_deadline().isoformat() == until
+
+    user_client.post(f"/release_station/{station['id']}")
+    assert webapp.expiry_scheduler.next_deadline() is None
+
+
+def test_reservation_on_a_non_functional_station_is_not_started(webapp, user_client, station):
+    from datetime import datetime, timedelta
+    repository = webapp.repository
+    user_id = repository.users.first('username', 'ann')['id']
+    starts_at = datetime.now() + timedelta(hours=1)
+    reservation, error = webapp.book_station(station['id'], user_id, starts_at, starts_at + timedelta(hours=1))
+    assert error is None
+    assert repository.reservations.get(reservation['id'])['starts_at'] == reservation['starts_at']
+
+    repository.stations.update(station['id'], {'is_functional': False})
+    webapp.start_reservation(reservation['id'], reservation['starts_at'])
+    assert not repository.stations.get(station['id'])['is_occupied']
+
+    repository.stations.update(station['id'], {'is_functional': True})
+    webapp.start_reservation(reservation['id'], reservation['starts_at'])
+    assert repository.stations.get(station['id'])['occupied_by'] == user_id
@@ -0,0 +1,203 @@
+"""Tests for the JSON collections of storage.py"""
+
+import json
+
+import pytest
+
+from storage import JsonCollection, SequenceFile, VersionedIndex
+
+
+def make_collection(tmp_path, check_interval=0, **kwargs):
+    sequences = SequenceFile(tmp_path / 'sequences.json')
+    return JsonCollection(tmp_path / 'labs.json', indexes=('location',), check_interval=check_interval,
+                          sequences=sequences, **kwargs)
+
+
+def read_file(tmp_path):
+    return json.loads((tmp_path / 'labs.json').read_text())
+
+
+def test_insert_and_indexes(tmp_path):
+    labs = make_collection(tmp_path)
+    first = labs.insert({'name': 'A', 'location': 'B1'})
+    second = labs.insert({'name': 'B', 'location': 'B1'})
+    assert (first['id'], second['id']) == (1, 2)
+    assert labs.get(2)['name'] == 'B'
+    assert [lab['name'] for lab in labs.find('location', 'B1')] == ['A', 'B']
+    assert read_file(tmp_path) == [first, second]
+
+
+def test_transaction_rolls_back_on_exception(tmp_path):
+    labs = make_collection(tmp_path)
+    labs.insert({'name': 'A', 'location': 'B1'})
+    version = labs.version
+    calls = []
+    labs.add_listener(lambda *args: calls.append(args))
+
+    with pytest.raises(RuntimeError):
+        with labs.transaction() as records:
+            records[0]['name'] = 'changed'
+            records.append({'id': 99, 'name': 'C'})
+            raise RuntimeError('abort')
+
+    assert labs.version == version
+    assert [lab['name'] for lab in labs.all()] == ['A']
+    assert read_file(tmp_path) == [{'name': 'A', 'location': 'B1', 'id': 1}]
+    assert calls == []
+    # The lock was released: later writes go through
+    assert labs.update(1, {'name': 'B'})['name'] == 'B'
+
+
+def test_transaction_without_changes_does_not_write(tmp_path):
+    labs = make_collection(tmp_path)
+    labs.insert({'name': 'A'})
+    version = labs.version
+    with labs.transaction():
+        pass
+    assert labs.version == version
+
+
+def test_ids_are_not_reused_across_reloads(tmp_path):
+    labs = make_collection(tmp_path)
+    labs.insert_many([{'name': 'A'}, {'name': 'B'}, {'name': 'C'}])
+    with labs.transaction() as records:
+        records.pop()
+
+    reopened = make_collection(tmp_path)
+    assert reopened.insert({'name': 'D'})['id'] == 4
+    assert [record['id'] for record in reopened.insert_many([{'name': 'E'}, {'name': 'F'}])] == [5, 6]
+    assert list(reopened.reserve_ids(2)) == [7, 8]
+    assert reopened.insert({'name': 'G'})['id'] == 9
+
+
+def test_ids_stay_above_hand_edited_records(tmp_path):
+    labs = make_collection(tmp_path)
+    labs.insert({'name': 'A'})
+    (tmp_path / 'labs.json').write_text(json.dumps([{'id': 1, 'name': 'A'}, {'id': 40, 'name': 'B'}]))
+    assert make_collection(tmp_path).insert({'name': 'C'})['id'] == 41
+
+
+def test_external_writes_are_detected(tmp_path):
+    ours = make_collection(tmp_path)
+    theirs = make_collection(tmp_path)
+    ours.insert({'name': 'A'})
+    assert theirs.get(1)['name'] == 'A'
+
+    calls = []
+    ours.add_listener(lambda *args: calls.append(args))
+    version = ours.version
+    theirs.update(1, {'name': 'B'})
+
+    # Not reported to listeners, but the version moves on when the file is reread
+    assert ours.get(1)['name'] == 'B'
+    assert ours.version > version
+    assert calls == []
+
+
+def test_external_writes_wait_for_check_interval(tmp_path):
+    ours = make_collection(tmp_path, check_interval=3600)
+    theirs = make_collection(tmp_path)
+    ours.insert({'name': 'A'})
+    theirs.update(1, {'name': 'B'})
+    assert ours.get(1)['name'] == 'A'
+    ours.refresh(force=True)
+    assert ours.get(1)['name'] == 'B'
+    # Transactions always start from the file
+    with ours.transaction() as records:
+        assert records[0]['name'] == 'B'
+
+
+def test_listener_gets_changes(tmp_path):
+    labs = make_collection(tmp_path)
+    calls = []
+    labs.add_listener(lambda previous, version, changes: calls.append((previous, version, changes)))
+    lab = labs.insert({'name': 'A'})
+    labs.update(lab['id'], {'name': 'B'})
+    assert calls[0][2] == [(None, lab)]
+    assert calls[1][0] == calls[0][1]
+    assert calls[1][2] == [(lab, dict(lab, name='B'))]
+
+
+def test_update_expect(tmp_path):
+    labs = make_collection(tmp_path)
+    labs.insert({'name': 'A'})
+    assert labs.update(1, {'name': 'B'}, expect={'name': 'other'}) is None
+    assert labs.get(1)['name'] == 'A'
+    assert labs.update(2, {'name': 'B'}) is None
+
+
+def test_unreadable_file_keeps_last_good_copy(tmp_path, capsys):
+    labs = make_collection(tmp_path)
+    labs.insert({'name': 'A'})
+    (tmp_path / 'labs.json').write_text('{broken')
+    labs.refresh(force=True)
+    assert labs.get(1)['name'] == 'A'
+    assert 'Error loading' in capsys.readouterr().out
+
+
+class NameIndex(VersionedIndex):
+    """Lab ids by name, counting how it was kept up to date"""
+
+    def __init__(self, labs):
+        self.by_name = {}
+        self.rebuilds = 0
+        self.applied = []
+        super().__init__(labs)
+
+    def _rebuild(self, record_lists):
+        self.rebuilds += 1
+        self.by_name = {record['name']: record['id'] for record in record_lists[0]}
+
+    def _apply(self, position, changes):
+        self.applied.append(changes)
+        for old, new in changes:
+            if old is not None:
+                del self.by_name[old['name']]
+            if new is not None:
+                self.by_name[new['name']] = new['id']
+
+    def lookup(self, name):
+        with self._lock:
+            self._current()
+            return self.by_name.get(name)
+
+
+def test_versioned_index_applies_local_writes(tmp_path):
+    labs = make_collection(tmp_path)
+    index = NameIndex(labs)
+    labs.insert({'name': 'A'})
+    assert index.lookup('A') == 1
+    labs.insert({'name': 'B'})
+    labs.update(1, {'name': 'C'})
+    assert (index.lookup('A'), index.lookup('B'), index.lookup('C')) == (None, 2, 1)
+    assert index.rebuilds == 1
+    assert len(index.applied) == 2
+
+
+def test_versioned_index_catches_up_on_external_writes(tmp_path):
+    ours = make_collection(tmp_path)
+    theirs = make_collection(tmp_path)
+    ours.insert_many([{'name': name} for name in 'ABCD'])
+    index = NameIndex(ours)
+    assert index.lookup('D') == 4
+
+    theirs.update(2, {'name': 'X'})
+    with theirs.transaction() as records:
+        records.pop(0)
+    # A local write whose listener call no longer matches the index's version
+    ours.insert({'name': 'E'})
+
+    assert (index.lookup('A'), index.lookup('B'), index.lookup('X'), index.lookup('E')) == (None, None, 2, 5)
+    assert index.rebuilds == 1
+    # Only the difference was applied
+    assert sorted(len(changes) for changes in index.applied) == [3]
+
+
+def test_versioned_index_catches_up_after_save(tmp_path):
+    labs = make_collection(tmp_path)
+    labs.insert_many([{'name': 'A'}, {'name': 'B'}])
+    index = NameIndex(labs)
+    assert index.lookup('A') == 1
+    labs.save([{'id': 2, 'name': 'B'}, {'id': 3, 'name': 'C'}])
+    assert (index.lookup('A'), index.lookup('B'), index.lookup('C')) == (None, 2, 3)
+    assert index.rebuilds == 1
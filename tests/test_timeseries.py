@@ -0,0 +1,127 @@
+"""Tests for the latency and uptime rollups of timeseries.py"""
+
+import os
+
+from timeseries import BUCKET, RESOLUTIONS, SAMPLE, SAMPLES_HEADER, Bucket, MetricsStore
+
+# A whole hour, so minute and hour buckets line up with the recorded times
+T0 = 1_750_000_000 - 1_750_000_000 % 3600
+
+def test_query_sums_the_window(tmp_path):
+    store = MetricsStore(tmp_path)
+    for minute in range(10):
+        store.record({1: 0.002, 2: None if minute % 2 else 0.010}, at=T0 + minute * 60)
+    name, window, totals = store.query([1, 2, 3], 300, now=T0 + 9 * 60)
+    assert name == 'minute'
+    # Minutes 4..9 of device 1 (the window starts inside minute 4)
+    assert totals[1].samples == 6 and totals[1].up == 6
+    assert totals[1].summary()['latency_ms']['mean'] == 2.0
+    assert totals[2].summary()['uptime_percent'] == 50.0
+    assert totals[3].samples == 0 and totals[3].summary()['uptime_percent'] is None
+
+def test_long_windows_use_hour_buckets(tmp_path):
+    store = MetricsStore(tmp_path)
+    for hour in range(48):
+        store.record({1: 0.001 * (hour + 1)}, at=T0 + hour * 3600)
+    name, window, totals = store.query([1], 7 * 24 * 3600, now=T0 + 47 * 3600)
+    assert name == 'hour'
+    assert totals[1].samples == 48
+    assert totals[1].rtt_min == 1.0 and abs(totals[1].rtt_max - 48.0) < 1e-3
+
+def test_buckets_from_an_earlier_lap_are_ignored(tmp_path):
+    store = MetricsStore(tmp_path)
+    store.record({1: 0.005}, at=T0)
+    # Exactly one day later the minute bucket reuses the same slot
+    store.record({1: None}, at=T0 + 24 * 3600)
+    _, _, totals = store.query([1], 60, now=T0 + 24 * 3600)
+    assert (totals[1].samples, totals[1].up) == (1, 0)
+
+def test_a_restart_carries_on_with_the_open_bucket(tmp_path):
+    store = MetricsStore(tmp_path)
+    store.record({1: 0.001}, at=T0)
+    store.close()
+    store = MetricsStore(tmp_path)
+    store.record({1: 0.003}, at=T0 + 30)
+    _, _, totals = store.query([1], 60, now=T0 + 30)
+    assert totals[1].samples == 2
+    assert totals[1].summary()['latency_ms']['mean'] == 2.0
+
+def test_raw_samples_wrap_around(tmp_path):
+    store = MetricsStore(tmp_path, sample_capacity=4)
+    for i in range(6):
+        store.record({7: None if i == 5 else 0.001}, at=T0 + i)
+    store.close()
+    data = (tmp_path / 'samples.bin').read_bytes()
+    assert SAMPLES_HEADER.unpack_from(data)[0] == 6
+    # Slot 1 holds the sixth sample, which did not answer
+    at, device_id, rtt = SAMPLE.unpack_from(data, SAMPLES_HEADER.size + SAMPLE.size)
+    assert (at, device_id, rtt != rtt) == (T0 + 5, 7, True)
+    assert len(data) == SAMPLES_HEADER.size + 4 * SAMPLE.size
+
+def test_percentiles_follow_the_histogram():
+    bucket = Bucket()
+    for rtt_ms in [0.2] * 50 + [3.0] * 40 + [100.0] * 10:
+        bucket.add(rtt_ms)
+    bucket.add(None)
+    assert bucket.percentile(50) == 0.25
+    assert bucket.percentile(90) == 4.0
+    assert bucket.percentile(99) == 100.0
+    merged = Bucket()
+    merged.merge(bucket)
+    merged.merge(Bucket())
+    assert merged.summary() == bucket.summary()
+
+def test_without_pread_and_pwrite(tmp_path, monkeypatch):
+    # Windows has neither; the store seeks and reads or writes instead
+    monkeypatch.delattr(os, 'pread')
+    monkeypatch.delattr(os, 'pwrite')
+    store = MetricsStore(tmp_path)
+    store.record({1: 0.001, 2: None}, at=T0)
+    store.record({1: 0.003, 2: 0.002}, at=T0 + 30)
+    store.close()
+    store = MetricsStore(tmp_path)
+    store.record({1: None}, at=T0 + 40)
+    _, _, totals = store.query([1, 2], 60, now=T0 + 40)
+    assert (totals[1].samples, totals[1].up) == (3, 2)
+    assert totals[1].summary()['latency_ms']['mean'] == 2.0
+    assert (totals[2].samples, totals[2].up) == (2, 1)
+    assert SAMPLES_HEADER.unpack_from((tmp_path / 'samples.bin').read_bytes())[0] == 5
+
+def test_rows_are_dense_and_reused(tmp_path):
+    store = MetricsStore(tmp_path)
+    store.record({5000: 0.001, 7: 0.002}, at=T0)
+    row_bytes = sum(capacity * BUCKET.size for _, _, capacity in RESOLUTIONS)
+    # Two rows, however high the device ids go
+    sizes = [(tmp_path / f'{name}.bin').stat().st_size for name, _, _ in RESOLUTIONS]
+    assert sum(sizes) <= 2 * row_bytes
+    store.retain([7])
+    store.record({9000: None}, at=T0 + 30)
+    assert [(tmp_path / f'{name}.bin').stat().st_size for name, _, _ in RESOLUTIONS] == sizes
+    # The new device starts from empty buckets, not the deleted one's history
+    _, _, totals = store.query([9000, 7, 5000], 60, now=T0 + 30)
+    assert (totals[9000].samples, totals[9000].up) == (1, 0)
+    assert totals[7].samples == 1
+    assert totals[5000].samples == 0
+
+def test_other_processes_follow_the_rows(tmp_path):
+    recorder, reader = MetricsStore(tmp_path), MetricsStore(tmp_path)
+    assert reader.query([1], 60, now=T0)[2][1].samples == 0
+    recorder.record({1: 0.001}, at=T0)
+    recorder.retain([])
+    recorder.record({2: 0.001}, at=T0)
+    _, _, totals = reader.query([1, 2], 60, now=T0)
+    assert (totals[1].samples, totals[2].samples) == (0, 1)
+
+def test_files_from_before_slots_keep_their_history(tmp_path):
+    # Rows used to be indexed by device id
+    store = MetricsStore(tmp_path)
+    store.record({0: None, 1: None, 2: 0.004}, at=T0)
+    store.close()
+    (tmp_path / 'slots.json').unlink()
+    store = MetricsStore(tmp_path)
+    _, _, totals = store.query([2], 60, now=T0)
+    assert totals[2].up == 1
+    store.retain([2])
+    store.record({3: 0.001}, at=T0 + 10)
+    assert store.query([3], 60, now=T0 + 10)[2][3].samples == 1
+    assert store.query([2], 60, now=T0 + 10)[2][2].up == 1
@@ -0,0 +1,116 @@
+"""Tests for the occupancy log and the usage rollups of usage.py"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from usage import OccupancyLog, UsageRollups, rollup_keys, split_by_day
+
+
+def occupy(station_id, at, user_id=1, lab_id=1, until=None):
+    return {'type': 'occupy', 'station_id': station_id, 'at': at, 'occupied_at': at,
+            'user_id': user_id, 'lab_id': lab_id, 'occupied_until': until}
+
+
+def release(station_id, at, event_type='release'):
+    return {'type': event_type, 'station_id': station_id, 'at': at}
+
+
+@pytest.fixture
+def log(tmp_path):
+    return OccupancyLog(tmp_path / 'occupancy', segment_bytes=200)
+
+
+@pytest.fixture
+def rollups(log, tmp_path):
+    return UsageRollups(log, tmp_path / 'rollups.json', checkpoint_events=1000)
+
+
+def test_log_segments_and_cursor(log):
+    for n in range(6):
+        log.append(occupy(n, '2024-03-01T09:00:00'))
+    assert len(log.segments()) > 1
+    events = list(log.read())
+    assert [event['station_id'] for event, _ in events] == list(range(6))
+    cursor = events[2][1]
+    assert [event['station_id'] for event, _ in log.read(cursor)] == [3, 4, 5]
+    assert list(log.read(events[-1][1])) == []
+
+
+def test_log_leaves_incomplete_line(log):
+    log.append(occupy(1, '2024-03-01T09:00:00'))
+    with open(log.segment_path(log.segments()[-1]), 'a', encoding='utf-8') as f:
+        f.write('{"type": "rel')
+    assert len(list(log.read())) == 1
+
+
+def test_split_by_day_and_rollup_keys():
+    assert list(split_by_day(datetime(2024, 3, 1, 23), datetime(2024, 3, 2, 1))) == [
+        (date(2024, 3, 1), 3600.0), (date(2024, 3, 2), 3600.0)]
+    assert rollup_keys(date(2024, 1, 31), date(2024, 3, 1)) == [
+        ('days', '2024-01-31'), ('months', '2024-02'), ('days', '2024-03-01')]
+
+
+def test_report_over_days_and_months(log, rollups):
+    log.append(occupy(1, '2024-01-31T22:00:00', user_id=7))
+    log.append(release(1, '2024-02-01T02:00:00'))
+    log.append(occupy(2, '2024-02-10T10:00:00', user_id=8, lab_id=2))
+    log.append(release(2, '2024-02-10T11:00:00'))
+    report = rollups.report(date(2024, 1, 1), date(2024, 2, 29))
+    assert report['stations'] == {1: [4 * 3600, 1], 2: [3600, 1]}
+    assert report['users'] == {7: [4 * 3600, 1], 8: [3600, 1]}
+    # Only the February part of the session, which started in January
+    assert rollups.report(date(2024, 2, 1), date(2024, 2, 29))['stations'][1] == [2 * 3600, 0]
+    assert rollups.report(date(2024, 2, 1), date(2024, 2, 29), lab_id=2)['users'] == {8: [3600, 1]}
+    assert rollups.daily('stations', 1, date(2024, 1, 31), date(2024, 2, 1)) == {
+        '2024-01-31': [2 * 3600, 1], '2024-02-01': [2 * 3600, 0]}
+
+
+def test_peak_and_takeover(log, rollups):
+    log.append(occupy(1, '2024-03-01T09:00:00'))
+    log.append(occupy(2, '2024-03-01T09:30:00', lab_id=2))
+    log.append(release(1, '2024-03-01T10:00:00'))
+    # Station 2 is taken over without a release; the first session ends there
+    log.append(occupy(2, '2024-03-03T09:00:00', user_id=2, lab_id=2))
+    log.append(release(2, '2024-03-03T10:00:00'))
+    report = rollups.report(date(2024, 3, 1), date(2024, 3, 3))
+    assert report['peak'] == {'2024-03-01': 2, '2024-03-02': 1, '2024-03-03': 1}
+    assert report['stations'][2] == [(48 - 0.5) * 3600 + 3600, 2]
+    assert rollups.report(date(2024, 3, 1), date(2024, 3, 3), lab_id=2)['peak'] == {
+        '2024-03-01': 1, '2024-03-02': 1, '2024-03-03': 1}
+
+
+def test_auto_release_stops_at_occupied_until(log, rollups):
+    log.append(occupy(1, '2024-03-01T09:00:00', until='2024-03-01T10:00:00'))
+    log.append({'type': 'extend', 'station_id': 1, 'at': '2024-03-01T09:50:00',
+                'occupied_until': '2024-03-01T11:00:00'})
+    log.append(release(1, '2024-03-01T15:00:00', 'auto_release'))
+    assert rollups.report(date(2024, 3, 1), date(2024, 3, 1))['stations'] == {1: [2 * 3600, 1]}
+
+
+def test_open_sessions_count_up_to_now(log, rollups):
+    log.append(occupy(1, (datetime.now() - timedelta(hours=1)).isoformat()))
+    today = date.today()
+    seconds, sessions = rollups.report(today - timedelta(days=1), today)['stations'][1]
+    assert 3590 < seconds < 3700 and sessions == 1
+
+
+def test_checkpoint_and_restart(log, rollups, tmp_path):
+    log.append(occupy(1, '2024-03-01T09:00:00'))
+    rollups.update()
+    rollups.checkpoint()
+    log.append(release(1, '2024-03-01T10:00:00'))
+    restarted = UsageRollups(log, tmp_path / 'rollups.json')
+    assert restarted.report(date(2024, 3, 1), date(2024, 3, 1))['stations'] == {1: [3600, 1]}
+    # A malformed event is skipped, the ones after it still count
+    log.append({'type': 'occupy', 'station_id': 2})
+    log.append(occupy(3, '2024-03-02T09:00:00'))
+    log.append(release(3, '2024-03-02T09:30:00'))
+    assert restarted.report(date(2024, 3, 2), date(2024, 3, 2))['stations'] == {3: [1800, 1]}
+
+
+def test_unreadable_checkpoint_rolls_up_again(log, rollups, tmp_path):
+    log.append(occupy(1, '2024-03-01T09:00:00'))
+    log.append(release(1, '2024-03-01T10:00:00'))
+    (tmp_path / 'rollups.json').write_text('{not json')
+    assert rollups.report(date(2024, 3, 1), date(2024, 3, 1))['stations'] == {1: [3600, 1]}
@@ -0,0 +1,348 @@
+"""
+Device latency and uptime history for SW Labs Management System
+Probe results are kept in fixed-width binary records, apart from devices.json:
+
+- samples.bin: ring buffer of raw samples (time, device id, rtt), appended in order
+- minute.bin / hour.bin: per-device rings of 1-minute and 1-hour rollup buckets
+- slots.json: which row of the rollup files each device has
+
+A rollup bucket lives at a fixed offset computed from the device's row and the
+bucket time, so recording a sample costs the same few writes however much
+history is kept, and a query reads one contiguous range per device. Rows are
+handed out densely and the rows of deleted devices are reused, so the files
+grow with the number of devices rather than with the highest device id.
+"""
+
+import json
+import math
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from storage import write_json_atomic
+
+# Latency histogram bin upper edges in milliseconds: 0.25ms doubling to 4s, then overflow
+LATENCY_EDGES = tuple(0.25 * 2 ** i for i in range(15))
+NUM_BINS = len(LATENCY_EDGES) + 1
+
+# Raw sample: epoch seconds, device id, rtt in ms (NaN when the device did not answer)
+SAMPLE = struct.Struct('<IIf')
+# Ring header: total number of samples ever appended
+SAMPLES_HEADER = struct.Struct('<Q')
+# Rollup bucket: start (epoch seconds, 0 = empty), samples, answered samples,
+# rtt sum / min / max in ms, then the latency histogram of answered samples
+BUCKET = struct.Struct(f'<IHHfff{NUM_BINS}H')
+
+# (name, bucket width in seconds, buckets kept per device)
+RESOLUTIONS = (
+    ('minute', 60, 24 * 60),      # one day
+    ('hour', 3600, 31 * 24),      # one month
+)
+
+# Binary files: no newline translation on Windows
+OPEN_FLAGS = getattr(os, 'O_BINARY', 0)
+
+
+def _pread(fd, size, offset):
+    """os.pread, or a seek and read where it is missing (Windows); callers own the fd's position"""
+    if hasattr(os, 'pread'):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _pwrite(fd, data, offset):
+    if hasattr(os, 'pwrite'):
+        return os.pwrite(fd, data, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.write(fd, data)
+
+
+def latency_bin(rtt_ms):
+    for i, edge in enumerate(LATENCY_EDGES):
+        if rtt_ms <= edge:
+            return i
+    return NUM_BINS - 1
+
+
+class Bucket:
+    """One rollup bucket, or the sum of several when answering a query"""
+
+    __slots__ = ('start', 'samples', 'up', 'rtt_sum', 'rtt_min', 'rtt_max', 'histogram')
+
+    def __init__(self, start=0):
+        self.start = start
+        self.samples = 0
+        self.up = 0
+        self.rtt_sum = 0.0
+        self.rtt_min = math.inf
+        self.rtt_max = 0.0
+        self.histogram = [0] * NUM_BINS
+
+    @classmethod
+    def unpack(cls, data):
+        fields = BUCKET.unpack(data)
+        bucket = cls(fields[0])
+        bucket.samples, bucket.up = fields[1], fields[2]
+        bucket.rtt_sum, bucket.rtt_min, bucket.rtt_max = fields[3], fields[4], fields[5]
+        bucket.histogram = list(fields[6:])
+        return bucket
+
+    def pack(self):
+        rtt_min = self.rtt_min if self.up else 0.0
+        return BUCKET.pack(self.start, self.samples, self.up, self.rtt_sum, rtt_min, self.rtt_max, *self.histogram)
+
+    def add(self, rtt_ms):
+        self.samples += 1
+        if rtt_ms is None:
+            return
+        self.up += 1
+        self.rtt_sum += rtt_ms
+        self.rtt_min = min(self.rtt_min, rtt_ms)
+        self.rtt_max = max(self.rtt_max, rtt_ms)
+        self.histogram[latency_bin(rtt_ms)] += 1
+
+    def merge(self, other):
+        if not other.samples:
+            return
+        self.samples += other.samples
+        self.up += other.up
+        if other.up:
+            self.rtt_sum += other.rtt_sum
+            self.rtt_min = min(self.rtt_min, other.rtt_min)
+            self.rtt_max = max(self.rtt_max, other.rtt_max)
+        for i, count in enumerate(other.histogram):
+            self.histogram[i] += count
+
+    def percentile(self, p):
+        """Latency below which p percent of answered samples fall, to histogram resolution"""
+        if not self.up:
+            return None
+        rank = p / 100 * self.up
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= rank:
+                # The bin's upper edge, but never beyond what was actually seen
+                edge = LATENCY_EDGES[i] if i < len(LATENCY_EDGES) else self.rtt_max
+                return min(max(edge, self.rtt_min), self.rtt_max)
+        return self.rtt_max
+
+    def summary(self, percentiles=(50, 90, 99)):
+        return {
+            'samples': self.samples,
+            'uptime_percent': round(100 * self.up / self.samples, 2) if self.samples else None,
+            'latency_ms': {
+                'min': round(self.rtt_min, 3) if self.up else None,
+                'mean': round(self.rtt_sum / self.up, 3) if self.up else None,
+                'max': round(self.rtt_max, 3) if self.up else None,
+                **{f'p{p:g}': self.percentile(p) for p in percentiles},
+            },
+        }
+
+
+class MetricsStore:
+    """Append-only latency/uptime samples with 1-minute and 1-hour rollups
+
+    One process (the monitor) records; any process can query, reading the
+    files directly. Records hold the lock for the shared file descriptors;
+    each query opens its own.
+    """
+
+    def __init__(self, directory, sample_capacity=1_000_000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sample_capacity = sample_capacity
+        self._lock = threading.Lock()
+        self._fds = {}
+        # (resolution name, device_id) -> Bucket currently being filled
+        self._open_buckets = {}
+        self._sample_count = None
+        self._slots_path = self.directory / 'slots.json'
+        self._slots = {}        # device_id -> row in the rollup files
+        self._free = []         # rows of deleted devices, reused first
+        self._slots_stamp = None
+        self._slots_lock = threading.Lock()
+
+    def _fd(self, name):
+        fd = self._fds.get(name)
+        if fd is None:
+            fd = os.open(self.directory / f'{name}.bin', os.O_RDWR | os.O_CREAT | OPEN_FLAGS, 0o644)
+            self._fds[name] = fd
+        return fd
+
+    def close(self):
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds = {}
+
+    @staticmethod
+    def _offset(slot, start, width, capacity):
+        return (slot * capacity + (start // width) % capacity) * BUCKET.size
+
+    def _load_slots(self):
+        """Reread slots.json when it changed; the monitor writes it, any process reads it"""
+        with self._slots_lock:
+            try:
+                stat = self._slots_path.stat()
+            except FileNotFoundError:
+                if self._slots_stamp is None:
+                    self._slots_stamp = 'migrated'
+                    self._migrate_slots()
+                return
+            stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if stamp == self._slots_stamp:
+                return
+            try:
+                with open(self._slots_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading {self._slots_path}: {e}")
+                return
+            self._slots = {int(device_id): slot for device_id, slot in data['slots'].items()}
+            self._free = data['free']
+            self._slots_stamp = stamp
+
+    def _migrate_slots(self):
+        # Files written before slots.json have one row per device id; keep
+        # that history, and let retain() free the rows of missing ids
+        try:
+            size = (self.directory / 'minute.bin').stat().st_size
+        except FileNotFoundError:
+            return
+        capacity = RESOLUTIONS[0][2]
+        rows = -(-size // (capacity * BUCKET.size))
+        self._slots = {device_id: device_id for device_id in range(rows)}
+        self._free = []
+
+    def _save_slots(self):
+        try:
+            write_json_atomic(self._slots_path, {'slots': self._slots, 'free': self._free})
+            stat = self._slots_path.stat()
+            self._slots_stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError as e:
+            # The rows stay assigned in memory and are saved with the next change
+            print(f"Error saving {self._slots_path}: {e}")
+
+    def _assign_slot(self, device_id):
+        """Give a device that has none the first free row, emptied of the previous device's buckets"""
+        if self._free:
+            self._free.sort()
+            slot = self._free.pop(0)
+            for name, width, capacity in RESOLUTIONS:
+                _pwrite(self._fd(name), bytes(capacity * BUCKET.size), self._offset(slot, 0, width, capacity))
+        else:
+            slot = max(self._slots.values(), default=-1) + 1
+        self._slots[device_id] = slot
+        return slot
+
+    def retain(self, device_ids):
+        """Free the rows of every device not in device_ids, for new devices to reuse"""
+        device_ids = set(device_ids)
+        with self._lock:
+            self._load_slots()
+            gone = [device_id for device_id in self._slots if device_id not in device_ids]
+            if not gone:
+                return
+            for device_id in gone:
+                self._free.append(self._slots.pop(device_id))
+                for name, _, _ in RESOLUTIONS:
+                    self._open_buckets.pop((name, device_id), None)
+            self._save_slots()
+
+    def _read_bucket(self, fd, offset, start):
+        data = _pread(fd, BUCKET.size, offset)
+        if len(data) == BUCKET.size:
+            bucket = Bucket.unpack(data)
+            if bucket.start == start:
+                return bucket
+        # Empty slot, or one still holding a bucket from a previous lap of the ring
+        return Bucket(start)
+
+    def _append_samples(self, records):
+        fd = self._fd('samples')
+        if self._sample_count is None:
+            header = _pread(fd, SAMPLES_HEADER.size, 0)
+            self._sample_count = SAMPLES_HEADER.unpack(header)[0] if len(header) == SAMPLES_HEADER.size else 0
+        for record in records:
+            slot = self._sample_count % self.sample_capacity
+            _pwrite(fd, record, SAMPLES_HEADER.size + slot * SAMPLE.size)
+            self._sample_count += 1
+        _pwrite(fd, SAMPLES_HEADER.pack(self._sample_count), 0)
+
+    def record(self, results, at=None):
+        """Record one sweep: results maps device_id to rtt in seconds, or None when it did not answer"""
+        at = int(at if at is not None else time.time())
+        with self._lock:
+            self._append_samples([
+                SAMPLE.pack(at, device_id, math.nan if rtt is None else rtt * 1000)
+                for device_id, rtt in results.items()
+            ])
+            self._load_slots()
+            new = [device_id for device_id in results if device_id not in self._slots]
+            for device_id in new:
+                self._assign_slot(device_id)
+            if new:
+                self._save_slots()
+            for name, width, capacity in RESOLUTIONS:
+                fd = self._fd(name)
+                start = at - at % width
+                for device_id, rtt in results.items():
+                    key = (name, device_id)
+                    offset = self._offset(self._slots[device_id], start, width, capacity)
+                    bucket = self._open_buckets.get(key)
+                    if bucket is None or bucket.start != start:
+                        # After a restart, carry on with what was written for this bucket
+                        bucket = self._read_bucket(fd, offset, start)
+                        self._open_buckets[key] = bucket
+                    bucket.add(None if rtt is None else rtt * 1000)
+                    _pwrite(fd, bucket.pack(), offset)
+
+    def query(self, device_ids, window, now=None):
+        """Return (resolution name, window, {device_id: Bucket}) summing each device's buckets over the last window seconds
+
+        The finest resolution that still covers the window is used; a window
+        longer than the longest retention is cut to it.
+        """
+        now = int(now if now is not None else time.time())
+        for name, width, capacity in RESOLUTIONS:
+            if window <= width * capacity:
+                break
+        # The oldest bucket of a full window shares its slot with the newest
+        window = min(window, width * (capacity - 1))
+        first = (now - window) // width * width
+        last = now - now % width
+        starts = range(first, last + width, width)
+        path = self.directory / f'{name}.bin'
+        self._load_slots()
+        slots = self._slots
+        totals = {}
+        try:
+            fd = os.open(path, os.O_RDONLY | OPEN_FLAGS)
+        except FileNotFoundError:
+            return name, window, {device_id: Bucket() for device_id in device_ids}
+        try:
+            for device_id in device_ids:
+                total = Bucket()
+                totals[device_id] = total
+                if device_id not in slots:
+                    continue
+                # One contiguous read per lap of the ring
+                row = slots[device_id] * capacity * BUCKET.size
+                first_slot = (first // width) % capacity
+                count = len(starts)
+                head = min(count, capacity - first_slot)
+                data = _pread(fd, head * BUCKET.size, row + first_slot * BUCKET.size)
+                if count > head:
+                    data += _pread(fd, (count - head) * BUCKET.size, row)
+                wanted = set(starts)
+                for i in range(len(data) // BUCKET.size):
+                    bucket = Bucket.unpack(data[i * BUCKET.size:(i + 1) * BUCKET.size])
+                    if bucket.start in wanted:
+                        total.merge(bucket)
+        finally:
+            os.close(fd)
+        return name, window, totals
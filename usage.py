@@ -0,0 +1,363 @@
+"""
+Station usage history for SW Labs Management System
+Every occupy, release, auto-release and extend is appended to an event log of
+numbered segment files, so releasing a station no longer forgets who used it
+and for how long. The log is rolled up into occupied time per day and per
+month for each station and each user, and the peak number of stations
+occupied at once per day, so a report over a year adds up a few dozen rollup
+entries per station instead of replaying the raw events.
+"""
+
+import json
+import re
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from storage import FileLock, write_json_atomic
+
+SEGMENT = re.compile(r'occupancy-(\d+)\.jsonl$')
+
+
+class OccupancyLog:
+    """Append-only occupancy events, one JSON object per line, in segments of about segment_bytes"""
+
+    def __init__(self, directory, segment_bytes=4 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.lock = FileLock(self.directory / 'occupancy.lock')
+        self._current = None  # number of the segment being appended to
+
+    def segment_path(self, number):
+        return self.directory / f'occupancy-{number:08d}.jsonl'
+
+    def segments(self):
+        """Return the numbers of the segment files, oldest first"""
+        numbers = []
+        for path in self.directory.glob('occupancy-*.jsonl'):
+            match = SEGMENT.search(path.name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def append(self, event):
+        """Append one event, starting a new segment when the current one is full"""
+        line = json.dumps(event, separators=(',', ':')) + '\n'
+        path = None
+        try:
+            with self.lock:
+                # Another process may have started a new segment since
+                if self._current is None or self.segment_path(self._current + 1).exists():
+                    numbers = self.segments()
+                    self._current = numbers[-1] if numbers else 1
+                path = self.segment_path(self._current)
+                size = path.stat().st_size if path.exists() else 0
+                if size and size + len(line) > self.segment_bytes:
+                    self._current += 1
+                    path = self.segment_path(self._current)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"Error writing to {path or self.directory}: {e}")
+
+    def read(self, cursor=(0, 0)):
+        """Yield (event, cursor after it) for each complete event written after cursor
+
+        A cursor is (segment number, byte offset). A line still being written
+        is left for the next read, and so is everything after it.
+        """
+        segment, offset = cursor
+        for number in self.segments():
+            if number < segment:
+                continue
+            start = offset if number == segment else 0
+            try:
+                with open(self.segment_path(number), 'rb') as f:
+                    f.seek(start)
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            complete = data.rfind(b'\n') + 1
+            position = start
+            for line in data[:complete].splitlines(keepends=True):
+                position += len(line)
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    print(f"Skipping unreadable event in {self.segment_path(number)} at byte {position - len(line)}")
+                    continue
+                yield event, (number, position)
+            if complete < len(data):
+                return
+
+
+def split_by_day(start, end):
+    """Yield (date, seconds) for the part of [start, end) on each day"""
+    while start < end:
+        next_day = datetime.combine(start.date() + timedelta(days=1), datetime.min.time())
+        part_end = min(end, next_day)
+        yield start.date(), (part_end - start).total_seconds()
+        start = part_end
+
+
+def rollup_keys(start_day, end_day):
+    """Return the rollup entries covering [start_day, end_day]: ('months', 'YYYY-MM') for
+    whole months and ('days', 'YYYY-MM-DD') for the days at either end"""
+    keys = []
+    day = start_day
+    while day <= end_day:
+        next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        if day.day == 1 and next_month - timedelta(days=1) <= end_day:
+            keys.append(('months', day.isoformat()[:7]))
+            day = next_month
+        else:
+            keys.append(('days', day.isoformat()))
+            day += timedelta(days=1)
+    return keys
+
+
+class UsageRollups:
+    """Occupied seconds and sessions per day and per month for each station and user
+
+    Rolled up incrementally from an OccupancyLog: each call catches up with
+    the events appended since the last one. The rollups are checkpointed to
+    a file now and then, so a new process starts from there instead of from
+    the first event. Sessions count on the day they started.
+    """
+
+    def __init__(self, log, path, checkpoint_events=1000):
+        self.log = log
+        self.path = Path(path)
+        self.checkpoint_events = checkpoint_events
+        self._lock = threading.Lock()
+        self._state = None
+        self._unsaved = 0
+
+    # State: cursor into the log; open sessions (station_id -> [user_id,
+    # occupied_at, occupied_until, lab_id]); the last day an event was applied
+    # on; rollups ({'days': {'YYYY-MM-DD': [seconds, sessions]}, 'months':
+    # {'YYYY-MM': [...]}}) per station, per user and per user within each lab;
+    # and the peak number of stations occupied at once per day, overall and per lab
+    @staticmethod
+    def _empty():
+        return {'cursor': [0, 0], 'open': {}, 'last_day': None,
+                'stations': {}, 'users': {}, 'lab_users': {}, 'peak': {}, 'lab_peak': {}}
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return self._empty()
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"Error loading {self.path}, rolling up the whole log again: {e}")
+            return self._empty()
+        # JSON object keys are strings; ids are ints everywhere else
+        int_keys = lambda table: {int(key): value for key, value in table.items()}
+        for table in ('open', 'stations', 'users', 'lab_peak'):
+            state[table] = int_keys(state[table])
+        state['lab_users'] = {int(lab_id): int_keys(users) for lab_id, users in state['lab_users'].items()}
+        return state
+
+    def _save(self):
+        try:
+            write_json_atomic(self.path, self._state, separators=(',', ':'))
+            self._unsaved = 0
+        except OSError as e:
+            print(f"Error saving to {self.path}: {e}")
+
+    @staticmethod
+    def _add(table, key_id, start, end):
+        entry = table.setdefault(key_id, {'days': {}, 'months': {}})
+        started = start.date().isoformat()
+        for resolution, key in (('days', started), ('months', started[:7])):
+            entry[resolution].setdefault(key, [0, 0])[1] += 1
+        for day, seconds in split_by_day(start, end):
+            day = day.isoformat()
+            for resolution, key in (('days', day), ('months', day[:7])):
+                entry[resolution].setdefault(key, [0, 0])[0] += seconds
+
+    def _close(self, station_id, session, end):
+        user_id, start, _, lab_id = session
+        start = datetime.fromisoformat(start)
+        end = max(start, end)
+        self._add(self._state['stations'], station_id, start, end)
+        if user_id is not None:
+            self._add(self._state['users'], user_id, start, end)
+            if lab_id is not None:
+                self._add(self._state['lab_users'].setdefault(lab_id, {}), user_id, start, end)
+
+    def _record_peak(self, day):
+        state = self._state
+        key = day.isoformat()
+        state['peak'][key] = max(state['peak'].get(key, 0), len(state['open']))
+        by_lab = {}
+        for session in state['open'].values():
+            if session[3] is not None:
+                by_lab[session[3]] = by_lab.get(session[3], 0) + 1
+        for lab_id, count in by_lab.items():
+            lab_peak = state['lab_peak'].setdefault(lab_id, {})
+            lab_peak[key] = max(lab_peak.get(key, 0), count)
+
+    def _advance(self, day):
+        """Carry the sessions still open into the peak of each day after the last event up to day"""
+        state = self._state
+        last = date.fromisoformat(state['last_day']) if state['last_day'] else None
+        if last is not None and day <= last:
+            return
+        if state['open'] and last is not None:
+            current = last + timedelta(days=1)
+            while current <= day:
+                self._record_peak(current)
+                current += timedelta(days=1)
+        state['last_day'] = day.isoformat()
+
+    def _apply(self, event):
+        state = self._state
+        at = datetime.fromisoformat(event['at'])
+        station_id = event['station_id']
+        self._advance(at.date())
+        if event['type'] == 'occupy':
+            start = event.get('occupied_at') or event['at']
+            previous = state['open'].get(station_id)
+            if previous is not None:
+                # Taken over (e.g. by a reservation) before its auto-release ran
+                self._close(station_id, previous, datetime.fromisoformat(start))
+            state['open'][station_id] = [event.get('user_id'), start, event.get('occupied_until'), event.get('lab_id')]
+            self._record_peak(date.fromisoformat(state['last_day']))
+        elif event['type'] in ('release', 'auto_release'):
+            # The event describes the occupation it ended, so history from
+            # before the log started still counts
+            previous = state['open'].pop(station_id, None) or [None, None, None, None]
+            session = [event.get('user_id', previous[0]), event.get('occupied_at') or previous[1],
+                       event.get('occupied_until') or previous[2], event.get('lab_id', previous[3])]
+            end = at
+            if event['type'] == 'auto_release' and session[2]:
+                # Released late (e.g. the monitor was down): the time ran out at occupied_until
+                end = min(end, datetime.fromisoformat(session[2]))
+            if session[1]:
+                self._close(station_id, session, end)
+        elif event['type'] == 'extend':
+            if station_id in state['open']:
+                state['open'][station_id][2] = event.get('occupied_until')
+
+    def _catch_up(self):
+        if self._state is None:
+            self._state = self._load()
+        applied = 0
+        for event, cursor in self.log.read(tuple(self._state['cursor'])):
+            try:
+                self._apply(event)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping malformed occupancy event {event!r}: {e}")
+            self._state['cursor'] = list(cursor)
+            applied += 1
+        self._unsaved += applied
+        if self._unsaved >= self.checkpoint_events:
+            self._save()
+
+    def update(self):
+        """Roll up the events appended since the last update"""
+        with self._lock:
+            self._catch_up()
+
+    def checkpoint(self):
+        """Write the rollups if there are events not saved yet"""
+        with self._lock:
+            if self._state is not None and self._unsaved:
+                self._save()
+
+    def _open_sessions(self, start, end, lab_id=None):
+        """Yield (station_id, user_id, occupied_at, part start, part end) of the open
+        sessions (of one lab, if given) overlapping [start, min(end, now))"""
+        end = min(end, max(start, datetime.now()))
+        for station_id, (user_id, occupied_at, _, session_lab_id) in self._state['open'].items():
+            if lab_id is not None and session_lab_id != lab_id:
+                continue
+            occupied_at = datetime.fromisoformat(occupied_at)
+            part_start = max(start, occupied_at)
+            if part_start < end:
+                yield station_id, user_id, occupied_at, part_start, end
+
+    def report(self, start_day, end_day, lab_id=None):
+        """Usage between two dates, inclusive, of every station or of one lab's
+
+        Returns {'stations': {station_id: [seconds, sessions]}, 'users':
+        {user_id: [seconds, sessions]}, 'peak': {day: stations occupied at
+        once}}. Sessions still open count up to now.
+        """
+        with self._lock:
+            self._catch_up()
+            state = self._state
+            keys = rollup_keys(start_day, end_day)
+            users = state['users'] if lab_id is None else state['lab_users'].get(lab_id, {})
+            result = {}
+            for name, table in (('stations', state['stations']), ('users', users)):
+                totals = {}
+                for key_id, entry in table.items():
+                    seconds = sessions = 0
+                    for resolution, key in keys:
+                        values = entry[resolution].get(key)
+                        if values:
+                            seconds += values[0]
+                            sessions += values[1]
+                    if seconds or sessions:
+                        totals[key_id] = [seconds, sessions]
+                result[name] = totals
+
+            start = datetime.combine(start_day, datetime.min.time())
+            end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+            for station_id, user_id, occupied_at, part_start, part_end in self._open_sessions(start, end, lab_id):
+                for name, key_id in (('stations', station_id), ('users', user_id)):
+                    if key_id is not None:
+                        totals = result[name].setdefault(key_id, [0, 0])
+                        totals[0] += (part_end - part_start).total_seconds()
+                        totals[1] += int(occupied_at >= start)
+
+            result['peak'] = self._peaks(start_day, end_day, lab_id)
+            return result
+
+    def _peaks(self, start_day, end_day, lab_id):
+        state = self._state
+        recorded = state['peak'] if lab_id is None else state['lab_peak'].get(lab_id, {})
+        peaks = {}
+        day = start_day
+        while day <= end_day:
+            key = day.isoformat()
+            if key in recorded:
+                peaks[key] = recorded[key]
+            day += timedelta(days=1)
+        # The days since the last event have had the open sessions all along
+        still_open = sum(1 for session in state['open'].values() if lab_id is None or session[3] == lab_id)
+        if still_open and state['last_day']:
+            day = max(start_day, date.fromisoformat(state['last_day']))
+            while day <= min(end_day, date.today()):
+                key = day.isoformat()
+                peaks[key] = max(peaks.get(key, 0), still_open)
+                day += timedelta(days=1)
+        return peaks
+
+    def daily(self, table, key_id, start_day, end_day):
+        """Return {day: [seconds, sessions]} of one station or user (table 'stations' or 'users')"""
+        with self._lock:
+            self._catch_up()
+            days = self._state[table].get(key_id, {}).get('days', {})
+            series = {}
+            day = start_day
+            while day <= end_day:
+                key = day.isoformat()
+                series[key] = list(days.get(key, [0, 0]))
+                day += timedelta(days=1)
+            start = datetime.combine(start_day, datetime.min.time())
+            end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+            column = 0 if table == 'stations' else 1
+            for session in self._open_sessions(start, end):
+                if session[column] != key_id:
+                    continue
+                occupied_at, part_start, part_end = session[2:]
+                for day, seconds in split_by_day(part_start, part_end):
+                    series[day.isoformat()][0] += seconds
+                if occupied_at >= start:
+                    series[occupied_at.date().isoformat()][1] += 1
+            return series